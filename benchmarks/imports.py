@@ -0,0 +1,59 @@
+"""
+Benchmark of import times.
+
+Imports every module in a fresh interpreter ``--repeat`` times and writes the median wall time as JSON, e.g.::
+
+    PYTHONPATH=src python benchmarks/imports.py --output imports.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, Sequence
+
+MODULES = (
+    'aiofm',
+    'aiofm.protocols',
+    'aiofm.protocols.memory',
+    'aiofm.protocols.local',
+    'aiofm.manager',
+    'aiofm.protocols.s3',
+    'aiofm.protocols.minio',
+)
+DEFAULT_REPEAT = 5
+TIMER = 'import time, sys; started_at = time.perf_counter(); import {module}; ' \
+        'print(time.perf_counter() - started_at)'
+
+
+def import_time(module: str) -> float:
+    output = subprocess.run([sys.executable, '-c', TIMER.format(module=module)], capture_output=True, text=True,
+                            check=True).stdout
+
+    return float(output.strip())
+
+
+def main(modules: Sequence[str], repeat: int) -> Dict:
+    results = {}
+
+    for module in modules:
+        times = [import_time(module) for _ in range(repeat)]
+        results[module] = {'median': statistics.median(times), 'min': min(times), 'max': max(times)}
+        print(f'{module:>24} {results[module]["median"] * 1000:8.1f}ms', file=sys.stderr)
+
+    return {'python': sys.version.split()[0], 'repeat': repeat, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(MODULES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--output', help='JSON file for the results, stdout by default')
+    arguments = parser.parse_args()
+    report = main(arguments.modules, arguments.repeat)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
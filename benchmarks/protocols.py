@@ -0,0 +1,329 @@
+"""
+Benchmarks of protocol operations.
+
+Measures operations per second and latency percentiles of ``ls``, ``exists``, reads and writes of several object
+sizes, ``cp``, ``mv``, ``rm`` and bulk transfers at several concurrency levels and writes them as JSON, e.g.::
+
+    PYTHONPATH=src python benchmarks/protocols.py --backends mem,file,s3 --output results.json
+    PYTHONPATH=src python benchmarks/protocols.py --compare baseline.json --output results.json
+
+S3 and Minio backends run against an in-process moto server unless ``--endpoint-url`` points to another S3
+compatible server, e.g. a local MinIO binary.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterable, Awaitable, Callable, Dict, List, Sequence
+
+from pydantic import SecretStr
+
+import aiofm
+from aiofm.helpers import aread, awrite, run_concurrently
+from aiofm.protocols import BaseProtocol
+from aiofm.protocols.local import LocalProtocol
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.minio import MinioProtocol
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.transfer import transfer
+
+BACKENDS = ('mem', 'file', 's3', 'minio')
+DEFAULT_SIZES = (1024, 1024 * 1024)
+DEFAULT_CONCURRENCY = (1, 8, 32)
+DEFAULT_COUNT = 64
+BUCKET_NAME = 'aiofm-benchmarks'
+CREDENTIALS = {'region_name': 'us-east-1', 'access_key_id': 'testing', 'secret_access_key': 'testing'}
+# Relative change of ops/sec reported by --compare
+REGRESSION_THRESHOLD = 0.1
+
+
+def percentile(latencies: Sequence[float], q: float) -> float:
+    return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+def summarize(latencies: List[float], elapsed: float, size: int | None = None) -> Dict:
+    latencies = sorted(latencies)
+    result = {
+        'count': len(latencies),
+        'elapsed': elapsed,
+        'ops_per_sec': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency': {
+            'mean': sum(latencies) / len(latencies),
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1],
+        },
+    }
+
+    if size is not None:
+        result['bytes_per_sec'] = result['ops_per_sec'] * size
+
+    return result
+
+
+async def consume(iterable: AsyncIterable) -> list:
+    """
+    Exhausts a listing, e.g. of ``ls`` or ``glob``
+    """
+
+    return [item async for item in iterable]
+
+
+async def measure(count: int, concurrency: int, operation: Callable[[int], Awaitable],
+                  size: int | None = None) -> Dict:
+    latencies = []
+
+    async def timed(index: int):
+        started_at = time.perf_counter()
+        await operation(index)
+        latencies.append(time.perf_counter() - started_at)
+
+    async def operations():
+        for index in range(count):
+            yield timed(index)
+
+    started_at = time.perf_counter()
+    await run_concurrently(operations(), concurrency)
+
+    return summarize(latencies, time.perf_counter() - started_at, size)
+
+
+@asynccontextmanager
+async def moto_server() -> AsyncGenerator[str, None]:
+    from moto.server import ThreadedMotoServer
+
+    # Keep the request log of the server out of the benchmark output
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+
+    try:
+        yield f'http://{host}:{port}'
+    finally:
+        server.stop()
+
+
+@asynccontextmanager
+async def s3_endpoint(endpoint_url: str | None) -> AsyncGenerator[str, None]:
+    if endpoint_url:
+        yield endpoint_url
+    else:
+        async with moto_server() as url:
+            yield url
+
+
+@asynccontextmanager
+async def open_backend(backend: str, endpoint_url: str | None) -> AsyncGenerator[tuple[BaseProtocol, str], None]:
+    """
+    Yields an empty protocol of the backend and the root path to benchmark under
+    """
+
+    if backend == 'mem':
+        yield MemoryProtocol(), '/bench'
+    elif backend == 'file':
+        with tempfile.TemporaryDirectory(prefix='aiofm-bench-') as root:
+            fs = LocalProtocol()
+
+            try:
+                yield fs, root
+            finally:
+                await fs.close()
+    elif backend in ('s3', 'minio'):
+        async with s3_endpoint(endpoint_url) as url:
+            credentials = {
+                'region_name': CREDENTIALS['region_name'],
+                'access_key_id': SecretStr(CREDENTIALS['access_key_id']),
+                'secret_access_key': SecretStr(CREDENTIALS['secret_access_key']),
+            }
+
+            if backend == 's3':
+                async with S3Protocol(endpoint_url=url, **credentials) as fs:
+                    try:
+                        await fs._call('create_bucket', Bucket=BUCKET_NAME)
+                    except Exception as e:
+                        if 'BucketAlreadyOwnedByYou' not in str(e):
+                            raise
+
+                    yield fs, f'/{BUCKET_NAME}/bench'
+                    await fs.rm(f'/{BUCKET_NAME}/bench')
+            else:
+                async with MinioProtocol(url.split('://', 1)[-1], secure=url.startswith('https://'),
+                                         **credentials) as fs:
+                    if not await fs._run(fs.client.bucket_exists, BUCKET_NAME):
+                        await fs._run(fs.client.make_bucket, BUCKET_NAME)
+
+                    yield fs, f'/{BUCKET_NAME}/bench'
+                    await fs.rm(f'/{BUCKET_NAME}/bench')
+    else:
+        raise ValueError(f'Unsupported backend: {backend}')
+
+
+async def write_file(fs: BaseProtocol, path: str, data: bytes):
+    async with fs.open(path, 'wb') as f:
+        await awrite(f, data)
+
+
+async def read_file(fs: BaseProtocol, path: str) -> bytes:
+    async with fs.open(path, 'rb') as f:
+        return await aread(f)
+
+
+async def benchmark_backend(backend: str, fs: BaseProtocol, root: str, sizes: Sequence[int],
+                            concurrency_levels: Sequence[int], count: int) -> List[Dict]:
+    results = []
+
+    def record(operation: str, concurrency: int, result: Dict, size: int | None = None):
+        results.append({'backend': backend, 'operation': operation, 'size': size, 'concurrency': concurrency,
+                        **result})
+        line = f'{backend:>6} {operation:>8} size={size or "-":>8} concurrency={concurrency:>3} ' \
+               f'{result["ops_per_sec"]:>10.1f} ops/s'
+
+        if result['latency'] is not None:
+            line = f'{line} p99={result["latency"]["p99"] * 1000:.2f}ms'
+
+        print(line, file=sys.stderr)
+
+    for concurrency in concurrency_levels:
+        for size in sizes:
+            data = os.urandom(size)
+            run_root = f'{root}/{concurrency}-{size}'
+
+            def path(name: str, index: int) -> str:
+                return f'{run_root}/{name}/{index}'
+
+            record('write', concurrency, await measure(
+                count, concurrency, lambda i: write_file(fs, path('files', i), data), size
+            ), size)
+            record('read', concurrency, await measure(
+                count, concurrency, lambda i: read_file(fs, path('files', i)), size
+            ), size)
+            record('cp', concurrency, await measure(
+                count, concurrency, lambda i: fs.cp(path('files', i), path('copies', i)), size
+            ), size)
+            record('mv', concurrency, await measure(
+                count, concurrency, lambda i: fs.mv(path('copies', i), path('moved', i)), size
+            ), size)
+            record('rm', concurrency, await measure(
+                count, concurrency, lambda i: fs.rm(path('moved', i)), size
+            ), size)
+
+            target = MemoryProtocol()
+            started_at = time.perf_counter()
+            stats = await transfer(fs, f'{run_root}/files', target, '/transfer', max_concurrency=concurrency)
+            elapsed = time.perf_counter() - started_at
+            record('transfer', concurrency, {
+                'count': stats.files,
+                'elapsed': elapsed,
+                'ops_per_sec': stats.files / elapsed if elapsed > 0 else 0.0,
+                'bytes_per_sec': stats.bytes / elapsed if elapsed > 0 else 0.0,
+                'latency': None,
+            }, size)
+
+        files_root = f'{root}/{concurrency}-{sizes[0]}/files'
+        record('exists', concurrency, await measure(
+            count, concurrency, lambda i: fs.exists(f'{files_root}/{i}')
+        ))
+        record('ls', concurrency, await measure(
+            count, concurrency, lambda i: consume(fs.ls(files_root))
+        ))
+
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Returns descriptions of results whose ops/sec changed by more than ``threshold`` against the baseline
+    """
+
+    def key(result: Dict) -> tuple:
+        return result['backend'], result['operation'], result['size'], result['concurrency']
+
+    baseline_results = {key(result): result for result in baseline}
+    changes = []
+
+    for result in results:
+        try:
+            baseline_result = baseline_results[key(result)]
+        except KeyError:
+            continue
+
+        if not baseline_result['ops_per_sec']:
+            continue
+
+        change = result['ops_per_sec'] / baseline_result['ops_per_sec'] - 1
+
+        if abs(change) > threshold:
+            backend, operation, size, concurrency = key(result)
+            changes.append(f'{backend} {operation} size={size} concurrency={concurrency}: {change:+.1%}')
+
+    return changes
+
+
+async def main(args: argparse.Namespace) -> Dict:
+    results = []
+
+    for backend in args.backends:
+        async with open_backend(backend, args.endpoint_url) as (fs, root):
+            results += await benchmark_backend(backend, fs, root, args.sizes, args.concurrency, args.count)
+
+    return {
+        'meta': {
+            'aiofm': aiofm.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+            'count': args.count,
+            'endpoint_url': args.endpoint_url,
+        },
+        'results': results,
+    }
+
+
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    def integers(value: str) -> List[int]:
+        return [int(item) for item in value.split(',')]
+
+    def backends(value: str) -> List[str]:
+        names = value.split(',')
+
+        for name in names:
+            if name not in BACKENDS:
+                raise argparse.ArgumentTypeError(f'Unsupported backend: {name}')
+
+        return names
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', type=backends, default=list(BACKENDS), help='Comma separated backends')
+    parser.add_argument('--sizes', type=integers, default=list(DEFAULT_SIZES), help='Comma separated file sizes')
+    parser.add_argument('--concurrency', type=integers, default=list(DEFAULT_CONCURRENCY),
+                        help='Comma separated concurrency levels')
+    parser.add_argument('--count', type=int, default=DEFAULT_COUNT, help='Operations per measurement')
+    parser.add_argument('--endpoint-url', help='S3 compatible server instead of the in-process moto server')
+    parser.add_argument('--output', help='JSON file for the results, stdout by default')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    report = asyncio.run(main(arguments))
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            for line in compare(report['results'], json.load(baseline_file)['results']):
+                print(line, file=sys.stderr)
@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
-from pkg_resources import DistributionNotFound, get_distribution
-
-try:
-    # Change here if project is renamed and does not equal the package name
-    dist_name = __name__
-    __version__ = get_distribution(dist_name).version
-except DistributionNotFound:
-    __version__ = 'unknown'
-finally:
-    del get_distribution, DistributionNotFound
+# Change here if project is renamed and does not equal the package name
+dist_name = __name__
+
+
+def __getattr__(name: str):
+    # The version is looked up on first access, since reading package metadata slows the import down
+    if name != '__version__':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        __version__ = version(dist_name)
+    except PackageNotFoundError:
+        __version__ = 'unknown'
+
+    globals()['__version__'] = __version__
+
+    return __version__
@@ -0,0 +1,108 @@
+from array import array
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import List
+
+# Placeholders of metadata missing from a columnar listing
+MISSING_SIZE = -1
+MISSING_MTIME = float('nan')
+
+
+@dataclass(frozen=True, slots=True)
+class Entry:
+    """
+    File or directory yielded by ``scan`` along with the metadata its listing returned, so that no further request
+    is needed to learn about it. Metadata the storage does not report is ``None``, e.g. the size of directories or
+    the ETag of in-memory files.
+
+    ``mtime`` is the modification time in seconds since the epoch.
+    """
+
+    path: PurePath
+    is_dir: bool = False
+    size: int | None = None
+    mtime: float | None = None
+    etag: str | None = None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+class ObjectEntry:
+    """
+    ``Entry`` of an object storage listing.
+
+    Keeps only the bucket name and the key strings taken from the listing and builds ``path`` on first access, so
+    listings of millions of keys cost neither a ``PurePath`` nor a formatted string per key unless callers ask for
+    them.
+    """
+
+    __slots__ = ('bucket', 'key', 'is_dir', 'size', 'mtime', 'etag', '_path')
+
+    def __init__(self, bucket: str, key: str, is_dir: bool = False, size: int | None = None,
+                 mtime: float | None = None, etag: str | None = None):
+        self.bucket = bucket
+        self.key = key
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self._path = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(bucket={self.bucket!r}, key={self.key!r}, is_dir={self.is_dir})'
+
+    def __eq__(self, other):
+        if not isinstance(other, ObjectEntry):
+            return NotImplemented
+
+        return (self.bucket, self.key, self.is_dir, self.size, self.mtime, self.etag) == \
+            (other.bucket, other.key, other.is_dir, other.size, other.mtime, other.etag)
+
+    def __hash__(self):
+        return hash((self.bucket, self.key))
+
+    @property
+    def path(self) -> PurePath:
+        if self._path is None:
+            self._path = PurePath(f'/{self.bucket}/{self.key}')
+
+        return self._path
+
+    @property
+    def name(self) -> str:
+        return self.key.rstrip('/').rpartition('/')[2]
+
+
+class EntryColumns:
+    """
+    Page of a listing yielded by ``scan_columns``, stored column by column instead of as one object per entry.
+
+    ``paths`` and ``etags`` are lists, while ``is_dir``, ``sizes`` and ``mtimes`` are compact ``array`` columns that
+    can be handed to e.g. ``numpy.frombuffer`` without copying. Missing sizes are ``MISSING_SIZE`` and missing
+    modification times are ``MISSING_MTIME`` (NaN).
+    """
+
+    __slots__ = ('paths', 'is_dir', 'sizes', 'mtimes', 'etags')
+
+    def __init__(self):
+        self.paths: List[str] = []
+        self.is_dir = array('b')
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.etags: List[str | None] = []
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(entries={len(self)})'
+
+    def __len__(self):
+        return len(self.paths)
+
+    def append(self, path: str, is_dir: bool, size: int | None = None, mtime: float | None = None,
+               etag: str | None = None):
+        self.paths.append(path)
+        self.is_dir.append(is_dir)
+        self.sizes.append(MISSING_SIZE if size is None else size)
+        self.mtimes.append(MISSING_MTIME if mtime is None else mtime)
+        self.etags.append(etag)
@@ -0,0 +1,176 @@
+import heapq
+import itertools
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    resident_bytes: int = 0
+
+
+class EvictionPolicy(metaclass=ABCMeta):
+    """
+    Decides which entry leaves a bounded store first. Every method must be O(1) or O(log n).
+    """
+
+    @abstractmethod
+    def add(self, key: str, size: int):
+        pass
+
+    @abstractmethod
+    def touch(self, key: str):
+        pass
+
+    @abstractmethod
+    def remove(self, key: str):
+        pass
+
+    @abstractmethod
+    def victim(self) -> str:
+        """
+        Returns key to evict next, raises ``KeyError`` when there is nothing to evict
+        """
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    Evicts the least recently used entry
+    """
+
+    def __init__(self):
+        self._keys = OrderedDict()
+
+    def add(self, key: str, size: int):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+
+    def touch(self, key: str):
+        self._keys.move_to_end(key)
+
+    def remove(self, key: str):
+        self._keys.pop(key, None)
+
+    def victim(self) -> str:
+        try:
+            return next(iter(self._keys))
+        except StopIteration:
+            raise KeyError('Nothing to evict') from None
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evicts the least frequently used entry, the least recently used one among equally frequent entries
+    """
+
+    def __init__(self):
+        self._frequencies: Dict[str, int] = {}
+        self._buckets: Dict[int, OrderedDict] = {}
+        self._min_frequency = 0
+
+    def _unlink(self, key: str) -> int:
+        frequency = self._frequencies.pop(key)
+        bucket = self._buckets[frequency]
+        del bucket[key]
+
+        if not bucket:
+            del self._buckets[frequency]
+
+        return frequency
+
+    def _link(self, key: str, frequency: int):
+        self._frequencies[key] = frequency
+        self._buckets.setdefault(frequency, OrderedDict())[key] = None
+
+    def add(self, key: str, size: int):
+        if key in self._frequencies:
+            self._unlink(key)
+
+        self._link(key, 1)
+        self._min_frequency = 1
+
+    def touch(self, key: str):
+        frequency = self._unlink(key)
+        self._link(key, frequency + 1)
+
+        if frequency == self._min_frequency and frequency not in self._buckets:
+            self._min_frequency = frequency + 1
+
+    def remove(self, key: str):
+        if key in self._frequencies:
+            self._unlink(key)
+
+    def victim(self) -> str:
+        if not self._buckets:
+            raise KeyError('Nothing to evict')
+
+        if self._min_frequency not in self._buckets:
+            self._min_frequency = min(self._buckets)
+
+        return next(iter(self._buckets[self._min_frequency]))
+
+
+class SizePolicy(EvictionPolicy):
+    """
+    Evicts the largest entry first, keeping as many small hot objects resident as possible.
+
+    Rewritten and removed keys leave stale heap entries behind, which are dropped by rebuilding the heap once it holds
+    twice as many entries as there are keys.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._heap = []
+        self._counter = itertools.count()
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._versions) + 1:
+            self._heap = [entry for entry in self._heap if self._versions.get(entry[2]) == entry[1]]
+            heapq.heapify(self._heap)
+
+    def add(self, key: str, size: int):
+        version = next(self._counter)
+        self._versions[key] = version
+        heapq.heappush(self._heap, (-size, version, key))
+        self._compact()
+
+    def touch(self, key: str):
+        pass
+
+    def remove(self, key: str):
+        if self._versions.pop(key, None) is not None:
+            self._compact()
+
+    def victim(self) -> str:
+        while self._heap:
+            _, version, key = self._heap[0]
+
+            if self._versions.get(key) == version:
+                return key
+
+            heapq.heappop(self._heap)
+
+        raise KeyError('Nothing to evict')
+
+
+POLICIES = {
+    'lfu': LFUPolicy,
+    'lru': LRUPolicy,
+    'size': SizePolicy,
+}
+
+
+def get_eviction_policy(policy: str | EvictionPolicy) -> EvictionPolicy:
+    if isinstance(policy, EvictionPolicy):
+        return policy
+
+    try:
+        return POLICIES[policy]()
+    except KeyError:
+        raise ValueError(f'Unsupported eviction policy: {policy}') from None
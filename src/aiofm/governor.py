@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Mapping, Tuple
+
+from botocore.exceptions import ClientError
+
+from aiofm.retry import is_minio_error
+
+logger = logging.getLogger(__name__)
+
+# Request rates S3 sustains per partitioned prefix, see "Best practices design patterns: optimizing Amazon S3
+# performance"
+DEFAULT_RATES: Mapping[str, float | None] = {'GET': 5500.0, 'PUT': 3500.0, 'LIST': 5500.0, 'DELETE': 3500.0}
+OPERATION_CLASSES: Mapping[str, str] = {
+    'bucket_exists': 'GET',
+    'get_object': 'GET',
+    'head_bucket': 'GET',
+    'head_object': 'GET',
+    'stat_object': 'GET',
+    'list_objects': 'LIST',
+    'list_objects_v2': 'LIST',
+    'abort_multipart_upload': 'PUT',
+    'complete_multipart_upload': 'PUT',
+    'copy_object': 'PUT',
+    'create_multipart_upload': 'PUT',
+    'put_object': 'PUT',
+    'upload_part': 'PUT',
+    'upload_part_copy': 'PUT',
+    'delete_object': 'DELETE',
+    'delete_objects': 'DELETE',
+    'remove_object': 'DELETE',
+    'remove_objects': 'DELETE',
+}
+THROTTLING_STATUS_CODES = frozenset((429, 503))
+THROTTLING_ERROR_CODES = frozenset((
+    'RequestLimitExceeded', 'SlowDown', 'Throttling', 'ThrottlingException', 'TooManyRequests',
+    'TooManyRequestsException',
+))
+
+
+def is_throttling(error: BaseException) -> bool:
+    if isinstance(error, ClientError):
+        return (
+            error.response.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+            or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in THROTTLING_STATUS_CODES
+        )
+
+    if is_minio_error(error):
+        return error.code in THROTTLING_ERROR_CODES or error.response.status in THROTTLING_STATUS_CODES
+
+    return False
+
+
+class TokenBucket:
+    """
+    Token bucket allowing ``rate`` requests per second with bursts of up to ``burst`` requests.
+
+    Callers waiting for a token reserve it right away and sleep until it is due, so waiters are served in order
+    without locks or background tasks. ``throttle`` cuts the rate multiplicatively and ``succeed`` raises it back
+    additively, up to the configured rate.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None, min_rate: float = 1.0, increase: float = 1.0):
+        if rate <= 0:
+            raise ValueError('Rate must be a positive number')
+
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(rate, 1.0) if burst is None else burst
+        self.min_rate = min(min_rate, rate)
+        self.increase = increase
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(rate={self.rate}, burst={self.burst})'
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        self._refill()
+        self._tokens -= 1
+
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def throttle(self, decrease: float):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * decrease)
+        # Drop the saved up burst, so that the lower rate applies right away
+        self._tokens = min(self._tokens, 0.0)
+
+    def succeed(self):
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RequestGovernor:
+    """
+    Client side rate limiter of the requests made by one S3 compatible protocol.
+
+    Requests are grouped into ``GET``, ``PUT``, ``LIST`` and ``DELETE`` classes with their own ``rates`` in requests
+    per second, ``None`` meaning unlimited. Each class has a token bucket per bucket or, with ``prefix_depth``, per key
+    prefix made of that many leading path segments, matching how S3 partitions its request rate limits. Requests
+    without a key, e.g. ``DeleteObjects``, count against the bucket wide prefix.
+
+    Throttling responses like ``503 SlowDown`` multiply the rate of their token bucket by ``decrease``, while every
+    successful request adds ``increase`` requests per second back, so the rates settle just below what the service
+    accepts instead of turning into retry storms. ``max_concurrency`` optionally caps the number of requests in flight
+    per class.
+    """
+
+    def __init__(self, rates: Mapping[str, float | None] = DEFAULT_RATES, prefix_depth: int | None = None,
+                 burst: float | None = None, decrease: float = 0.5, increase: float = 1.0, min_rate: float = 1.0,
+                 max_concurrency: Mapping[str, int] | None = None):
+        if not 0 < decrease < 1:
+            raise ValueError('Decrease must be between 0 and 1')
+
+        if prefix_depth is not None and prefix_depth < 1:
+            raise ValueError('Prefix depth must be a positive number')
+
+        self.rates = {**DEFAULT_RATES, **rates}
+        self.prefix_depth = prefix_depth
+        self.burst = burst
+        self.decrease = decrease
+        self.increase = increase
+        self.min_rate = min_rate
+        self.throttled = 0
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {
+            operation_class: asyncio.Semaphore(limit) for operation_class, limit in (max_concurrency or {}).items()
+        }
+
+    def _prefix(self, key: str) -> str:
+        if self.prefix_depth is None or not key:
+            return ''
+
+        return '/'.join(key.split('/', self.prefix_depth)[:self.prefix_depth])
+
+    def get_bucket(self, operation_class: str, bucket_name: str | None, key: str = '') -> TokenBucket | None:
+        """
+        Returns the token bucket limiting requests of the class to the key, ``None`` when they are not limited
+        """
+
+        rate = self.rates.get(operation_class)
+
+        if rate is None:
+            return None
+
+        bucket_key = operation_class, bucket_name or '', self._prefix(key)
+
+        try:
+            return self._buckets[bucket_key]
+        except KeyError:
+            bucket = self._buckets[bucket_key] = TokenBucket(rate, self.burst, self.min_rate, self.increase)
+
+            return bucket
+
+    async def call(self, operation_name: str, bucket_name: str | None, key: str | None,
+                   function: Callable[..., Awaitable], *args, **kwargs):
+        """
+        Awaits ``function(*args, **kwargs)`` making the ``operation_name`` request once the governor lets it through
+        """
+
+        operation_class = OPERATION_CLASSES.get(operation_name, 'GET')
+        bucket = self.get_bucket(operation_class, bucket_name, key or '')
+        semaphore = self._semaphores.get(operation_class)
+
+        if bucket is not None:
+            await bucket.acquire()
+
+        try:
+            if semaphore is None:
+                result = await function(*args, **kwargs)
+            else:
+                async with semaphore:
+                    result = await function(*args, **kwargs)
+        except Exception as e:
+            if bucket is not None and is_throttling(e):
+                bucket.throttle(self.decrease)
+                self.throttled += 1
+                logger.debug('%s requests to %s/%s throttled, lowering rate to %.1f/s', operation_class, bucket_name,
+                             key, bucket.rate)
+
+            raise
+
+        if bucket is not None:
+            bucket.succeed()
+
+        return result
@@ -1,11 +1,163 @@
+import asyncio
+import inspect
+import io
 from collections import defaultdict
 from io import StringIO, BytesIO
+from typing import AsyncGenerator, AsyncIterable, Coroutine, Sequence
 
 
 def nested_defaultdict():
     return defaultdict(nested_defaultdict)
 
 
+async def aread(f, size: int = -1):
+    """
+    Reads from either a regular or an async file object
+    """
+
+    data = f.read(size)
+
+    if inspect.isawaitable(data):
+        data = await data
+
+    return data
+
+
+async def awrite(f, data) -> int:
+    """
+    Writes to either a regular or an async file object
+    """
+
+    written = f.write(data)
+
+    if inspect.isawaitable(written):
+        written = await written
+
+    return written
+
+
+def cancel_detached(task: asyncio.Future):
+    """
+    Cancels a task nobody is going to await, retrieving its exception so that it is not logged as never retrieved
+    """
+
+    task.cancel()
+    task.add_done_callback(_retrieve_exception)
+
+
+def _retrieve_exception(task: asyncio.Future):
+    if not task.cancelled():
+        task.exception()
+
+
+async def batched(iterable: AsyncIterable, size: int) -> AsyncGenerator[list, None]:
+    batch = []
+
+    async for item in iterable:
+        batch.append(item)
+
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def run_concurrently(coroutines: AsyncIterable[Coroutine], limit: int) -> int:
+    """
+    Runs coroutines produced by an async iterable with at most ``limit`` of them in flight.
+
+    The iterable is consumed lazily, so huge listings never have to be materialised. The first failure cancels the
+    remaining coroutines and is re-raised. Returns the number of coroutines run.
+    """
+
+    if limit < 1:
+        raise ValueError('Concurrency limit must be a positive number')
+
+    pending = set()
+    count = 0
+
+    iterator = aiter(coroutines)
+
+    try:
+        while True:
+            if len(pending) >= limit:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    task.result()
+
+            try:
+                coroutine = await anext(iterator)
+            except StopAsyncIteration:
+                break
+
+            pending.add(asyncio.ensure_future(coroutine))
+            count += 1
+
+        await asyncio.gather(*pending)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+
+    return count
+
+
+async def merge_concurrently(iterables: Sequence[AsyncIterable], limit: int, ordered: bool = True,
+                             buffer_size: int = 1) -> AsyncGenerator:
+    """
+    Yields items of the async iterables, consuming at most ``limit`` of them at a time.
+
+    With ``ordered`` all items of an iterable are yielded before those of the next one, while the ones consumed ahead
+    hold up to ``buffer_size`` items each. Otherwise items are yielded as soon as any iterable produces them. A failure
+    is re-raised once its turn comes and cancels the remaining iterables.
+    """
+
+    if limit < 1:
+        raise ValueError('Concurrency limit must be a positive number')
+
+    semaphore = asyncio.Semaphore(limit)
+
+    if ordered:
+        queues = [asyncio.Queue(buffer_size) for _ in iterables]
+    else:
+        queues = [asyncio.Queue(buffer_size * limit)] * len(iterables)
+
+    async def consume(iterable: AsyncIterable, queue: asyncio.Queue):
+        async with semaphore:
+            try:
+                async for item in iterable:
+                    await queue.put((True, item))
+            except Exception as e:
+                await queue.put((False, e))
+            else:
+                await queue.put((False, None))
+
+    tasks = [asyncio.ensure_future(consume(iterable, queue)) for iterable, queue in zip(iterables, queues)]
+
+    try:
+        finished = 0
+
+        while finished < len(tasks):
+            has_item, item = await queues[finished if ordered else 0].get()
+
+            if has_item:
+                yield item
+            elif item is not None:
+                raise item
+            else:
+                finished += 1
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 class ContextualStringIO(StringIO):
     async def __aenter__(self):
         return self
@@ -22,3 +174,137 @@ class ContextualBytesIO(BytesIO):
     async def __aexit__(self, *args):
         self.close()
         return False
+
+
+class ContextualTextIOWrapper(io.TextIOWrapper):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+        return False
+
+
+class MemoryReader(io.BufferedIOBase):
+    """
+    Read-only binary file over an existing buffer.
+
+    The buffer is never copied: ``getbuffer()`` and ``readview()`` return read-only ``memoryview`` slices,
+    ``readinto()`` fills caller buffers directly and reading a ``bytes`` buffer whole returns the buffer itself.
+    """
+
+    def __init__(self, buffer: bytes | bytearray):
+        super().__init__()
+        self._buffer = buffer
+        self._view = memoryview(buffer).toreadonly()
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        self._checkClosed()
+
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+
+        if position < 0:
+            raise ValueError(f'Negative seek position {position}')
+
+        self._position = position
+
+        return position
+
+    def getbuffer(self) -> memoryview:
+        self._checkClosed()
+
+        return self._view
+
+    def readview(self, size: int = -1) -> memoryview:
+        self._checkClosed()
+        start = min(self._position, len(self._view))
+        end = len(self._view) if size is None or size < 0 else min(start + size, len(self._view))
+        self._position = end
+
+        return self._view[start:end]
+
+    def read(self, size: int = -1) -> bytes:
+        if self._position == 0 and (size is None or size < 0) and type(self._buffer) is bytes:
+            self._checkClosed()
+            self._position = len(self._buffer)
+
+            return self._buffer
+
+        return self.readview(size).tobytes()
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+    def readinto(self, buffer) -> int:
+        with memoryview(buffer) as target, target.cast('B') as target_bytes:
+            view = self.readview(len(target_bytes))
+            target_bytes[:len(view)] = view
+
+            return len(view)
+
+    def readinto1(self, buffer) -> int:
+        return self.readinto(buffer)
+
+    def close(self):
+        super().close()
+        self._view = self._buffer = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+        return False
+
+
+class MemoryWriter(io.BufferedIOBase):
+    """
+    Append-only binary file accumulating data in a ``bytearray`` that ``getvalue()`` hands over without copying
+    """
+
+    def __init__(self, initial_value: bytes | bytearray = b''):
+        super().__init__()
+        self._buffer = bytearray(initial_value)
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        self._checkClosed()
+
+        return len(self._buffer)
+
+    def write(self, data) -> int:
+        self._checkClosed()
+        self._buffer += data
+
+        return len(data) if isinstance(data, (bytes, bytearray)) else memoryview(data).nbytes
+
+    def getvalue(self) -> bytearray:
+        return self._buffer
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+        return False
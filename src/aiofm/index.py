@@ -0,0 +1,229 @@
+import os
+import sqlite3
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Iterable, List, Sequence, Tuple
+
+from aiofm.entries import Entry
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    etag TEXT,
+    seen_at REAL NOT NULL,
+    changed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT NOT NULL,
+    recursive INTEGER NOT NULL,
+    listed_at REAL NOT NULL,
+    PRIMARY KEY (path, recursive)
+) WITHOUT ROWID;
+'''
+UPSERT_ENTRY = '''
+INSERT INTO entries (path, parent, is_dir, size, mtime, etag, seen_at, changed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (path) DO UPDATE SET
+    changed_at = CASE
+        WHEN is_dir = excluded.is_dir AND size IS excluded.size AND etag IS excluded.etag THEN changed_at
+        ELSE excluded.changed_at
+    END,
+    is_dir = excluded.is_dir,
+    size = excluded.size,
+    mtime = excluded.mtime,
+    etag = excluded.etag,
+    seen_at = excluded.seen_at
+'''
+INSERT_DIR = '''
+INSERT INTO entries (path, parent, is_dir, seen_at, changed_at) VALUES (?, ?, 1, ?, ?)
+ON CONFLICT (path) DO UPDATE SET seen_at = excluded.seen_at
+'''
+ENTRY_COLUMNS = 'path, is_dir, size, mtime, etag'
+
+
+@dataclass
+class IndexResync:
+    """
+    Outcome of a listing stored in a ``MetadataIndex``: ``changed`` entries were added or got a new size or ETag,
+    ``removed`` ones were no longer listed. ``listed_at`` is the watermark to ask ``changes`` for newer changes with.
+    """
+
+    listed_at: float
+    changed: int = 0
+    removed: int = 0
+
+
+def _parent(path: str) -> str:
+    return str(PurePath(path).parent)
+
+
+def _subtree(path: str) -> Tuple[str, str]:
+    """
+    Returns bounds of the paths under the directory, ``'0'`` being the character after ``'/'``
+    """
+
+    prefix = f'{path.rstrip("/")}/'
+
+    return prefix, f'{prefix[:-1]}0'
+
+
+def _to_entry(row: Sequence) -> Entry:
+    path, is_dir, size, mtime, etag = row
+
+    return Entry(PurePath(path), bool(is_dir), size, mtime, etag)
+
+
+class MetadataIndex:
+    """
+    SQLite store of listed entries and of the time every directory was listed at, used by ``IndexedProtocol``.
+
+    ``database`` is a file path, which keeps the index across processes, or ``:memory:``. Methods block, the
+    connection may be used from any thread but from one at a time.
+    """
+
+    def __init__(self, database: str | os.PathLike = ':memory:'):
+        self.database = database
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+
+        if database != ':memory:':
+            self._connection.execute('PRAGMA journal_mode=WAL')
+
+        self._connection.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.database!r})'
+
+    def close(self):
+        self._connection.close()
+
+    def listed_at(self, path: str, recursive: bool = False) -> float | None:
+        """
+        Returns when the directory was last listed, either by itself or by a recursive listing of its ancestors
+        """
+
+        ancestors = [str(parent) for parent in PurePath(path).parents]
+        placeholders = ', '.join('?' * len(ancestors))
+        query = 'SELECT MAX(listed_at) FROM listings WHERE (path = ? AND recursive >= ?)'
+
+        if ancestors:
+            query = f'{query} OR (recursive AND path IN ({placeholders}))'
+
+        return self._connection.execute(query, (path, int(recursive), *ancestors)).fetchone()[0]
+
+    def get(self, path: str) -> Entry | None:
+        row = self._connection.execute(f'SELECT {ENTRY_COLUMNS} FROM entries WHERE path = ?', (path,)).fetchone()
+
+        return None if row is None else _to_entry(row)
+
+    def children(self, path: str) -> sqlite3.Cursor:
+        return self._connection.execute(
+            f'SELECT {ENTRY_COLUMNS} FROM entries WHERE parent = ? ORDER BY path', (path,)
+        )
+
+    def descendants(self, path: str) -> sqlite3.Cursor:
+        return self._connection.execute(
+            f'SELECT {ENTRY_COLUMNS} FROM entries WHERE path > ? AND path < ? ORDER BY path', _subtree(path)
+        )
+
+    def changes(self, path: str, since: float) -> sqlite3.Cursor:
+        """
+        Returns entries under the directory added or changed by listings made after ``since``
+        """
+
+        return self._connection.execute(
+            f'SELECT {ENTRY_COLUMNS} FROM entries WHERE path > ? AND path < ? AND changed_at > ? ORDER BY path',
+            (*_subtree(path), since)
+        )
+
+    @staticmethod
+    def fetch(cursor: sqlite3.Cursor, size: int) -> List[Entry]:
+        return [_to_entry(row) for row in cursor.fetchmany(size)]
+
+    def store(self, entries: Iterable[Entry], root: str, seen_at: float):
+        """
+        Stores listed entries along with the directories between them and the listed ``root``
+        """
+
+        dirs = set()
+        rows = []
+
+        for entry in entries:
+            path = str(entry.path)
+            parent = _parent(path)
+            rows.append((path, parent, int(entry.is_dir), entry.size, entry.mtime, entry.etag, seen_at, seen_at))
+
+            while len(parent) > len(root) and parent not in dirs:
+                dirs.add(parent)
+                parent = _parent(parent)
+
+        with self._connection:
+            self._connection.executemany(UPSERT_ENTRY, rows)
+            self._connection.executemany(INSERT_DIR, [(path, _parent(path), seen_at, seen_at) for path in dirs])
+
+    def finish(self, root: str, recursive: bool, listed_at: float) -> IndexResync:
+        """
+        Records the listing of the directory once all its entries are stored, dropping entries it did not return
+        """
+
+        resync = IndexResync(listed_at)
+        lower, upper = _subtree(root)
+
+        with self._connection:
+            if recursive:
+                removed = self._connection.execute(
+                    'DELETE FROM entries WHERE path > ? AND path < ? AND seen_at < ?', (lower, upper, listed_at)
+                ).rowcount
+            else:
+                removed_paths = [row[0] for row in self._connection.execute(
+                    'SELECT path FROM entries WHERE parent = ? AND seen_at < ?', (root, listed_at)
+                )]
+                removed = 0
+
+                for path in removed_paths:
+                    removed += self._remove(path)
+
+            resync.removed = removed
+            self._connection.execute(INSERT_DIR, (root, _parent(root), listed_at, listed_at))
+            resync.changed = self._connection.execute(
+                'SELECT COUNT(*) FROM entries WHERE path > ? AND path < ? AND changed_at = ?', (lower, upper, listed_at)
+            ).fetchone()[0]
+            self._connection.execute(
+                'INSERT OR REPLACE INTO listings (path, recursive, listed_at) VALUES (?, ?, ?)',
+                (root, int(recursive), listed_at)
+            )
+
+        return resync
+
+    def _remove(self, path: str) -> int:
+        removed = self._connection.execute('DELETE FROM entries WHERE path = ?', (path,)).rowcount
+        removed += self._connection.execute('DELETE FROM entries WHERE path > ? AND path < ?', _subtree(path)).rowcount
+        self._connection.execute('DELETE FROM listings WHERE path = ? OR (path > ? AND path < ?)',
+                                 (path, *_subtree(path)))
+
+        return removed
+
+    def remove(self, path: str):
+        """
+        Forgets the entry and everything under it, e.g. once it is deleted
+        """
+
+        with self._connection:
+            self._remove(path)
+
+    def forget_listings(self, path: str):
+        """
+        Marks listings that may have missed a change of the path as outdated
+        """
+
+        ancestors = [str(parent) for parent in PurePath(path).parents]
+
+        with self._connection:
+            self._connection.execute(
+                f'DELETE FROM listings WHERE path IN ({", ".join("?" * (len(ancestors) + 1))}) '
+                f'OR (path > ? AND path < ?)',
+                (path, *ancestors, *_subtree(path))
+            )
@@ -1,24 +1,61 @@
-from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import Mapping, Tuple
+
+from aiofm.protocols import BaseProtocol, get_protocol, split_url
+from aiofm.transfer import transfer
 
 
 class FileManager:
-    @staticmethod
-    def cp(src_path: str, dst_path: str):
-        raise NotImplemented
-
-    @staticmethod
-    def rm(path: str):
-        raise NotImplemented
-
-    @staticmethod
-    def ls(path: str):
-        raise NotImplemented
-
-    @staticmethod
-    def mkdir(path: str):
-        raise NotImplemented
-
-    @staticmethod
-    @asynccontextmanager
-    def open(path: str, mode: str = 'r'):
-        raise NotImplemented
+    """
+    Dispatches URL paths like ``s3://bucket/key`` or ``mem:///tmp/file`` to protocols.
+
+    Protocol instances are taken from the shared registry, so every manager created with the same per-scheme
+    options, e.g. ``FileManager(s3={'endpoint_url': ...})``, reuses the same clients.
+    """
+
+    def __init__(self, **protocol_options: Mapping):
+        self.protocol_options = protocol_options
+
+    def resolve(self, path: str | PurePath) -> Tuple[BaseProtocol, str]:
+        scheme, protocol_path = split_url(path)
+
+        return get_protocol(scheme, **self.protocol_options.get(scheme, {})), protocol_path
+
+    async def cp(self, src_path: str, dst_path: str, **kwargs):
+        src_protocol, src_protocol_path = self.resolve(src_path)
+        dst_protocol, dst_protocol_path = self.resolve(dst_path)
+
+        if src_protocol is dst_protocol:
+            return await src_protocol.cp(src_protocol_path, dst_protocol_path)
+
+        return await transfer(src_protocol, src_protocol_path, dst_protocol, dst_protocol_path, **kwargs)
+
+    async def rm(self, path: str):
+        protocol, protocol_path = self.resolve(path)
+
+        return await protocol.rm(protocol_path)
+
+    def ls(self, path: str, *args, **kwargs):
+        protocol, protocol_path = self.resolve(path)
+
+        return protocol.ls(protocol_path, *args, **kwargs)
+
+    def scan(self, path: str, *args, **kwargs):
+        protocol, protocol_path = self.resolve(path)
+
+        return protocol.scan(protocol_path, *args, **kwargs)
+
+    def scan_columns(self, path: str, *args, **kwargs):
+        protocol, protocol_path = self.resolve(path)
+
+        return protocol.scan_columns(protocol_path, *args, **kwargs)
+
+    async def mkdir(self, path: str):
+        protocol, protocol_path = self.resolve(path)
+
+        return await protocol.mkdir(protocol_path)
+
+    def open(self, path: str, *args, **kwargs):
+        protocol, protocol_path = self.resolve(path)
+
+        return protocol.open(protocol_path, *args, **kwargs)
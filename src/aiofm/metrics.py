@@ -0,0 +1,384 @@
+import asyncio
+import bisect
+import functools
+import inspect
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Sequence, Tuple
+
+DEFAULT_LATENCY_BOUNDS = tuple(0.001 * 2 ** i for i in range(17))
+INSTRUMENTED_OPERATIONS = (
+    'cp', 'exists', 'glob', 'is_dir', 'ls', 'mkdir', 'mkdirs', 'mv', 'open', 'rm', 'scan', 'scan_columns', 'walk',
+)
+
+
+class MetricsSink:
+    """
+    Receives instrumentation of protocols created with ``metrics=sink``.
+
+    ``operation`` is called after every public protocol operation, ``request`` after every request made to a remote
+    storage, ``retry`` before a request is retried and ``transfer`` after data is read from or written to a file.
+    Durations are in seconds and ``error`` is the exception the call failed with, if any. All methods do nothing, so
+    subclasses override only the events they need.
+    """
+
+    def operation(self, backend: str, bucket: str | None, operation: str, duration: float,
+                  error: BaseException | None):
+        pass
+
+    def request(self, backend: str, bucket: str | None, operation: str, duration: float,
+                error: BaseException | None):
+        pass
+
+    def retry(self, backend: str, bucket: str | None, operation: str, error: BaseException):
+        pass
+
+    def transfer(self, backend: str, bucket: str | None, direction: str, size: int):
+        pass
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies with exponential bucket ``bounds`` in seconds, the last bucket being unbounded
+    """
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_LATENCY_BOUNDS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(count={self.count}, sum={self.sum})'
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the percentile, ``inf`` for the unbounded bucket
+        """
+
+        if not self.count:
+            raise ValueError('No latencies recorded')
+
+        rank = q * self.count
+        seen = 0
+
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+
+            if seen >= rank and seen:
+                return bound
+
+        return float('inf')
+
+
+@dataclass
+class OperationStats:
+    count: int = 0
+    errors: int = 0
+    retries: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+class StatsSink(MetricsSink):
+    """
+    Aggregates metrics in memory, keyed by ``(backend, bucket, operation)`` for ``operations`` and ``requests`` and
+    by ``(backend, bucket)`` for ``bytes_read`` and ``bytes_written``
+    """
+
+    def __init__(self):
+        self.operations: Dict[Tuple[str, str | None, str], OperationStats] = {}
+        self.requests: Dict[Tuple[str, str | None, str], OperationStats] = {}
+        self.bytes_read: Counter = Counter()
+        self.bytes_written: Counter = Counter()
+
+    @staticmethod
+    def _record(stats: Dict, key: Tuple, duration: float, error: BaseException | None):
+        try:
+            operation_stats = stats[key]
+        except KeyError:
+            operation_stats = stats[key] = OperationStats()
+
+        operation_stats.count += 1
+        operation_stats.latency.observe(duration)
+
+        if error is not None:
+            operation_stats.errors += 1
+
+    def operation(self, backend: str, bucket: str | None, operation: str, duration: float,
+                  error: BaseException | None):
+        self._record(self.operations, (backend, bucket, operation), duration, error)
+
+    def request(self, backend: str, bucket: str | None, operation: str, duration: float,
+                error: BaseException | None):
+        self._record(self.requests, (backend, bucket, operation), duration, error)
+
+    def retry(self, backend: str, bucket: str | None, operation: str, error: BaseException):
+        key = backend, bucket, operation
+
+        try:
+            self.requests[key].retries += 1
+        except KeyError:
+            self.requests[key] = OperationStats(retries=1)
+
+    def transfer(self, backend: str, bucket: str | None, direction: str, size: int):
+        if direction == 'read':
+            self.bytes_read[backend, bucket] += size
+        else:
+            self.bytes_written[backend, bucket] += size
+
+
+class TracingSink(MetricsSink):
+    """
+    Reports operations and requests as spans of an OpenTelemetry compatible ``tracer``.
+
+    Spans are created once the call is over with its start time set back by its duration, so they are siblings under
+    the span current at the time of the call.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+        try:
+            from opentelemetry.trace import Status, StatusCode
+        except ImportError:
+            self._error_status = None
+        else:
+            self._error_status = functools.partial(Status, StatusCode.ERROR)
+
+    def _span(self, name: str, duration: float, error: BaseException | None, attributes: Dict[str, Any]):
+        end_time = time.time_ns()
+        span = self.tracer.start_span(name, start_time=end_time - int(duration * 1e9),
+                                      attributes={key: value for key, value in attributes.items() if value is not None})
+
+        if error is not None:
+            span.record_exception(error)
+
+            if self._error_status is not None:
+                span.set_status(self._error_status(str(error)))
+
+        span.end(end_time=end_time)
+
+    def operation(self, backend: str, bucket: str | None, operation: str, duration: float,
+                  error: BaseException | None):
+        self._span(f'aiofm.{operation}', duration, error, {'aiofm.backend': backend, 'aiofm.bucket': bucket})
+
+    def request(self, backend: str, bucket: str | None, operation: str, duration: float,
+                error: BaseException | None):
+        self._span(f'aiofm.request.{operation}', duration, error, {'aiofm.backend': backend, 'aiofm.bucket': bucket})
+
+
+class Instrumentation:
+    """
+    Metrics sink bound to one protocol, wrapping its operations, requests and files
+    """
+
+    __slots__ = ('sink', 'backend')
+
+    def __init__(self, sink: MetricsSink, backend: str):
+        self.sink = sink
+        self.backend = backend
+
+    def instrument(self, protocol, operations: Sequence[str] = INSTRUMENTED_OPERATIONS):
+        """
+        Replaces the operations of the protocol instance with measured ones
+        """
+
+        for name in operations:
+            setattr(protocol, name, self._wrap_operation(protocol, name, getattr(protocol, name)))
+
+    def _wrap_operation(self, protocol, name: str, method: Callable) -> Callable:
+        # The first parameter is the path the bucket is taken from, whichever name it has
+        path_name = next(iter(inspect.signature(method).parameters))
+
+        def measured(*args, **kwargs):
+            path = args[0] if args else kwargs.get(path_name)
+            bucket = protocol._bucket_name(path) if path is not None else None
+            result = method(*args, **kwargs)
+
+            if inspect.isasyncgen(result):
+                return self._measure_generator(result, bucket, name)
+
+            if hasattr(result, '__aenter__'):
+                return _MeasuredContext(self, result, bucket, name)
+
+            if inspect.isawaitable(result):
+                return self._measure(result, bucket, name)
+
+            return result
+
+        return measured
+
+    async def _measure(self, awaitable: Awaitable, bucket: str | None, operation: str):
+        started_at = time.perf_counter()
+        error = None
+
+        try:
+            return await awaitable
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.sink.operation(self.backend, bucket, operation, time.perf_counter() - started_at, error)
+
+    async def _measure_generator(self, generator: AsyncGenerator, bucket: str | None,
+                                 operation: str) -> AsyncGenerator:
+        started_at = time.perf_counter()
+        error = None
+
+        try:
+            async for item in generator:
+                yield item
+        except GeneratorExit:
+            # The consumer stopped early, which is not an error
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await generator.aclose()
+            self.sink.operation(self.backend, bucket, operation, time.perf_counter() - started_at, error)
+
+    def request(self, bucket: str | None, operation: str, function: Callable[..., Awaitable]) -> 'RequestRecorder':
+        return RequestRecorder(self, bucket, operation, function)
+
+
+class RequestRecorder:
+    """
+    Measures every attempt of one request. An attempt made after a failed one is counted as a retry.
+    """
+
+    __slots__ = ('instrumentation', 'bucket', 'operation', 'function', '_failure')
+
+    def __init__(self, instrumentation: Instrumentation, bucket: str | None, operation: str,
+                 function: Callable[..., Awaitable]):
+        self.instrumentation = instrumentation
+        self.bucket = bucket
+        self.operation = operation
+        self.function = function
+        self._failure = None
+
+    async def __call__(self, *args, **kwargs):
+        sink = self.instrumentation.sink
+        backend = self.instrumentation.backend
+
+        if self._failure is not None:
+            sink.retry(backend, self.bucket, self.operation, self._failure)
+            self._failure = None
+
+        started_at = time.perf_counter()
+        error = None
+
+        try:
+            return await self.function(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Hedged requests that lost the race are cancelled, which is not a failure
+            raise
+        except Exception as e:
+            error = self._failure = e
+            raise
+        finally:
+            sink.request(backend, self.bucket, self.operation, time.perf_counter() - started_at, error)
+
+
+class _MeasuredContext:
+    """
+    Measures opening a file together with closing it, which is when writes are completed
+    """
+
+    def __init__(self, instrumentation: Instrumentation, context, bucket: str | None, operation: str):
+        self._instrumentation = instrumentation
+        self._context = context
+        self._bucket = bucket
+        self._operation = operation
+        self._started_at = None
+
+    def _report(self, error: BaseException | None):
+        self._instrumentation.sink.operation(self._instrumentation.backend, self._bucket, self._operation,
+                                             time.perf_counter() - self._started_at, error)
+
+    async def __aenter__(self):
+        self._started_at = time.perf_counter()
+
+        try:
+            f = await self._context.__aenter__()
+        except BaseException as e:
+            self._report(e)
+            raise
+
+        return MeasuredFile(f, self._instrumentation, self._bucket)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        error = None
+
+        try:
+            return await self._context.__aexit__(exc_type, exc_val, exc_tb)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._report(error)
+
+
+class MeasuredFile:
+    """
+    File proxy reporting the amount of data read and written, supports both regular and async file objects
+    """
+
+    def __init__(self, f, instrumentation: Instrumentation, bucket: str | None):
+        self._file = f
+        self._instrumentation = instrumentation
+        self._bucket = bucket
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+    def _count(self, direction: str, size: int):
+        self._instrumentation.sink.transfer(self._instrumentation.backend, self._bucket, direction, size)
+
+    def _report(self, result, direction: str):
+        if inspect.isawaitable(result):
+            return self._report_later(result, direction)
+
+        self._count(direction, result if isinstance(result, int) else len(result or b''))
+
+        return result
+
+    async def _report_later(self, awaitable: Awaitable, direction: str):
+        result = await awaitable
+        self._count(direction, result if isinstance(result, int) else len(result or b''))
+
+        return result
+
+    def read(self, *args, **kwargs):
+        return self._report(self._file.read(*args, **kwargs), 'read')
+
+    def readline(self, *args, **kwargs):
+        return self._report(self._file.readline(*args, **kwargs), 'read')
+
+    def readinto(self, buffer):
+        return self._report(self._file.readinto(buffer), 'read')
+
+    def write(self, data):
+        return self._report(self._file.write(data), 'write')
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._report(next(self._file), 'read')
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._report_later(self._file.__anext__(), 'read')
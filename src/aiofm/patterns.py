@@ -0,0 +1,120 @@
+import re
+from functools import lru_cache
+from typing import Sequence
+
+WILDCARDS = frozenset('*?[')
+RECURSIVE_WILDCARD = '**'
+
+
+def _translate_segment(segment: str) -> str:
+    regex = []
+    i = 0
+
+    while i < len(segment):
+        c = segment[i]
+        i += 1
+
+        if c == '*':
+            while i < len(segment) and segment[i] == '*':
+                i += 1
+
+            regex.append('[^/]*')
+        elif c == '?':
+            regex.append('[^/]')
+        elif c == '[':
+            j = i
+
+            if j < len(segment) and segment[j] == '!':
+                j += 1
+
+            if j < len(segment) and segment[j] == ']':
+                j += 1
+
+            j = segment.find(']', j)
+
+            if j == -1:
+                regex.append(re.escape(c))
+            else:
+                characters = segment[i:j].replace('\\', '\\\\')
+                i = j + 1
+
+                if characters.startswith('!'):
+                    characters = f'^{characters[1:]}'
+                elif characters.startswith('^'):
+                    characters = f'\\{characters}'
+
+                regex.append(f'[{characters}]')
+        else:
+            regex.append(re.escape(c))
+
+    return ''.join(regex)
+
+
+def literal_prefix(pattern: str) -> str:
+    """
+    Returns the part of the pattern before its first wildcard
+    """
+
+    for i, c in enumerate(pattern):
+        if c in WILDCARDS:
+            return pattern[:i]
+
+    return pattern
+
+
+class GlobPattern:
+    """
+    Glob pattern compiled to regular expressions.
+
+    ``*`` and ``?`` never match ``/``, ``[...]`` and ``[!...]`` are character classes and a ``**`` segment matches any
+    number of nested directories, including none. Besides matching full paths with ``match`` it tells with
+    ``may_contain`` whether a directory can hold any matching path, so that whole subtrees can be skipped.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.prefix = literal_prefix(pattern)
+        self.recursive = RECURSIVE_WILDCARD in pattern.split('/')
+        segments = pattern.split('/')
+        self._segments: Sequence[re.Pattern | None] = tuple(
+            None if segment == RECURSIVE_WILDCARD else re.compile(_translate_segment(segment))
+            for segment in segments
+        )
+        regex = []
+
+        for i, segment in enumerate(segments):
+            is_last = i == len(segments) - 1
+
+            if segment == RECURSIVE_WILDCARD:
+                regex.append('.*' if is_last else '(?:.*/)?')
+            else:
+                regex.append(_translate_segment(segment) if is_last else f'{_translate_segment(segment)}/')
+
+        self._regex = re.compile(''.join(regex))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.pattern!r})'
+
+    def match(self, path: str) -> bool:
+        return self._regex.fullmatch(path) is not None
+
+    def may_contain(self, dir_path: str) -> bool:
+        """
+        Tells whether paths under the directory can match the pattern
+        """
+
+        parts = dir_path.rstrip('/').split('/')
+
+        for part, segment in zip(parts, self._segments):
+            if segment is None:
+                return True
+
+            if segment.fullmatch(part) is None:
+                return False
+
+        return len(parts) < len(self._segments)
+
+
+@lru_cache(maxsize=256)
+def compile_glob(pattern: str) -> GlobPattern:
+    return GlobPattern(pattern)
@@ -1,11 +1,42 @@
+import importlib
 from abc import ABCMeta, abstractmethod
 from pathlib import PurePath
-from typing import Sequence, Tuple
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Hashable, Mapping, Tuple, Type
+
+from aiofm.entries import Entry, EntryColumns
+from aiofm.patterns import compile_glob
+
+if TYPE_CHECKING:
+    from aiofm.metrics import MetricsSink
+
+DEFAULT_SCHEME = 'file'
+DEFAULT_PAGE_SIZE = 1000
+PROTOCOLS = {
+    'file': 'aiofm.protocols.local.LocalProtocol',
+    'mem': 'aiofm.protocols.memory.MemoryProtocol',
+    'minio': 'aiofm.protocols.minio.MinioProtocol',
+    's3': 'aiofm.protocols.s3.S3Protocol',
+}
 
 
 class BaseProtocol(metaclass=ABCMeta):
-    def __init__(self, *args, **kwargs):
+    """
+    Base of all protocols.
+
+    With ``metrics``, a ``MetricsSink``, public operations of the instance are measured and protocols making remote
+    requests report them as well. Without it the operations are left as they are, so instrumentation costs nothing.
+    """
+
+    def __init__(self, *args, metrics: 'MetricsSink | None' = None, **kwargs):
         super().__init__()
+        self.metrics = metrics
+        self._instrumentation = None
+
+        if metrics is not None:
+            from aiofm.metrics import Instrumentation
+
+            self._instrumentation = Instrumentation(metrics, type(self).__name__)
+            self._instrumentation.instrument(self)
 
     @staticmethod
     def _split_path(path: str | PurePath):
@@ -16,10 +47,73 @@ class BaseProtocol(metaclass=ABCMeta):
 
         return path_parts
 
-    @staticmethod
+    def _bucket_name(self, path: str | PurePath) -> str | None:
+        """
+        Returns the bucket metrics of an operation on the path are reported for, if the storage has buckets
+        """
+
+        return None
+
     @abstractmethod
-    async def ls(path: str, pattern: str = None, *args, **kwargs) -> Sequence:
-        pass
+    def ls(self, path: str | PurePath, pattern: str = None, *args, **kwargs) -> AsyncGenerator[str | PurePath, None]:
+        """
+        Yields the contents of the directory as the listing proceeds, those matching ``pattern`` only when it is
+        given. File systems yield names of direct children, object storages yield paths of objects, listing
+        recursively unless ``recursive=False``.
+        """
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[Entry, None]:
+        """
+        Yields an ``Entry`` for every file and directory under the path as the listing proceeds, descending into
+        subdirectories when ``recursive``. ``pattern`` is a glob matched against paths relative to the listed one.
+        ``page_size`` hints how many entries a single listing request fetches, storages without paged listings ignore
+        it.
+
+        This fallback stats every entry, protocols override it to take the metadata from their listings instead.
+        """
+
+        path = PurePath(path)
+        glob = compile_glob(pattern) if pattern else None
+        dir_paths = [(path, '')]
+
+        while dir_paths:
+            dir_path, relative_dir = dir_paths.pop()
+
+            async for name in self.ls(dir_path, recursive=False):
+                # Joining an absolute path yields that path, so names and paths are both handled
+                entry_path = dir_path.joinpath(name)
+                relative_path = f'{relative_dir}{entry_path.name}'
+                is_dir = await self.is_dir(entry_path)
+
+                if glob is None or glob.match(relative_path):
+                    if is_dir:
+                        yield Entry(entry_path, True)
+                    else:
+                        size, etag = await self._stat(entry_path)
+                        yield Entry(entry_path, False, size, None, etag)
+
+                if is_dir and recursive and (glob is None or glob.may_contain(relative_path)):
+                    dir_paths.append((entry_path, f'{relative_path}/'))
+
+    async def scan_columns(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                           page_size: int | None = None) -> AsyncGenerator[EntryColumns, None]:
+        """
+        Yields the entries ``scan`` does as ``EntryColumns`` of up to ``page_size`` entries each, for bulk processing
+        """
+
+        page_size = page_size or DEFAULT_PAGE_SIZE
+        columns = EntryColumns()
+
+        async for entry in self.scan(path, pattern, recursive, page_size):
+            columns.append(str(entry.path), entry.is_dir, entry.size, entry.mtime, entry.etag)
+
+            if len(columns) >= page_size:
+                yield columns
+                columns = EntryColumns()
+
+        if columns:
+            yield columns
 
     @abstractmethod
     async def open(self, path, *args, **kwargs):
@@ -57,9 +151,147 @@ class BaseProtocol(metaclass=ABCMeta):
         pass
 
     @abstractmethod
-    async def glob(self, pattern: str) -> Tuple:
-        pass
+    def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths matching the pattern as they are found, see ``GlobPattern``
+        """
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths of all files under the path, or the path itself when it is a file
+        """
+
+        path = PurePath(path)
+
+        if not await self.is_dir(path):
+            yield path
+            return
+
+        async for name in self.ls(path, recursive=False):
+            async for file_path in self.walk(path.joinpath(name)):
+                yield file_path
+
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        """
+        Returns size and ETag of the file, ETag is ``None`` when the storage has no notion of it
+        """
+
+        raise NotImplementedError
+
+    def _shares_storage_with(self, other: 'BaseProtocol') -> bool:
+        """
+        Tells whether files can be copied to the other protocol with ``cp`` instead of streaming them
+        """
+
+        return other is self
+
+    async def _copy_file(self, src_path: str | PurePath, dst_path: str | PurePath):
+        await self.cp(src_path, dst_path)
+
+
+_protocol_instances = {}
+_uncached_protocol_instances = []
+
+
+def register_protocol(scheme: str, protocol_class: Type[BaseProtocol] | str):
+    """
+    Maps URL scheme to a protocol class or to its dotted import path, which is imported on first use
+    """
+
+    PROTOCOLS[scheme] = protocol_class
+
+
+def _get_protocol_class(scheme: str) -> Type[BaseProtocol]:
+    try:
+        protocol_class = PROTOCOLS[scheme]
+    except KeyError:
+        raise ValueError(f'Unsupported protocol: {scheme}') from None
+
+    if isinstance(protocol_class, str):
+        module_name, _, class_name = protocol_class.rpartition('.')
+        protocol_class = getattr(importlib.import_module(module_name), class_name)
+        PROTOCOLS[scheme] = protocol_class
+
+    return protocol_class
+
+
+def split_url(url: str | PurePath) -> Tuple[str, str]:
+    """
+    Splits URL like ``s3://bucket/key`` into scheme and protocol path ``/bucket/key``. Paths without a scheme belong
+    to the local filesystem.
+    """
+
+    if isinstance(url, PurePath):
+        return DEFAULT_SCHEME, str(url)
+
+    scheme, separator, path = url.partition('://')
+
+    if not separator:
+        return DEFAULT_SCHEME, url
+
+    if not path.startswith('/'):
+        path = f'/{path}'
+
+    return scheme, path
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Returns a hashable equivalent of an option value, turning dictionaries, lists and sets into tuples and frozensets
+    """
+
+    if isinstance(value, Mapping):
+        return dict, tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(item) for item in value)
+
+    if isinstance(value, (set, frozenset)):
+        return frozenset, frozenset(_freeze(item) for item in value)
+
+    hash(value)
+
+    return value
+
+
+def get_protocol(scheme: str, **options) -> BaseProtocol:
+    """
+    Returns protocol instance for the scheme, reusing the one already created for the same options, e.g. endpoint
+    and credentials, so that clients and their connection pools are shared. Options that cannot be compared by value
+    get a new instance every time, which is still closed by ``close_protocols``.
+    """
+
+    try:
+        key = (scheme, _freeze(options))
+    except TypeError:
+        protocol = _get_protocol_class(scheme)(**options)
+        _uncached_protocol_instances.append(protocol)
+
+        return protocol
+
+    try:
+        return _protocol_instances[key]
+    except KeyError:
+        protocol = _protocol_instances[key] = _get_protocol_class(scheme)(**options)
+
+        return protocol
+
+
+def get_protocol_for_path(path: str | PurePath, **options) -> BaseProtocol:
+    scheme, _ = split_url(path)
+
+    return get_protocol(scheme, **options)
+
+
+async def close_protocols():
+    """
+    Closes and forgets all protocol instances created by ``get_protocol``
+    """
 
+    protocols = (*_protocol_instances.values(), *_uncached_protocol_instances)
+    _protocol_instances.clear()
+    _uncached_protocol_instances.clear()
 
-def get_protocol_for_path(path: str) -> BaseProtocol:
-    raise NotImplemented
+    for protocol in protocols:
+        if hasattr(protocol, 'close'):
+            await protocol.close()
@@ -0,0 +1,213 @@
+import asyncio
+import os
+from pathlib import PurePath
+from typing import Sequence, Tuple
+
+from aiofm.governor import RequestGovernor
+from aiofm.helpers import cancel_detached
+from aiofm.metrics import Instrumentation
+from aiofm.retry import RetryPolicy
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_BLOCK_SIZE = 8 * 1024 * 1024
+DEFAULT_READ_AHEAD = 4
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+DEFAULT_COPY_CONCURRENCY = 16
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+COPY_PART_SIZE = 512 * 1024 * 1024
+MAX_PARTS_COUNT = 10000
+MAX_DELETE_OBJECTS_COUNT = 1000
+DEFAULT_DELETE_CONCURRENCY = 8
+NOT_FOUND_ERROR_CODES = frozenset(('404', 'NoSuchKey', 'NotFound'))
+
+
+class ObjectDeleteError(OSError):
+    def __init__(self, bucket_name: str, errors: Sequence[Tuple[str, str, str]]):
+        super().__init__(f'Unable to delete {len(errors)} object(s) from bucket {bucket_name}')
+        self.bucket_name = bucket_name
+        self.errors = errors
+
+
+def split_path(path: str | PurePath) -> Tuple[str, str]:
+    """
+    Splits path like ``/bucket/key`` into the bucket name and the key
+    """
+
+    try:
+        path_parts = path.parts
+    except AttributeError:
+        path_parts = PurePath(path).parts
+
+    if path_parts[0] == '/':
+        bucket_name, prefix_parts = path_parts[1], path_parts[2:]
+    else:
+        bucket_name, prefix_parts = path_parts[0], path_parts[1:]
+
+    return bucket_name, '/'.join(prefix_parts)
+
+
+def dir_prefix(prefix: str) -> str:
+    return f'{prefix.rstrip("/")}/' if prefix else ''
+
+
+def parse_mode(mode: str) -> str:
+    if 'b' not in mode:
+        raise ValueError('S3 files must be opened in binary mode')
+
+    if '+' in mode:
+        raise ValueError('S3 files do not support "+" mode')
+
+    mode = mode.replace('b', '')
+
+    if mode not in {'r', 'w'}:
+        raise ValueError(f'Invalid mode: {mode}')
+
+    return mode
+
+
+class S3ReadableFile:
+    """
+    Random access reader over an S3 object backed by ranged ``GetObject`` requests.
+
+    The object is fetched in ``block_size`` ranges. Sequential reads keep the next ``read_ahead`` ranges downloading
+    concurrently, while seeking away drops blocks outside of the new window.
+    """
+
+    def __init__(self, bucket_name: str, object_key: str, s3_client, size: int, etag: str | None = None,
+                 block_size: int = DEFAULT_BLOCK_SIZE, read_ahead: int = DEFAULT_READ_AHEAD,
+                 retry_policy: RetryPolicy | None = None, governor: RequestGovernor | None = None,
+                 instrumentation: Instrumentation | None = None):
+        if block_size < 1:
+            raise ValueError('Block size must be a positive number')
+
+        if read_ahead < 0:
+            raise ValueError('Read ahead must not be negative')
+
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.s3_client = s3_client
+        self.size = size
+        self.etag = etag
+        self.block_size = block_size
+        self.read_ahead = read_ahead
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.governor = governor or RequestGovernor()
+        self.instrumentation = instrumentation
+        self.closed = False
+        self._position = 0
+        self._blocks = {}
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            position = offset
+        elif whence == os.SEEK_CUR:
+            position = self._position + offset
+        elif whence == os.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+
+        if position < 0:
+            raise ValueError(f'Negative seek position {position}')
+
+        self._position = position
+
+        return position
+
+    async def _fetch_block(self, index: int) -> bytes:
+        start = index * self.block_size
+        get_range = self._get_range
+
+        if self.instrumentation is not None:
+            get_range = self.instrumentation.request(self.bucket_name, 'get_object', get_range)
+
+        return await self.retry_policy.call(self.retry_policy.hedge, get_range, start,
+                                            min(start + self.block_size, self.size) - 1)
+
+    async def _get_range(self, start: int, end: int) -> bytes:
+        kwargs = {'IfMatch': self.etag} if self.etag else {}
+        response = await self.governor.call(
+            'get_object', self.bucket_name, self.object_key, self.s3_client.get_object,
+            Bucket=self.bucket_name, Key=self.object_key, Range=f'bytes={start}-{end}', **kwargs
+        )
+
+        async with response['Body'] as stream:
+            return await stream.read()
+
+    def _schedule(self, first_index: int):
+        last_index = min(first_index + self.read_ahead, (self.size - 1) // self.block_size)
+
+        for index in tuple(self._blocks):
+            if index < first_index or index > last_index:
+                cancel_detached(self._blocks.pop(index))
+
+        for index in range(first_index, last_index + 1):
+            if index not in self._blocks:
+                self._blocks[index] = asyncio.ensure_future(self._fetch_block(index))
+
+    async def read(self, size: int = -1) -> bytes:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if size is None or size < 0:
+            size = self.size - self._position
+
+        size = min(size, self.size - self._position)
+
+        if size <= 0:
+            return b''
+
+        chunks = []
+
+        while size > 0:
+            index, offset = divmod(self._position, self.block_size)
+            self._schedule(index)
+            block = await self._blocks[index]
+            chunk = block[offset:offset + size] if offset or size < len(block) else block
+            chunks.append(chunk)
+            self._position += len(chunk)
+            size -= len(chunk)
+
+        return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    async def readinto(self, buffer) -> int:
+        data = await self.read(len(buffer))
+        buffer[:len(data)] = data
+
+        return len(data)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        chunk = await self.read(self.block_size - self._position % self.block_size)
+
+        if not chunk:
+            raise StopAsyncIteration
+
+        return chunk
+
+    async def close(self):
+        self.closed = True
+
+        for task in self._blocks.values():
+            task.cancel()
+
+        await asyncio.gather(*self._blocks.values(), return_exceptions=True)
+        self._blocks.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+        return False
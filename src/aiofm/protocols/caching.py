@@ -0,0 +1,313 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import AsyncGenerator, Dict, Hashable, List, Tuple
+
+from aiofm.entries import Entry, EntryColumns
+from aiofm.helpers import ContextualTextIOWrapper, MemoryReader, MemoryWriter, aread, awrite, run_concurrently
+from aiofm.patterns import literal_prefix
+from aiofm.protocols import BaseProtocol
+from aiofm.protocols.memory import FileTooLargeError, MemoryProtocol
+
+WRITE_POLICIES = frozenset(('around', 'back', 'through'))
+VALIDATIONS = frozenset(('etag', 'size'))
+DEFAULT_FLUSH_CONCURRENCY = 8
+DEFAULT_MAX_DIRTY_BYTES = 64 * 1024 * 1024
+
+
+class CachingProtocol(BaseProtocol):
+    """
+    Serves files of a slow ``backend``, e.g. ``S3Protocol``, from a fast ``cache`` protocol, ``MemoryProtocol`` by
+    default.
+
+    Files are loaded into the cache on the first read and concurrent misses of one file share a single download.
+    Before serving a cached file it is checked against the backend by size and ETag (``validation='etag'``), by size
+    only (``'size'``) or not at all (``None``). Files validated less than ``revalidate_after`` seconds ago are served
+    without asking the backend.
+
+    Writes go to the backend only (``write_policy='around'``), to the backend and the cache when the file is closed
+    (``'through'``) or to the cache first and to the backend on ``flush`` or ``close`` (``'back'``). ``rm``, ``mv`` and
+    ``cp`` invalidate the cached files they affect.
+
+    Files written back are held until more than ``max_dirty_bytes`` of them are pending, which flushes them all.
+    Listings flush the pending files under the listed path first, so that they show up.
+    """
+
+    def __init__(self, backend: BaseProtocol, cache: BaseProtocol | None = None, write_policy: str = 'through',
+                 validation: str | None = 'etag', revalidate_after: float = 0.0,
+                 max_dirty_bytes: int | None = DEFAULT_MAX_DIRTY_BYTES, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError(f'Unsupported write policy: {write_policy}')
+
+        if validation is not None and validation not in VALIDATIONS:
+            raise ValueError(f'Unsupported validation: {validation}')
+
+        self.backend = backend
+        self.cache = MemoryProtocol() if cache is None else cache
+        self.write_policy = write_policy
+        self.validation = validation
+        self.revalidate_after = revalidate_after
+        self.max_dirty_bytes = max_dirty_bytes
+        self._validated: Dict[str, Tuple[Hashable, float]] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+        self._dirty: Dict[str, bytes | bytearray] = {}
+        self._dirty_bytes = 0
+
+    @staticmethod
+    def _key(path: str | PurePath) -> str:
+        return str(PurePath(path))
+
+    @staticmethod
+    def _keys_under(entries: Dict, key: str) -> List[str]:
+        prefix = f'{key.rstrip("/")}/'
+
+        return [entry_key for entry_key in entries if entry_key == key or entry_key.startswith(prefix)]
+
+    @classmethod
+    def _forget(cls, entries: Dict, key: str):
+        for entry_key in cls._keys_under(entries, key):
+            del entries[entry_key]
+
+    def _set_dirty(self, key: str, data: bytes | bytearray):
+        self._dirty_bytes += len(data) - len(self._dirty.get(key, b''))
+        self._dirty[key] = data
+
+    def _discard_dirty(self, key: str):
+        self._dirty_bytes -= len(self._dirty.pop(key))
+
+    async def _fingerprint(self, key: str) -> Hashable:
+        if self.validation is None:
+            return None
+
+        size, etag = await self.backend._stat(key)
+
+        return (size, etag) if self.validation == 'etag' else size
+
+    async def _is_fresh(self, key: str) -> bool:
+        try:
+            fingerprint, validated_at = self._validated[key]
+        except KeyError:
+            return False
+
+        if not await self.cache.exists(key):
+            del self._validated[key]
+            return False
+
+        now = time.monotonic()
+
+        if self.validation is None or now - validated_at < self.revalidate_after:
+            return True
+
+        if await self._fingerprint(key) != fingerprint:
+            return False
+
+        self._validated[key] = fingerprint, now
+
+        return True
+
+    async def _store(self, key: str, data: bytes | bytearray, fingerprint: Hashable) -> bool:
+        try:
+            async with self.cache.open(key, 'wb') as f:
+                await awrite(f, data)
+        except FileTooLargeError:
+            self._validated.pop(key, None)
+            return False
+
+        self._validated[key] = fingerprint, time.monotonic()
+
+        return True
+
+    async def _load(self, key: str) -> bytes | None:
+        fingerprint = await self._fingerprint(key)
+
+        async with self.backend.open(key, 'rb') as f:
+            data = await aread(f)
+
+        # Skip caching when the file was invalidated while it was being downloaded
+        if self._loads.get(key) is not asyncio.current_task() or not await self._store(key, data, fingerprint):
+            return data
+
+        return None
+
+    async def _load_once(self, key: str) -> bytes | None:
+        """
+        Loads the file into the cache, returns its data instead when it could not be cached
+        """
+
+        load = self._loads.get(key)
+
+        if load is None:
+            def forget_load(_):
+                if self._loads.get(key) is load:
+                    del self._loads[key]
+
+            load = self._loads[key] = asyncio.ensure_future(self._load(key))
+            load.add_done_callback(forget_load)
+
+        return await asyncio.shield(load)
+
+    async def _invalidate(self, key: str):
+        self._forget(self._loads, key)
+        self._forget(self._validated, key)
+
+        if await self.cache.exists(key):
+            await self.cache.rm(key)
+
+    async def _upload(self, key: str, data: bytes | bytearray):
+        await self._invalidate(key)
+
+        async with self.backend.open(key, 'wb') as f:
+            await awrite(f, data)
+
+        await self._store(key, data, await self._fingerprint(key))
+
+    async def flush(self, max_concurrency: int = DEFAULT_FLUSH_CONCURRENCY, path: str | PurePath | None = None):
+        """
+        Uploads files written with the ``back`` write policy to the backend, only those at or under ``path`` if given
+        """
+
+        async def upload(key: str, data: bytes | bytearray):
+            await self._upload(key, data)
+
+            if self._dirty.get(key) is data:
+                self._discard_dirty(key)
+
+        async def uploads():
+            keys = self._keys_under(self._dirty, self._key(path)) if path is not None else tuple(self._dirty)
+
+            for key in keys:
+                yield upload(key, self._dirty[key])
+
+        await run_concurrently(uploads(), max_concurrency)
+
+    async def close(self):
+        await self.flush()
+
+    async def ls(self, path: str | PurePath, pattern: str = None, *args, **kwargs):
+        await self.flush(path=path)
+
+        async for item in self.backend.ls(path, pattern, *args, **kwargs):
+            yield item
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[Entry, None]:
+        await self.flush(path=path)
+
+        async for entry in self.backend.scan(path, pattern, recursive, page_size):
+            yield entry
+
+    async def scan_columns(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                           page_size: int | None = None) -> AsyncGenerator[EntryColumns, None]:
+        await self.flush(path=path)
+
+        async for columns in self.backend.scan_columns(path, pattern, recursive, page_size):
+            yield columns
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        await self.flush(path=path)
+
+        async for file_path in self.backend.walk(path):
+            yield file_path
+
+    @asynccontextmanager
+    async def open(self, path: str | PurePath, *args, **kwargs):
+        mode = kwargs.pop('mode', args[0] if len(args) else 'r')
+        encoding = kwargs.get('encoding', 'utf-8')
+        key = self._key(path)
+
+        if 'r' in mode and '+' not in mode:
+            data = self._dirty.get(key)
+
+            if data is None and not await self._is_fresh(key):
+                data = await self._load_once(key)
+
+            if data is None:
+                async with self.cache.open(key, mode, **kwargs) as f:
+                    yield f
+            else:
+                f = MemoryReader(data)
+
+                if 'b' not in mode:
+                    f = ContextualTextIOWrapper(f, encoding=encoding)
+
+                async with f:
+                    yield f
+
+            return
+
+        if self.write_policy == 'around' or mode.replace('b', '') != 'w':
+            await self.flush()
+            await self._invalidate(key)
+
+            async with self.backend.open(key, mode, **kwargs) as f:
+                yield f
+
+            return
+
+        writer = MemoryWriter()
+        f = writer if 'b' in mode else ContextualTextIOWrapper(writer, encoding=encoding, write_through=True)
+
+        async with f:
+            yield f
+
+            f.flush()
+
+            if self.write_policy == 'through':
+                await self._upload(key, writer.getvalue())
+            else:
+                await self._invalidate(key)
+                self._set_dirty(key, writer.getvalue())
+
+                if self.max_dirty_bytes is not None and self._dirty_bytes > self.max_dirty_bytes:
+                    await self.flush()
+
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        try:
+            return len(self._dirty[self._key(path)]), None
+        except KeyError:
+            return await self.backend._stat(path)
+
+    async def exists(self, path: str | PurePath) -> bool:
+        return self._key(path) in self._dirty or await self.backend.exists(path)
+
+    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath, *args, **kwargs):
+        await self.flush()
+        await self._invalidate(self._key(dst_path))
+        await self.backend.cp(src_path, dst_path, *args, **kwargs)
+
+    async def mkdir(self, path: str | PurePath):
+        await self.backend.mkdir(path)
+
+    async def mkdirs(self, path: str | PurePath):
+        await self.backend.mkdirs(path)
+
+    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath, *args, **kwargs):
+        await self.flush()
+        await self._invalidate(self._key(src_path))
+        await self._invalidate(self._key(dst_path))
+        await self.backend.mv(src_path, dst_path, *args, **kwargs)
+
+    async def rm(self, path: str | PurePath, *args, **kwargs):
+        key = self._key(path)
+
+        for dirty_key in self._keys_under(self._dirty, key):
+            self._discard_dirty(dirty_key)
+
+        await self._invalidate(key)
+
+        return await self.backend.rm(path, *args, **kwargs)
+
+    async def is_dir(self, path: str | PurePath) -> bool:
+        if self._key(path) in self._dirty:
+            return False
+
+        return await self.backend.is_dir(path)
+
+    async def glob(self, pattern: str):
+        await self.flush(path=literal_prefix(pattern).rpartition('/')[0] or '/')
+
+        async for path in self.backend.glob(pattern):
+            yield path
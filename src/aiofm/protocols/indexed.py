@@ -0,0 +1,297 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import AsyncGenerator, Callable, Dict, Tuple
+
+from aiofm.entries import Entry
+from aiofm.helpers import batched
+from aiofm.index import IndexResync, MetadataIndex
+from aiofm.patterns import compile_glob
+from aiofm.protocols import DEFAULT_PAGE_SIZE, BaseProtocol
+
+DEFAULT_MAX_AGE = 60.0
+
+
+class IndexedProtocol(BaseProtocol):
+    """
+    Answers ``ls``, ``scan``, ``glob``, ``exists`` and ``is_dir`` of a remote ``backend``, e.g. ``S3Protocol``, from a
+    local ``MetadataIndex``.
+
+    ``index`` is a ``MetadataIndex`` or the path of its SQLite database, so that listings survive restarts, and
+    ``:memory:`` by default. A directory is listed through the backend only when neither it nor one of its ancestors,
+    listed recursively, was listed during the last ``max_age`` seconds, ``None`` meaning that listings never expire.
+    Listings update the index in place: entries with a new size or ETag are marked with the listing time, the
+    watermark ``changes`` yields newer entries after, and entries that are gone are dropped. ``resync`` relists a
+    directory on demand.
+
+    Storages have no change feed to follow, so every listing of a directory is a full re-sync of it: expiry decides
+    how often directories are listed, not how much of them. What the index saves are the listings of fresh
+    directories and their descendants.
+
+    ``exists`` and ``is_dir`` of paths outside fresh listings go to the backend. Writes made through this protocol
+    update the index right away, changes made by others show up once listings expire. Like ``S3Protocol.ls``, ``ls``
+    lists recursively unless ``recursive=False`` and yields paths of objects only, while ``scan`` yields directories as
+    well.
+    """
+
+    def __init__(self, backend: BaseProtocol, index: MetadataIndex | str | os.PathLike = ':memory:',
+                 max_age: float | None = DEFAULT_MAX_AGE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backend = backend
+        self.index = index if isinstance(index, MetadataIndex) else MetadataIndex(index)
+        self.max_age = max_age
+        self._owns_index = not isinstance(index, MetadataIndex)
+        # SQLite connections serve one thread at a time
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='aiofm-index')
+        self._resyncs: Dict[Tuple[str, bool], asyncio.Task] = {}
+
+    @staticmethod
+    def _key(path: str | PurePath) -> str:
+        return str(PurePath(path))
+
+    def _bucket_name(self, path: str | PurePath) -> str | None:
+        return self.backend._bucket_name(path)
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        if self._executor is None:
+            # The default executor would hand the closed connection to several threads
+            raise RuntimeError(f'{self.__class__.__name__} is closed')
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    def _is_fresh(self, listed_at: float | None) -> bool:
+        return listed_at is not None and (self.max_age is None or time.time() - listed_at <= self.max_age)
+
+    async def close(self):
+        if self._executor is not None:
+            if self._owns_index:
+                await self._run(self.index.close)
+
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def resync(self, path: str | PurePath, recursive: bool = True) -> IndexResync:
+        """
+        Lists the whole directory through the backend again and stores the outcome in the index, reporting which
+        entries changed since the previous listing
+        """
+
+        key = self._key(path)
+        listed_at = time.time()
+
+        async for batch in batched(self.backend.scan(key, recursive=recursive, page_size=DEFAULT_PAGE_SIZE),
+                                   DEFAULT_PAGE_SIZE):
+            await self._run(self.index.store, batch, key, listed_at)
+
+        return await self._run(self.index.finish, key, recursive, listed_at)
+
+    async def _resync_once(self, key: str, recursive: bool):
+        """
+        Re-syncs the directory, sharing one listing between concurrent callers
+        """
+
+        resync = self._resyncs.get((key, recursive))
+
+        if resync is None:
+            def forget_resync(_):
+                if self._resyncs.get((key, recursive)) is resync:
+                    del self._resyncs[key, recursive]
+
+            resync = self._resyncs[key, recursive] = asyncio.ensure_future(self.resync(key, recursive))
+            resync.add_done_callback(forget_resync)
+
+        await asyncio.shield(resync)
+
+    async def _ensure_listed(self, key: str, recursive: bool):
+        if not self._is_fresh(await self._run(self.index.listed_at, key, recursive)):
+            await self._resync_once(key, recursive)
+
+    def _lookup(self, key: str) -> Tuple[Entry | None, bool]:
+        """
+        Returns the indexed entry of the path and whether it comes from a fresh listing
+        """
+
+        is_fresh = self._is_fresh(self.index.listed_at(str(PurePath(key).parent))) or \
+            self._is_fresh(self.index.listed_at(key))
+
+        return self.index.get(key), is_fresh
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[Entry, None]:
+        """
+        Yields entries under the path from the index, see ``BaseProtocol.scan``. Recursive scans yield directories
+        implied by the listed keys too.
+        """
+
+        key = self._key(path)
+        await self._ensure_listed(key, recursive)
+        entry = await self._run(self.index.get, key)
+
+        if entry is None:
+            raise FileNotFoundError(key)
+
+        if not entry.is_dir:
+            raise NotADirectoryError(key)
+
+        glob = compile_glob(pattern) if pattern else None
+        relative_start = len(key.rstrip('/')) + 1
+        cursor = await self._run(self.index.descendants if recursive else self.index.children, key)
+
+        while batch := await self._run(self.index.fetch, cursor, page_size or DEFAULT_PAGE_SIZE):
+            for entry in batch:
+                if glob is None or glob.match(str(entry.path)[relative_start:]):
+                    yield entry
+
+    async def ls(self, path: str | PurePath, pattern: str = None, *args,
+                 **kwargs) -> AsyncGenerator[PurePath, None]:
+        recursive = kwargs.get('recursive', True)
+
+        async for entry in self.scan(path, pattern, recursive):
+            if not (recursive and entry.is_dir):
+                yield entry.path
+
+    async def changes(self, path: str | PurePath, since: float) -> AsyncGenerator[Entry, None]:
+        """
+        Yields indexed entries under the directory added or changed by listings made after the ``since`` watermark,
+        e.g. ``IndexResync.listed_at`` of an earlier ``resync``
+        """
+
+        cursor = await self._run(self.index.changes, self._key(path), since)
+
+        while batch := await self._run(self.index.fetch, cursor, DEFAULT_PAGE_SIZE):
+            for entry in batch:
+                yield entry
+
+    async def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths matching the pattern, see ``GlobPattern``. The directory in the literal beginning of the pattern
+        is listed into the index, recursively unless the pattern matches its direct children only.
+        """
+
+        glob = compile_glob(pattern)
+
+        if glob.prefix == pattern:
+            if await self.exists(pattern):
+                yield PurePath(pattern)
+
+            return
+
+        start_key = glob.prefix.rpartition('/')[0]
+
+        if not start_key:
+            raise ValueError(f'Pattern must begin with a literal directory: {pattern}')
+
+        recursive = glob.recursive or '/' in pattern[len(start_key) + 1:]
+        await self._ensure_listed(start_key, recursive)
+        cursor = await self._run(self.index.descendants if recursive else self.index.children, start_key)
+
+        while batch := await self._run(self.index.fetch, cursor, DEFAULT_PAGE_SIZE):
+            for entry in batch:
+                if glob.match(str(entry.path)):
+                    yield entry.path
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        if not await self.is_dir(path):
+            yield PurePath(path)
+            return
+
+        async for entry in self.scan(path, recursive=True):
+            if not entry.is_dir:
+                yield entry.path
+
+    async def exists(self, path: str | PurePath) -> bool:
+        entry, is_fresh = await self._run(self._lookup, self._key(path))
+
+        if is_fresh:
+            return entry is not None
+
+        return await self.backend.exists(path)
+
+    async def is_dir(self, path: str | PurePath) -> bool:
+        key = self._key(path)
+        entry, is_fresh = await self._run(self._lookup, key)
+
+        if not is_fresh:
+            return await self.backend.is_dir(path)
+
+        if entry is None:
+            raise FileNotFoundError(key)
+
+        return entry.is_dir
+
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        entry, is_fresh = await self._run(self._lookup, self._key(path))
+
+        if is_fresh and entry is not None and not entry.is_dir:
+            return entry.size, entry.etag
+
+        return await self.backend._stat(path)
+
+    async def _record(self, key: str):
+        """
+        Stores the current state of a file written through this protocol
+        """
+
+        try:
+            size, etag = await self.backend._stat(key)
+        except (FileNotFoundError, IsADirectoryError):
+            # E.g. a directory copied into, relist whatever may hold it
+            await self._run(self.index.forget_listings, key)
+            return
+
+        now = time.time()
+        await self._run(self.index.store, [Entry(PurePath(key), False, size, now, etag)], '/', now)
+
+    @asynccontextmanager
+    async def open(self, path: str | PurePath, *args, **kwargs):
+        mode = kwargs.get('mode', args[0] if len(args) else 'r')
+
+        async with self.backend.open(path, *args, **kwargs) as f:
+            yield f
+
+        if 'r' not in mode or '+' in mode:
+            await self._record(self._key(path))
+
+    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath, *args, **kwargs):
+        await self.backend.cp(src_path, dst_path, *args, **kwargs)
+        await self._record(self._key(dst_path))
+
+    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath, *args, **kwargs):
+        await self.backend.mv(src_path, dst_path, *args, **kwargs)
+        await self._run(self.index.remove, self._key(src_path))
+        await self._record(self._key(dst_path))
+
+    async def rm(self, path: str | PurePath, *args, **kwargs):
+        result = await self.backend.rm(path, *args, **kwargs)
+        await self._run(self.index.remove, self._key(path))
+
+        return result
+
+    async def _record_dir(self, key: str):
+        """
+        Stores a directory created through this protocol, unless the backend does not keep empty directories, e.g.
+        object storages, whose listings would drop it again
+        """
+
+        if await self.backend.exists(key):
+            await self._run(self.index.store, [Entry(PurePath(key), True)], '/', time.time())
+
+    async def mkdir(self, path: str | PurePath):
+        await self.backend.mkdir(path)
+        await self._record_dir(self._key(path))
+
+    async def mkdirs(self, path: str | PurePath):
+        await self.backend.mkdirs(path)
+        await self._record_dir(self._key(path))
@@ -0,0 +1,423 @@
+import asyncio
+import errno
+import functools
+import mmap
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import AsyncGenerator, Callable, List, Tuple
+
+from aiofm.entries import Entry
+from aiofm.helpers import MemoryReader
+from aiofm.patterns import compile_glob
+from aiofm.protocols import BaseProtocol
+
+OPEN_ARGUMENTS = ('buffering', 'encoding', 'errors', 'newline')
+# Errors meaning that the kernel copy is not supported for these files, e.g. across filesystems
+COPY_FALLBACK_ERRORS = frozenset((errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EOPNOTSUPP))
+
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+COPY_RANGE_FUNCTIONS: Tuple[Callable[[int, int, int, int], int], ...] = tuple(
+    function
+    for name, function in (('copy_file_range', _copy_file_range), ('sendfile', _sendfile))
+    if hasattr(os, name)
+)
+
+
+def _open(path: str, mode: str = 'r', **options):
+    """
+    Opens the file, creating missing parent directories of files opened for writing
+    """
+
+    try:
+        return open(path, mode, **options)
+    except FileNotFoundError:
+        parent = os.path.dirname(path)
+
+        if 'r' in mode or not parent:
+            raise
+
+    os.makedirs(parent, exist_ok=True)
+
+    return open(path, mode, **options)
+
+
+def _copy_file(src_path: str, dst_path: str) -> str:
+    """
+    Copies file data inside the kernel with ``copy_file_range`` or ``sendfile``, falling back to a buffered copy
+    """
+
+    with open(src_path, 'rb') as fi, _open(dst_path, 'wb') as fo:
+        size = os.fstat(fi.fileno()).st_size
+        offset = 0
+
+        for copy_range in COPY_RANGE_FUNCTIONS:
+            try:
+                while offset < size and (copied := copy_range(fi.fileno(), fo.fileno(), offset, size - offset)):
+                    offset += copied
+            except OSError as e:
+                if e.errno not in COPY_FALLBACK_ERRORS:
+                    raise
+
+            if offset >= size:
+                break
+        else:
+            fi.seek(offset)
+            fo.seek(offset)
+            shutil.copyfileobj(fi, fo)
+
+    shutil.copymode(src_path, dst_path)
+
+    return dst_path
+
+
+def _copy(src_path: str, dst_path: str):
+    if os.path.isdir(dst_path):
+        dst_path = os.path.join(dst_path, os.path.basename(src_path.rstrip(os.sep)))
+
+    if os.path.isdir(src_path):
+        shutil.copytree(src_path, dst_path, copy_function=_copy_file, dirs_exist_ok=True)
+    else:
+        _copy_file(src_path, dst_path)
+
+
+def _move(src_path: str, dst_path: str):
+    if os.path.isdir(dst_path):
+        dst_path = os.path.join(dst_path, os.path.basename(src_path.rstrip(os.sep)))
+
+    try:
+        os.rename(src_path, dst_path)
+    except FileNotFoundError:
+        parent = os.path.dirname(dst_path)
+
+        if not parent or os.path.isdir(parent) or not os.path.lexists(src_path):
+            raise
+
+        os.makedirs(parent, exist_ok=True)
+        _move(src_path, dst_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+        shutil.move(src_path, dst_path, copy_function=_copy_file)
+
+
+def _remove(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def _is_dir(path: str) -> bool:
+    if os.path.isdir(path):
+        return True
+
+    if os.path.lexists(path):
+        return False
+
+    raise FileNotFoundError(path)
+
+
+def _scan(path: str) -> List[Tuple[str, bool]]:
+    with os.scandir(path) as entries:
+        return [(entry.name, entry.is_dir()) for entry in entries]
+
+
+def _scan_entries(path: str) -> List[Entry]:
+    entries = []
+
+    with os.scandir(path) as dir_entries:
+        for dir_entry in dir_entries:
+            try:
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                # Removed while being listed or a broken symlink
+                continue
+
+            if dir_entry.is_dir():
+                entries.append(Entry(PurePath(dir_entry.path), True, None, stat.st_mtime))
+            else:
+                entries.append(Entry(PurePath(dir_entry.path), False, stat.st_size, stat.st_mtime,
+                                     f'{stat.st_mtime_ns:x}-{stat.st_size:x}'))
+
+    return entries
+
+
+def _join(dir_path: str, name: str) -> str:
+    if not dir_path:
+        return name
+
+    if dir_path == '/':
+        return f'/{name}'
+
+    return f'{dir_path}/{name}'
+
+
+def _map_file(path: str) -> mmap.mmap | bytes:
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            # Empty files cannot be mapped
+            return b''
+
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _stat(path: str) -> Tuple[int, str]:
+    stat = os.stat(path)
+
+    if os.path.isdir(path):
+        raise IsADirectoryError(path)
+
+    return stat.st_size, f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+class LocalFile:
+    """
+    Regular file object whose blocking calls run in the thread pool of ``LocalProtocol``
+    """
+
+    def __init__(self, f, run: Callable):
+        self._file = f
+        self._run = run
+
+    @property
+    def name(self) -> str:
+        return self._file.name
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def seekable(self) -> bool:
+        return self._file.seekable()
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    async def read(self, size: int = -1):
+        return await self._run(self._file.read, size)
+
+    async def readinto(self, buffer) -> int:
+        return await self._run(self._file.readinto, buffer)
+
+    async def readline(self, size: int = -1):
+        return await self._run(self._file.readline, size)
+
+    async def write(self, data) -> int:
+        return await self._run(self._file.write, data)
+
+    async def flush(self):
+        await self._run(self._file.flush)
+
+    async def close(self):
+        await self._run(self._file.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class LocalProtocol(BaseProtocol):
+    """
+    Local filesystem.
+
+    Blocking system calls run in a thread pool of ``max_workers`` threads, or in the given ``executor``, so that the
+    event loop is never blocked by disk access. Files are copied inside the kernel with ``copy_file_range`` or
+    ``sendfile``, moved with ``os.rename`` within a filesystem and listed with ``os.scandir``.
+    """
+
+    def __init__(self, max_workers: int | None = None, executor: ThreadPoolExecutor | None = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='aiofm-local')
+
+        return self._executor
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._get_executor(), functools.partial(function, *args, **kwargs))
+
+    async def close(self):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def ls(self, path: str | PurePath, pattern: str = None, *args, **kwargs) -> AsyncGenerator[str, None]:
+        """
+        Yields names of the direct children of the directory, those matching ``pattern`` only when it is given
+        """
+
+        glob = compile_glob(pattern) if pattern else None
+
+        for name, _ in await self._run(_scan, str(path)):
+            if glob is None or glob.match(name):
+                yield name
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[Entry, None]:
+        """
+        Yields entries under the path, see ``BaseProtocol.scan``. Each directory is scanned with ``os.scandir`` in
+        one call to the thread pool, ETags are made of the modification time and the size like ``_stat`` does.
+        """
+
+        glob = compile_glob(pattern) if pattern else None
+        dir_paths = [(str(path), '')]
+
+        while dir_paths:
+            dir_path, relative_dir = dir_paths.pop()
+
+            for entry in await self._run(_scan_entries, dir_path):
+                relative_path = f'{relative_dir}{entry.name}'
+
+                if glob is None or glob.match(relative_path):
+                    yield entry
+
+                if entry.is_dir and recursive and (glob is None or glob.may_contain(relative_path)):
+                    dir_paths.append((str(entry.path), f'{relative_path}/'))
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        path = str(path)
+
+        if not await self._run(_is_dir, path):
+            yield PurePath(path)
+            return
+
+        dir_paths = [path]
+
+        while dir_paths:
+            dir_path = dir_paths.pop()
+
+            for name, is_dir in await self._run(_scan, dir_path):
+                child_path = os.path.join(dir_path, name)
+
+                if is_dir:
+                    dir_paths.append(child_path)
+                else:
+                    yield PurePath(child_path)
+
+    @asynccontextmanager
+    async def open(self, path: str | PurePath, *args, **kwargs):
+        """
+        Opens file with ``open`` arguments, yielding a ``LocalFile`` with async I/O methods. Missing parent
+        directories of files opened for writing are created.
+
+        With ``mmap=True`` a file opened in ``rb`` mode is memory mapped instead and served by a ``MemoryReader``, so
+        that reads need neither system calls nor copies.
+        """
+
+        mode = kwargs.pop('mode', args[0] if len(args) else 'r')
+
+        if kwargs.get('mmap'):
+            if mode != 'rb':
+                raise ValueError(f'Only files opened in "rb" mode can be memory mapped, got: {mode}')
+
+            mapped = await self._run(_map_file, str(path))
+
+            try:
+                async with MemoryReader(mapped) as f:
+                    yield f
+            finally:
+                if isinstance(mapped, mmap.mmap):
+                    try:
+                        mapped.close()
+                    except BufferError:
+                        # Views handed out by the reader are still alive, the mapping is closed when they are gone
+                        pass
+
+            return
+
+        options = {name: kwargs[name] for name in OPEN_ARGUMENTS if name in kwargs}
+
+        async with LocalFile(await self._run(_open, str(path), mode, **options), self._run) as f:
+            yield f
+
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        return await self._run(_stat, str(path))
+
+    def _shares_storage_with(self, other: BaseProtocol) -> bool:
+        return isinstance(other, LocalProtocol)
+
+    async def exists(self, path: str | PurePath) -> bool:
+        return await self._run(os.path.lexists, str(path))
+
+    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath):
+        await self._run(_copy, str(src_path), str(dst_path))
+
+    async def mkdir(self, path: str | PurePath):
+        await self._run(os.mkdir, str(path))
+
+    async def mkdirs(self, path: str | PurePath):
+        await self._run(os.makedirs, str(path), exist_ok=True)
+
+    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath):
+        await self._run(_move, str(src_path), str(dst_path))
+
+    async def rm(self, path: str | PurePath):
+        await self._run(_remove, str(path))
+
+    async def is_dir(self, path: str | PurePath) -> bool:
+        return await self._run(_is_dir, str(path))
+
+    async def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths matching the pattern, see ``GlobPattern``. Only directories that can hold a match are scanned,
+        each of them in one call to the thread pool.
+        """
+
+        glob = compile_glob(pattern)
+
+        if glob.prefix == pattern:
+            if await self.exists(pattern):
+                yield PurePath(pattern)
+
+            return
+
+        start_path, separator, _ = glob.prefix.rpartition('/')
+
+        if separator and not start_path:
+            start_path = '/'
+
+        dir_paths = [start_path]
+
+        while dir_paths:
+            dir_path = dir_paths.pop()
+
+            try:
+                entries = await self._run(_scan, dir_path or '.')
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+
+            for name, is_dir in entries:
+                path = _join(dir_path, name)
+
+                if glob.match(path):
+                    yield PurePath(path)
+
+                if is_dir and glob.may_contain(path):
+                    dir_paths.append(path)
@@ -1,173 +1,498 @@
 import collections.abc
-import operator
+import heapq
+import time
 from contextlib import asynccontextmanager
-from functools import reduce
 from pathlib import PurePath
-from typing import Any, Mapping, Sequence, Tuple
+from typing import AsyncGenerator, Dict, Mapping, Tuple
 
-from aiofm.helpers import ContextualBytesIO, ContextualStringIO
+from aiofm.entries import Entry
+from aiofm.eviction import CacheStats, EvictionPolicy, get_eviction_policy
+from aiofm.helpers import ContextualTextIOWrapper, MemoryReader, MemoryWriter
+from aiofm.patterns import compile_glob
 from aiofm.protocols import BaseProtocol
 
+ROOT_KEY = ''
+
+
+class FileTooLargeError(ValueError):
+    """
+    Raised when a file does not fit into ``max_bytes`` of a bounded ``MemoryProtocol``
+    """
+
 
 class MemoryProtocol(BaseProtocol):
-    def __init__(self, *args, **kwargs):
+    """
+    In-memory filesystem.
+
+    Entries are kept in flat hash indexes keyed by normalised path: ``_files`` maps file paths to their data and
+    ``_dirs`` maps directory paths to their ordered child names. Lookups are O(1) and listings are O(children)
+    regardless of the depth. ``tree`` exposes the same data as nested dicts.
+
+    With ``max_bytes`` the total size of files is bounded and files chosen by ``eviction_policy`` (``lru``, ``lfu``,
+    ``size`` or an ``EvictionPolicy`` instance) are dropped to make room. Files may also expire after ``ttl``
+    seconds, either protocol wide or per file with ``open(..., ttl=...)``. Counters are kept in ``stats``.
+    """
+
+    def __init__(self, max_bytes: int | None = None, ttl: float | None = None,
+                 eviction_policy: str | EvictionPolicy = 'lru', *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.tree = {}
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.eviction_policy = eviction_policy
+        self.stats = CacheStats()
+        self._policy = get_eviction_policy(eviction_policy) if max_bytes is not None else None
+        self._files: Dict[str, bytes | bytearray] = {}
+        self._dirs: Dict[str, Dict[str, None]] = {ROOT_KEY: {}}
+        self._expires_at: Dict[str, float] = {}
+        self._expirations = []
+
+    @property
+    def tree(self) -> Dict:
+        """
+        Nested dict snapshot of the filesystem, e.g. ``{'/': {'tmp': {'a.txt': b'data'}}}``
+        """
+
+        return self._build_tree(ROOT_KEY)
+
+    @tree.setter
+    def tree(self, tree: Mapping):
+        self._files = {}
+        self._dirs = {ROOT_KEY: {}}
+        self._expires_at = {}
+        self._expirations = []
+        self.stats.resident_bytes = 0
+
+        if self.max_bytes is not None:
+            self._policy = get_eviction_policy(self.eviction_policy)
+
+        nodes = [(ROOT_KEY, tree)]
+
+        while nodes:
+            parent_key, node = nodes.pop()
+
+            for name, value in node.items():
+                key = self._join_key(parent_key, name)
+                self._dirs[parent_key][name] = None
+
+                if isinstance(value, collections.abc.Mapping):
+                    self._dirs[key] = {}
+                    nodes.append((key, value))
+                else:
+                    self._set_file(key, value)
+
+    def _build_tree(self, key: str) -> Dict:
+        tree = {}
+
+        for name in self._dirs[key]:
+            child_key = self._join_key(key, name)
+
+            if child_key in self._dirs:
+                tree[name] = self._build_tree(child_key)
+            else:
+                tree[name] = self._files[child_key]
+
+        return tree
 
     @staticmethod
-    def _split_path(path: str | PurePath):
-        try:
-            path_parts = path.parts
-        except AttributeError:
-            path_parts = PurePath(path).parts
+    def _key(path: str | PurePath) -> str:
+        if type(path) is str and path[:1] == '/' and path[-1:] != '/' and '//' not in path and '/.' not in path:
+            return path
+
+        return str(PurePath(path))
+
+    @staticmethod
+    def _split_key(key: str) -> Tuple[str, str]:
+        parent_key, separator, name = key.rpartition('/')
+
+        if not name:
+            return ROOT_KEY, key
+
+        if separator and not parent_key:
+            return '/', name
+
+        return parent_key, name
+
+    @staticmethod
+    def _join_key(parent_key: str, name: str) -> str:
+        if parent_key == ROOT_KEY:
+            return name
+
+        if parent_key == '/':
+            return f'/{name}'
+
+        return f'{parent_key}/{name}'
+
+    def _make_dirs(self, key: str):
+        missing_keys = []
+
+        while key not in self._dirs:
+            if key in self._files:
+                raise FileNotFoundError(f'Node already exists: {key}')
+
+            missing_keys.append(key)
+            key = self._split_key(key)[0]
+
+        for key in reversed(missing_keys):
+            parent_key, name = self._split_key(key)
+            self._dirs[parent_key][name] = None
+            self._dirs[key] = {}
+
+    def _set_file(self, key: str, value: bytes | bytearray, ttl: float | None = None):
+        if key in self._dirs:
+            raise FileNotFoundError('Node already exists')
+
+        size = len(value)
 
-        return path_parts
+        if self.max_bytes is not None and size > self.max_bytes:
+            raise FileTooLargeError(f'File of {size} bytes does not fit into {self.max_bytes} bytes')
 
-    @classmethod
-    def _remove_tree_item(cls, tree: Mapping, path: str | PurePath):
-        path_parts = cls._split_path(path)
+        parent_key, name = self._split_key(key)
+        self._make_dirs(parent_key)
+        self._discard_file(key)
+        self._evict(size)
+        self._dirs[parent_key][name] = None
+        self._files[key] = value
+        self.stats.resident_bytes += size
 
+        if self._policy is not None:
+            self._policy.add(key, size)
+
+        ttl = self.ttl if ttl is None else ttl
+
+        if ttl is not None:
+            expires_at = time.monotonic() + ttl
+            self._expires_at[key] = expires_at
+            heapq.heappush(self._expirations, (expires_at, key))
+            self._compact_expirations()
+
+    def _get_file(self, key: str) -> bytes | bytearray:
         try:
-            del reduce(operator.getitem, path_parts[:-1], tree)[path_parts[-1]]
+            value = self._files[key]
         except KeyError:
-            pass
+            self.stats.misses += 1
+
+            if key in self._dirs:
+                raise IsADirectoryError(key) from None
 
-    @classmethod
-    def _get_tree_item(cls, tree: Mapping, path: str | PurePath):
-        path_parts = cls._split_path(path)
+            raise FileNotFoundError(key) from None
 
+        self.stats.hits += 1
+
+        if self._policy is not None:
+            self._policy.touch(key)
+
+        return value
+
+    def _discard_file(self, key: str) -> bool:
         try:
-            return reduce(operator.getitem, path_parts, tree)
+            value = self._files.pop(key)
         except KeyError:
-            raise FileNotFoundError
+            return False
 
-    @classmethod
-    def _set_tree_item(cls, tree: Mapping, path: str | PurePath, value: Any):
-        path_parts = cls._split_path(path)
-        current_node = tree
+        self.stats.resident_bytes -= len(value)
 
-        for path_part in path_parts[:-1]:
-            try:
-                current_node = current_node[path_part]
+        if self._expires_at.pop(key, None) is not None:
+            self._compact_expirations()
 
-                if not isinstance(current_node, collections.abc.Mapping):
-                    raise FileNotFoundError(f'Node already exists: {current_node}')
-            except KeyError:
-                new_node = {}
-                current_node[path_part] = new_node
-                current_node = new_node
+        if self._policy is not None:
+            self._policy.remove(key)
 
-        try:
-            if type(current_node[path_parts[-1]]) != type(value):
-                raise FileNotFoundError('Node already exists')
+        return True
 
-            current_node[path_parts[-1]] = value
-        except KeyError:
-            current_node[path_parts[-1]] = value
+    def _evict(self, size: int):
+        if self.max_bytes is None:
+            return
+
+        while self.stats.resident_bytes + size > self.max_bytes:
+            key = self._policy.victim()
+
+            if key in self._files:
+                self._remove(key)
+                self.stats.evictions += 1
+            else:
+                self._policy.remove(key)
+
+    def _compact_expirations(self):
+        """
+        Drops expirations of rewritten and removed files once they outnumber the live ones, like ``SizePolicy`` does
+        """
+
+        if len(self._expirations) > 2 * len(self._expires_at) + 1:
+            self._expirations = [
+                (expires_at, key) for expires_at, key in self._expirations if self._expires_at.get(key) == expires_at
+            ]
+            heapq.heapify(self._expirations)
+
+    def _purge_expired(self):
+        if not self._expirations:
+            return
+
+        now = time.monotonic()
+
+        while self._expirations and self._expirations[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expirations)
+
+            if self._expires_at.get(key) == expires_at:
+                self._remove(key)
+                self.stats.expirations += 1
+
+    def _remove(self, key: str):
+        if not self._discard_file(key):
+            if key not in self._dirs:
+                return
+
+            keys = [key]
+
+            while keys:
+                dir_key = keys.pop()
+
+                for name in self._dirs.pop(dir_key):
+                    child_key = self._join_key(dir_key, name)
+
+                    if child_key in self._dirs:
+                        keys.append(child_key)
+                    else:
+                        self._discard_file(child_key)
+
+        parent_key, name = self._split_key(key)
+        del self._dirs[parent_key][name]
+
+    async def ls(self, path: str | PurePath, pattern: str = None, *args, **kwargs) -> AsyncGenerator[str, None]:
+        """
+        Yields names of the direct children of the directory, those matching ``pattern`` only when it is given
+        """
+
+        self._purge_expired()
+        key = self._key(path)
 
-    @classmethod
-    def _set_parent_tree_item(cls, tree: Mapping, path: str | PurePath, value: Any):
         try:
-            parent_item_path = path.parent
-        except AttributeError:
-            parent_item_path = PurePath(path).parent
+            names = self._dirs[key]
+        except KeyError:
+            if key in self._files:
+                raise NotADirectoryError(key) from None
 
-        cls._set_tree_item(tree, parent_item_path, value)
+            raise FileNotFoundError(key) from None
 
-    async def ls(self, path: str | PurePath, pattern: str = None, *args, **kwargs) -> Sequence:
-        item = self._get_tree_item(self.tree, path)
+        glob = compile_glob(pattern) if pattern else None
 
-        return tuple(item)
+        # Consumers may change the directory between names
+        for name in tuple(names):
+            if glob is None or glob.match(name):
+                yield name
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[Entry, None]:
+        """
+        Yields entries under the path, see ``BaseProtocol.scan``. Sizes come from the index, there is no ``mtime``
+        or ``etag``.
+        """
+
+        self._purge_expired()
+        key = self._key(path)
+
+        if key not in self._dirs:
+            if key in self._files:
+                raise NotADirectoryError(key)
+
+            raise FileNotFoundError(key)
+
+        glob = compile_glob(pattern) if pattern else None
+        keys = [(key, '')]
+
+        while keys:
+            dir_key, relative_dir = keys.pop()
+
+            # Consumers may change the directory between entries
+            for name in tuple(self._dirs.get(dir_key, ())):
+                child_key = self._join_key(dir_key, name)
+                relative_path = f'{relative_dir}{name}'
+                is_dir = child_key in self._dirs
+
+                if glob is None or glob.match(relative_path):
+                    if is_dir:
+                        yield Entry(PurePath(child_key), True)
+                    elif (value := self._files.get(child_key)) is not None:
+                        yield Entry(PurePath(child_key), False, len(value))
+
+                if is_dir and recursive and (glob is None or glob.may_contain(relative_path)):
+                    keys.append((child_key, f'{relative_path}/'))
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        self._purge_expired()
+        key = self._key(path)
+
+        if key in self._files:
+            yield PurePath(key)
+            return
+
+        if key not in self._dirs:
+            raise FileNotFoundError(key)
+
+        keys = [key]
+
+        while keys:
+            dir_key = keys.pop()
+
+            # Consumers may change the directory between paths
+            for name in tuple(self._dirs.get(dir_key, ())):
+                child_key = self._join_key(dir_key, name)
+
+                if child_key in self._dirs:
+                    keys.append(child_key)
+                elif child_key in self._files:
+                    yield PurePath(child_key)
 
     @asynccontextmanager
     async def open(self, path: str | PurePath, *args, **kwargs):
+        """
+        Opens file for reading (``r``), writing (``w``), exclusive creation (``x``) or appending (``a``).
+
+        Readers serve the stored buffer through a read-only ``memoryview`` without copying it. Writers fill a
+        ``bytearray`` that becomes the stored value once the file is closed without an error.
+        """
+
         mode = kwargs.pop('mode', args[0] if len(args) else 'r')
+        encoding = kwargs.get('encoding', 'utf-8')
+        key = self._key(path)
+        self._purge_expired()
 
-        try:
-            encoding = kwargs.get('encoding', 'utf-8')
-            item = self._get_tree_item(self.tree, path)
+        if '+' in mode or len(set(mode) & set('rwxa')) != 1:
+            raise ValueError(f'Invalid mode: {mode}')
 
-            if 'b' in mode:
-                f = ContextualBytesIO(item)
-            else:
-                f = ContextualStringIO(item.decode(encoding))
+        if 'r' in mode:
+            f = MemoryReader(self._get_file(key))
+
+            if 'b' not in mode:
+                f = ContextualTextIOWrapper(f, encoding=encoding)
+
+            async with f:
+                yield f
+
+            return
+
+        if 'x' in mode and key in self._files:
+            raise FileExistsError(key)
+
+        if key in self._dirs:
+            raise IsADirectoryError(key)
 
+        writer = MemoryWriter(self._files.get(key, b'') if 'a' in mode else b'')
+        f = writer if 'b' in mode else ContextualTextIOWrapper(writer, encoding=encoding, write_through=True)
+
+        async with f:
             yield f
 
-            if 'w' in mode:
-                if 'b' in mode:
-                    item = f.getvalue()
-                else:
-                    item = f.getvalue().encode(encoding)
+            f.flush()
+            self._set_file(key, writer.getvalue(), kwargs.get('ttl'))
 
-                self._set_tree_item(self.tree, path, item)
-        except FileNotFoundError:
-            if 'w' in mode or 'a' in mode:
-                f = ContextualStringIO(None, *args, **kwargs)
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        self._purge_expired()
+        key = self._key(path)
 
-                yield f
+        try:
+            return len(self._files[key]), None
+        except KeyError:
+            if key in self._dirs:
+                raise IsADirectoryError(key) from None
 
-                self._set_tree_item(self.tree, path, f)
-            else:
-                raise
+            raise FileNotFoundError(key) from None
 
     async def exists(self, path: str | PurePath) -> bool:
-        try:
-            self._get_tree_item(self.tree, path)
-        except FileNotFoundError:
-            return False
+        self._purge_expired()
+        key = self._key(path)
 
-        return True
+        return key in self._files or key in self._dirs
 
     async def cp(self, src_path: str | PurePath, dst_path: str | PurePath):
-        src_path = PurePath(src_path)
+        self._purge_expired()
         dst_path_is_dir = isinstance(dst_path, str) and (dst_path.endswith('/') or dst_path.endswith('\\'))
-        dst_path = PurePath(dst_path)
-        src_item = self._get_tree_item(self.tree, src_path)
-        src_is_dir = isinstance(src_item, collections.abc.Mapping)
+        src_key = self._key(src_path)
+        dst_key = self._key(dst_path)
+        src_is_dir = src_key in self._dirs
 
-        try:
-            dst_item = self._get_tree_item(self.tree, dst_path)
+        if not src_is_dir:
+            src_item = self._get_file(src_key)
 
-            if isinstance(dst_item, collections.abc.Mapping):
-                if src_is_dir:
-                    pass
-                else:
-                    self._set_tree_item(self.tree, dst_path.joinpath(src_path.name), src_item)
-            else:
-                if dst_path_is_dir:
-                    raise ValueError(f'Unable to copy {src_path} to directory path. it is a file')
-
-                if src_is_dir:
-                    raise ValueError(f'Unable to copy directory {src_path} to file {dst_path}')
-                else:
-                    self._set_tree_item(self.tree, dst_path, src_item)
+        if dst_key in self._dirs:
+            if not src_is_dir:
+                self._set_file(self._join_key(dst_key, self._split_key(src_key)[1]), src_item)
+        elif dst_key in self._files:
+            if dst_path_is_dir:
+                raise ValueError(f'Unable to copy {src_key} to directory path. it is a file')
 
-                self._set_tree_item(self.tree, dst_path, src_item)
-        except FileNotFoundError:
             if src_is_dir:
-                pass
+                raise ValueError(f'Unable to copy directory {src_key} to file {dst_key}')
+
+            self._set_file(dst_key, src_item)
+        elif not src_is_dir:
+            if dst_path_is_dir:
+                self._set_file(self._join_key(dst_key, self._split_key(src_key)[1]), src_item)
             else:
-                if dst_path_is_dir:
-                    self._set_tree_item(self.tree, dst_path.joinpath(src_path.name), src_item)
-                else:
-                    self._set_tree_item(self.tree, dst_path, src_item)
+                self._set_file(dst_key, src_item)
 
     async def mkdir(self, path: str | PurePath):
         await self.mkdirs(path)
 
     async def mkdirs(self, path: str | PurePath):
-        self._set_tree_item(self.tree, path, {})
+        self._purge_expired()
+        key = self._key(path)
+
+        if key in self._files:
+            raise FileNotFoundError('Node already exists')
+
+        self._make_dirs(key)
 
     async def mv(self, src_path: str | PurePath, dst_path: str | PurePath):
         await self.cp(src_path, dst_path)
         await self.rm(src_path)
 
     async def rm(self, path: str | PurePath):
-        self._remove_tree_item(self.tree, path)
+        self._purge_expired()
+        self._remove(self._key(path))
 
     async def is_dir(self, path: str | PurePath) -> bool:
-        return isinstance(self._get_tree_item(self.tree, path), collections.abc.Mapping)
+        self._purge_expired()
+        key = self._key(path)
+
+        if key in self._dirs:
+            return True
+
+        if key in self._files:
+            return False
+
+        raise FileNotFoundError(key)
+
+    async def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths of files and directories matching the pattern, see ``GlobPattern``. Only directories under the
+        literal prefix of the pattern are visited and subtrees that cannot match are skipped.
+        """
+
+        self._purge_expired()
+        glob = compile_glob(pattern)
+
+        if glob.prefix == pattern:
+            if await self.exists(pattern):
+                yield PurePath(pattern)
+
+            return
+
+        start_key, separator, _ = glob.prefix.rpartition('/')
+
+        if separator and not start_key:
+            start_key = '/'
+
+        keys = [start_key]
+
+        while keys:
+            dir_key = keys.pop()
+
+            # Consumers may change the directory between paths
+            for name in tuple(self._dirs.get(dir_key, ())):
+                child_key = self._join_key(dir_key, name)
+
+                if glob.match(child_key):
+                    yield PurePath(child_key)
 
-    async def glob(self, pattern: str) -> Tuple:
-        pass
+                if child_key in self._dirs and glob.may_contain(child_key):
+                    keys.append(child_key)
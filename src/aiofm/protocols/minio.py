@@ -0,0 +1,639 @@
+import asyncio
+import functools
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import AsyncGenerator, Callable, Iterable, Iterator, List, Sequence, Tuple
+
+import urllib3
+from minio import Minio, S3Error
+from minio.commonconfig import CopySource
+from minio.datatypes import Object
+from minio.deleteobjects import DeleteObject
+from pydantic import SecretStr
+
+from aiofm.entries import ObjectEntry
+from aiofm.governor import RequestGovernor
+from aiofm.helpers import run_concurrently
+from aiofm.patterns import compile_glob, literal_prefix
+from aiofm.protocols import BaseProtocol
+from aiofm.protocols._object_store import (
+    DEFAULT_BLOCK_SIZE, DEFAULT_COPY_CONCURRENCY, DEFAULT_DELETE_CONCURRENCY, DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_POOL_CONNECTIONS, DEFAULT_PART_SIZE, DEFAULT_READ_AHEAD, MAX_DELETE_OBJECTS_COUNT, MIN_PART_SIZE,
+    NOT_FOUND_ERROR_CODES, ObjectDeleteError, S3ReadableFile, dir_prefix, parse_mode, split_path,
+)
+from aiofm.retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def _take(iterator: Iterator, count: int) -> list:
+    return list(itertools.islice(iterator, count))
+
+
+async def _iterate_in_executor(iterator: Iterable, batch_size: int, run: Callable) -> AsyncGenerator[list, None]:
+    """
+    Consumes a blocking iterator with ``run``, e.g. in an executor, yielding lists of up to ``batch_size`` items
+    """
+
+    iterator = iter(iterator)
+
+    while batch := await run(_take, iterator, batch_size):
+        yield batch
+
+
+def _get_minio_client(endpoint_url: str, region_name: str, access_key_id: SecretStr, secret_access_key: SecretStr,
+                      secure: bool = True, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                      retry_policy: RetryPolicy | None = None) -> Minio:
+    retry_policy = retry_policy or RetryPolicy()
+    read_timeout = retry_policy.attempt_timeout or 300
+    http_client = urllib3.PoolManager(
+        timeout=urllib3.util.Timeout(connect=min(300, read_timeout), read=read_timeout),
+        maxsize=max_pool_connections,
+        cert_reqs='CERT_REQUIRED' if secure else 'CERT_NONE',
+        retries=retry_policy.urllib3_retry()
+    )
+
+    client = Minio(
+        endpoint_url,
+        region=region_name,
+        access_key=access_key_id.get_secret_value(),
+        secret_key=secret_access_key.get_secret_value(),
+        http_client=http_client,
+        secure=secure
+    )
+
+    return client
+
+
+class MinioReadableFile(S3ReadableFile):
+    """
+    ``S3ReadableFile`` fetching its blocks with the blocking ``minio`` client in the protocol executor
+    """
+
+    def __init__(self, bucket_name: str, object_key: str, minio_client: Minio, run: Callable, size: int,
+                 etag: str | None = None, block_size: int = DEFAULT_BLOCK_SIZE, read_ahead: int = DEFAULT_READ_AHEAD,
+                 retry_policy: RetryPolicy | None = None):
+        super().__init__(bucket_name, object_key, minio_client, size, etag, block_size, read_ahead, retry_policy)
+        self._run = run
+
+    def _get_block(self, start: int, end: int) -> bytes:
+        headers = {'If-Match': f'"{self.etag}"'} if self.etag else None
+        response = self.s3_client.get_object(self.bucket_name, self.object_key, start, end - start + 1, headers)
+
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def _get_range(self, start: int, end: int) -> bytes:
+        return await self._run(self._get_block, start, end)
+
+    async def _fetch_block(self, index: int) -> bytes:
+        # Failed requests are already retried by urllib3, see RetryPolicy.urllib3_retry
+        start = index * self.block_size
+
+        return await self.retry_policy.hedge(self._get_range, start, min(start + self.block_size, self.size) - 1)
+
+
+class _PipeReader:
+    """
+    Blocking file-like end of a pipe, read in a worker thread from an ``asyncio.Queue`` filled in the event loop
+    """
+
+    def __init__(self, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        self._queue = queue
+        self._loop = loop
+        self._buffer = bytearray()
+        self._eof = False
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, BaseException):
+                raise chunk
+            else:
+                self._buffer += chunk
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        return data
+
+
+class MinioWritableFile:
+    """
+    Streaming writer feeding ``put_object`` that runs in the protocol executor.
+
+    Written data is handed over in ``part_size`` chunks through a pipe, so at most a couple of parts are buffered here
+    while ``minio`` uploads up to ``max_concurrency`` multipart parts at once. A failed write aborts the upload.
+    """
+
+    def __init__(self, bucket_name: str, object_key: str, minio_client: Minio, run: Callable,
+                 part_size: int = DEFAULT_PART_SIZE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f'Part size must be at least {MIN_PART_SIZE} bytes')
+
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.minio_client = minio_client
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.closed = False
+        self._run = run
+        self._queue = asyncio.Queue(maxsize=1)
+        self._buffer = bytearray()
+        self._size = 0
+        self._upload = None
+
+    def tell(self) -> int:
+        return self._size
+
+    def _start_upload(self):
+        if self._upload is None:
+            reader = _PipeReader(self._queue, asyncio.get_running_loop())
+            self._upload = asyncio.ensure_future(self._run(
+                self.minio_client.put_object, self.bucket_name, self.object_key, reader, -1,
+                part_size=self.part_size, num_parallel_uploads=self.max_concurrency
+            ))
+
+    async def _put(self, item):
+        self._start_upload()
+        put = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait((put, self._upload), return_when=asyncio.FIRST_COMPLETED)
+
+        if not put.done():
+            put.cancel()
+            self._upload.result()
+
+            raise RuntimeError(f'Upload of {self.object_key} finished before all data was written')
+
+    async def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        self._buffer += data
+        size = len(data) if isinstance(data, (bytes, bytearray)) else memoryview(data).nbytes
+        self._size += size
+
+        if len(self._buffer) >= self.part_size:
+            chunk, self._buffer = self._buffer, bytearray()
+            await self._put(chunk)
+
+        return size
+
+    async def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self._buffer:
+            await self._put(self._buffer)
+
+        await self._put(None)
+        await self._upload
+
+    async def abort(self):
+        if self.closed:
+            return
+
+        self.closed = True
+
+        if self._upload is None:
+            return
+
+        # The reader raises the error, which makes minio abort the multipart upload
+        while not self._upload.done():
+            if self._queue.full():
+                self._queue.get_nowait()
+
+            self._queue.put_nowait(OSError('Upload aborted'))
+
+            await asyncio.wait((self._upload,), timeout=0.1)
+
+        if not self._upload.cancelled() and self._upload.exception() is None:
+            logger.warning('Upload of %s was completed before it could be aborted', self.object_key)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+
+
+class MinioProtocol(BaseProtocol):
+    """
+    S3 compatible storage accessed with the blocking ``minio`` client.
+
+    Client calls run in a thread pool of ``max_workers`` threads, by default as many as the ``max_pool_connections``
+    connections kept by urllib3, so the event loop is never blocked. Listings are streamed from the pool in pages.
+
+    Unlike ``S3Protocol``, requests are retried by urllib3 with ``RetryPolicy.urllib3_retry``, because a failed page
+    of a listing cannot be requested again through the ``minio`` iterator. Only connection errors and the retryable
+    status codes are retried then, with the policy's attempts and backoff. Error codes returned with other statuses,
+    ``deadline`` and the ``retries`` counter do not apply. ``attempt_timeout`` becomes the read timeout.
+    """
+
+    def __init__(self, endpoint_url: str, region_name: str, access_key_id: SecretStr, secret_access_key: SecretStr,
+                 secure: bool = True, max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                 max_workers: int | None = None, retry_policy: RetryPolicy | None = None,
+                 governor: RequestGovernor | None = None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.secure = secure
+        self.max_pool_connections = max_pool_connections
+        self.max_workers = max_workers or max_pool_connections
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.governor = governor or RequestGovernor()
+        self.client: Minio = _get_minio_client(endpoint_url, region_name, access_key_id, secret_access_key, secure,
+                                               max_pool_connections, self.retry_policy)
+        self._executor = None
+
+    _split_path = staticmethod(split_path)
+    _dir_prefix = staticmethod(dir_prefix)
+
+    def _bucket_name(self, path: str | PurePath) -> str | None:
+        return self._split_path(path)[0]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='aiofm-minio')
+
+        return self._executor
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._get_executor(), functools.partial(function, *args, **kwargs))
+
+    async def _call(self, operation_name: str, bucket_name: str, key: str | None, function: Callable, *args, **kwargs):
+        run = self._run
+
+        if self._instrumentation is not None:
+            run = self._instrumentation.request(bucket_name, operation_name, run)
+
+        return await self.governor.call(operation_name, bucket_name, key, run, function, *args, **kwargs)
+
+    def _listing(self, bucket_name: str, prefix: str) -> Callable:
+        """
+        Returns ``run`` for ``_iterate_in_executor`` counting each page of a listing as a ``LIST`` request
+        """
+
+        return functools.partial(self._call, 'list_objects', bucket_name, prefix)
+
+    async def close(self):
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            # Waiting for pending calls must not block the event loop, their connections are released afterwards
+            await asyncio.to_thread(executor.shutdown)
+
+        self.client._http.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def _list_objects(self, bucket_name: str, prefix: str, recursive: bool = True,
+                            batch_size: int = MAX_DELETE_OBJECTS_COUNT) -> AsyncGenerator[Object, None]:
+        objects = self.client.list_objects(bucket_name, prefix, recursive)
+
+        async for batch in _iterate_in_executor(objects, batch_size, self._listing(bucket_name, prefix)):
+            for item in batch:
+                yield item
+
+    async def _stat_object(self, bucket_name: str, key: str) -> Object | None:
+        try:
+            return await self._call('stat_object', bucket_name, key, self.client.stat_object, bucket_name, key)
+        except S3Error as e:
+            if e.code in NOT_FOUND_ERROR_CODES:
+                return None
+
+            raise
+
+    async def _has_children(self, bucket_name: str, prefix: str) -> bool:
+        prefix = self._dir_prefix(prefix)
+        objects = self.client.list_objects(bucket_name, prefix)
+
+        return await self._call('list_objects', bucket_name, prefix, next, objects, None) is not None
+
+    async def ls(self, path: str | PurePath, pattern: str = None, *args,
+                 **kwargs) -> AsyncGenerator[PurePath, None]:
+        """
+        Lists keys under the path, see ``S3Protocol.ls``. Unlike there, only direct children are listed unless
+        ``recursive=True`` is passed.
+        """
+
+        async for entry in self.scan(path, pattern, kwargs.get('recursive', False)):
+            yield entry.path
+
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None) -> AsyncGenerator[ObjectEntry, None]:
+        """
+        Yields entries under the path, see ``S3Protocol.scan``. The listing is consumed in the thread pool
+        ``page_size`` objects at a time.
+        """
+
+        bucket_name, prefix = self._split_path(path)
+        prefix = self._dir_prefix(prefix)
+        glob = compile_glob(pattern) if pattern else None
+        list_prefix = f'{prefix}{glob.prefix}' if glob else prefix
+        has_items = False
+
+        async for item in self._list_objects(bucket_name, list_prefix, recursive,
+                                             page_size or MAX_DELETE_OBJECTS_COUNT):
+            has_items = True
+            key = item.object_name
+
+            if key != prefix and (glob is None or glob.match(key[len(prefix):].rstrip('/'))):
+                mtime = item.last_modified.timestamp() if item.last_modified is not None else None
+
+                if item.is_dir:
+                    yield ObjectEntry(bucket_name, key, True, None, mtime)
+                else:
+                    yield ObjectEntry(bucket_name, key, False, item.size, mtime, item.etag)
+
+        # A listing of the bucket root fails by itself when the bucket is missing, an empty one is just empty
+        if not has_items and prefix and (list_prefix == prefix or not await self._has_children(bucket_name, prefix)):
+            raise FileNotFoundError
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        bucket_name, key = self._split_path(path)
+
+        if key and await self._stat_object(bucket_name, key) is not None:
+            yield PurePath(f'/{bucket_name}/{key}')
+            return
+
+        async for item in self._list_objects(bucket_name, self._dir_prefix(key)):
+            yield PurePath(f'/{bucket_name}/{item.object_name}')
+
+    @asynccontextmanager
+    async def open(self, path: str | PurePath, *args, **kwargs):
+        """
+        Opens object like ``S3Protocol.open``, with the same ``block_size``, ``read_ahead``, ``part_size`` and
+        ``max_concurrency`` options
+        """
+
+        mode = parse_mode(kwargs.pop('mode', args[0] if len(args) else 'r'))
+        bucket_name, key = self._split_path(path)
+
+        if mode == 'r':
+            item = await self._stat_object(bucket_name, key) if key else None
+
+            if item is None:
+                raise FileNotFoundError(f'/{bucket_name}/{key}')
+
+            block_size = kwargs.get('block_size', DEFAULT_BLOCK_SIZE)
+            read_ahead = kwargs.get('read_ahead', DEFAULT_READ_AHEAD)
+
+            run = functools.partial(self._call, 'get_object', bucket_name, key)
+
+            async with MinioReadableFile(bucket_name, key, self.client, run, item.size, item.etag, block_size,
+                                         read_ahead, self.retry_policy) as f:
+                yield f
+        else:
+            part_size = kwargs.get('part_size', DEFAULT_PART_SIZE)
+            max_concurrency = kwargs.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
+
+            run = functools.partial(self._call, 'put_object', bucket_name, key)
+
+            async with MinioWritableFile(bucket_name, key, self.client, run, part_size, max_concurrency) as f:
+                yield f
+
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        bucket_name, key = self._split_path(path)
+        item = await self._stat_object(bucket_name, key) if key else None
+
+        if item is None:
+            raise FileNotFoundError(path)
+
+        return item.size, item.etag
+
+    def _shares_storage_with(self, other: BaseProtocol) -> bool:
+        return other is self or (
+            isinstance(other, MinioProtocol)
+            and (self.endpoint_url, self.region_name, self.access_key_id, self.secret_access_key, self.secure)
+            == (other.endpoint_url, other.region_name, other.access_key_id, other.secret_access_key, other.secure)
+        )
+
+    async def _copy_object(self, src_bucket_name: str, src_key: str, dst_bucket_name: str, dst_key: str,
+                           etag: str | None):
+        # minio switches to a multipart copy by itself for objects above 5 GB
+        await self._call('copy_object', dst_bucket_name, dst_key, self.client.copy_object, dst_bucket_name, dst_key,
+                         CopySource(src_bucket_name, src_key, match_etag=etag))
+
+    async def _copy_file(self, src_path: str | PurePath, dst_path: str | PurePath):
+        src_bucket_name, src_key = self._split_path(src_path)
+        dst_bucket_name, dst_key = self._split_path(dst_path)
+        await self._copy_object(src_bucket_name, src_key, dst_bucket_name, dst_key, None)
+
+    async def exists(self, path: str | PurePath) -> bool:
+        bucket_name, key = self._split_path(path)
+
+        if not key:
+            return await self._call('bucket_exists', bucket_name, None, self.client.bucket_exists, bucket_name)
+
+        if await self._stat_object(bucket_name, key) is not None:
+            return True
+
+        return await self._has_children(bucket_name, key)
+
+    async def _cp(self, src_path: str | PurePath, dst_path: str | PurePath, max_concurrency: int,
+                  copied_keys: List[str] | None = None) -> Object | None:
+        """
+        Copies the file or directory, see ``S3Protocol._cp``
+        """
+
+        dst_path_is_dir = isinstance(dst_path, str) and (dst_path.endswith('/') or dst_path.endswith('\\'))
+        src_bucket_name, src_key = self._split_path(src_path)
+        dst_bucket_name, dst_key = self._split_path(dst_path)
+        src_item = await self._stat_object(src_bucket_name, src_key) if src_key else None
+
+        if src_item is None:
+            if src_key and not await self._has_children(src_bucket_name, src_key):
+                raise FileNotFoundError(src_path)
+
+            if dst_key and await self._stat_object(dst_bucket_name, dst_key) is not None:
+                raise ValueError(f'Unable to copy directory {PurePath(src_path)} to file {PurePath(dst_path)}')
+
+            # The root of a bucket holds the copy itself unless the path asks for a directory in it
+            if dst_path_is_dir or (dst_key and await self._has_children(dst_bucket_name, dst_key)):
+                dst_key = str(PurePath(dst_key, PurePath(src_key or src_bucket_name).name))
+
+            src_prefix = self._dir_prefix(src_key)
+            dst_prefix = self._dir_prefix(dst_key)
+
+            # Later listing pages would return objects copied from earlier ones
+            if src_bucket_name == dst_bucket_name and dst_prefix.startswith(src_prefix):
+                raise ValueError(f'Unable to copy directory {PurePath(src_path)} into itself')
+
+            async def copy_object(item: Object):
+                await self._copy_object(src_bucket_name, item.object_name, dst_bucket_name,
+                                        f'{dst_prefix}{item.object_name[len(src_prefix):]}', item.etag)
+
+                if copied_keys is not None:
+                    copied_keys.append(item.object_name)
+
+            async def copy_objects():
+                async for item in self._list_objects(src_bucket_name, src_prefix):
+                    yield copy_object(item)
+
+            await run_concurrently(copy_objects(), max_concurrency)
+        else:
+            if not dst_key or dst_path_is_dir or await self._has_children(dst_bucket_name, dst_key):
+                dst_key = str(PurePath(dst_key, PurePath(src_key).name))
+
+            await self._copy_object(src_bucket_name, src_key, dst_bucket_name, dst_key, src_item.etag)
+
+            if copied_keys is not None:
+                copied_keys.append(src_key)
+
+        return src_item
+
+    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath,
+                 max_concurrency: int = DEFAULT_COPY_CONCURRENCY):
+        """
+        Copies objects server side, see ``S3Protocol.cp``
+        """
+
+        await self._cp(src_path, dst_path, max_concurrency)
+
+    async def mkdir(self, path: str | PurePath):
+        return
+
+    async def mkdirs(self, path: str | PurePath):
+        return
+
+    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath,
+                 max_concurrency: int = DEFAULT_COPY_CONCURRENCY):
+        """
+        Moves objects with a server side copy followed by batched deletes of the copied keys
+        """
+
+        if self._split_path(src_path) == self._split_path(dst_path):
+            return
+
+        copied_keys = []
+        await self._cp(src_path, dst_path, max_concurrency, copied_keys)
+        await self._remove_objects(self._split_path(src_path)[0], copied_keys, max_concurrency)
+
+    async def _remove_objects(self, bucket_name: str, keys: Iterable[str],
+                              max_concurrency: int = DEFAULT_DELETE_CONCURRENCY) -> int:
+        errors = []
+        deleted_count = 0
+
+        def delete_batch(batch: Sequence[str]) -> int:
+            batch_errors = [
+                (error.name, error.code, error.message)
+                for error in self.client.remove_objects(bucket_name, [DeleteObject(key) for key in batch])
+            ]
+            errors.extend(batch_errors)
+
+            return len(batch) - len(batch_errors)
+
+        async def run_delete_batch(batch: Sequence[str]):
+            nonlocal deleted_count
+            deleted_count += await self._call('remove_objects', bucket_name, None, delete_batch, batch)
+
+        async def delete_batches():
+            async for batch in _iterate_in_executor(keys, MAX_DELETE_OBJECTS_COUNT, self._listing(bucket_name, '')):
+                yield run_delete_batch(batch)
+
+        await run_concurrently(delete_batches(), max_concurrency)
+
+        if errors:
+            raise ObjectDeleteError(bucket_name, errors)
+
+        return deleted_count
+
+    async def rm(self, path: str | PurePath, dry_run: bool = False,
+                 max_concurrency: int = DEFAULT_DELETE_CONCURRENCY) -> int:
+        """
+        Removes a file or a directory recursively, see ``S3Protocol.rm``
+        """
+
+        bucket_name, key = self._split_path(path)
+
+        def list_keys():
+            if key:
+                try:
+                    self.client.stat_object(bucket_name, key)
+                except S3Error as e:
+                    if e.code not in NOT_FOUND_ERROR_CODES:
+                        raise
+                else:
+                    yield key
+
+            for item in self.client.list_objects(bucket_name, self._dir_prefix(key), recursive=True):
+                yield item.object_name
+
+        if dry_run:
+            count = 0
+
+            async for batch in _iterate_in_executor(list_keys(), MAX_DELETE_OBJECTS_COUNT,
+                                                    self._listing(bucket_name, key)):
+                count += len(batch)
+
+            return count
+
+        return await self._remove_objects(bucket_name, list_keys(), max_concurrency)
+
+    async def is_dir(self, path: str | PurePath) -> bool:
+        bucket_name, key = self._split_path(path)
+
+        if not key:
+            if await self._call('bucket_exists', bucket_name, None, self.client.bucket_exists, bucket_name):
+                return True
+        elif await self._has_children(bucket_name, key):
+            return True
+        elif await self._stat_object(bucket_name, key) is not None:
+            return False
+
+        raise FileNotFoundError(path)
+
+    async def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths matching the pattern, see ``S3Protocol.glob``
+        """
+
+        bucket_name, key_pattern = self._split_path(pattern)
+
+        if literal_prefix(bucket_name) != bucket_name:
+            raise ValueError(f'Bucket name must not contain wildcards: {pattern}')
+
+        glob = compile_glob(key_pattern)
+
+        if glob.prefix == key_pattern:
+            if await self.exists(pattern):
+                yield PurePath(f'/{bucket_name}/{key_pattern}')
+
+            return
+
+        prefixes = [glob.prefix]
+
+        while prefixes:
+            async for item in self._list_objects(bucket_name, prefixes.pop(), glob.recursive):
+                key = item.object_name.rstrip('/')
+
+                if glob.match(key):
+                    yield PurePath(f'/{bucket_name}/{key}')
+
+                if item.is_dir and glob.may_contain(key):
+                    prefixes.append(item.object_name)
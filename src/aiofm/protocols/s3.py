@@ -1,188 +1,792 @@
-import collections.abc
+import asyncio
+import heapq
+import importlib
 import logging
-from contextlib import asynccontextmanager
-from io import BytesIO
+import operator
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import PurePath
-from typing import Sequence, Tuple, AsyncGenerator
+from typing import AsyncGenerator, AsyncIterable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
-import urllib3
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from botocore.response import StreamingBody
-from minio import Minio
+from botocore.exceptions import ClientError
 from pydantic import SecretStr
 
+from aiofm.entries import EntryColumns, ObjectEntry
+from aiofm.governor import RequestGovernor
+from aiofm.helpers import batched, merge_concurrently, run_concurrently
+from aiofm.metrics import Instrumentation
+from aiofm.patterns import GlobPattern, compile_glob, literal_prefix
 from aiofm.protocols import BaseProtocol
+from aiofm.protocols._object_store import (
+    COPY_PART_SIZE, DEFAULT_BLOCK_SIZE, DEFAULT_COPY_CONCURRENCY, DEFAULT_DELETE_CONCURRENCY, DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_POOL_CONNECTIONS, DEFAULT_PART_SIZE, DEFAULT_READ_AHEAD, MAX_COPY_OBJECT_SIZE, MAX_DELETE_OBJECTS_COUNT,
+    MAX_PARTS_COUNT, MIN_PART_SIZE, NOT_FOUND_ERROR_CODES, ObjectDeleteError, S3ReadableFile, dir_prefix, parse_mode,
+    split_path,
+)
+from aiofm.retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
 
-class S3ReadableFile:
-    def __init__(self, stream):
-        self.stream = stream
+async def _iterate(items: Iterable) -> AsyncGenerator:
+    for item in items:
+        yield item
 
-    def read(self, size=-1):
-        if size == -1:
-            for chunk in self.stream.iter_chunks(16777216):  # 16MB
-                yield chunk
-        else:
-            for chunk in self.stream.iter_chunks(size):
-                yield chunk
 
-    def __iter__(self):
-        yield from self.read()
+def _page_items(page: dict) -> Iterator[Tuple[str, dict | None]]:
+    """
+    Returns keys of a ``ListObjectsV2`` page in key order along with their ``Contents`` item, ``None`` for
+    ``CommonPrefixes``
+    """
 
-    def close(self):
-        self.stream.close()
+    contents = ((item['Key'], item) for item in page.get('Contents', ()))
 
-    def __enter__(self):
-        return self
+    if not page.get('CommonPrefixes'):
+        return contents
+
+    return heapq.merge(((item['Prefix'], None) for item in page['CommonPrefixes']), contents,
+                       key=operator.itemgetter(0))
+
+
+class S3WritableFile:
+    """
+    Streams written data to S3 as a multipart upload.
+
+    Nothing is sent until ``part_size`` bytes are buffered. Full parts are uploaded in the background with at most
+    ``max_concurrency`` of them in flight, so memory use stays around ``part_size * (max_concurrency + 1)``
+    regardless of the object size. Objects smaller than one part are stored with a single ``PutObject`` call.
+    """
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+    def __init__(self, bucket_name: str, object_key: str, s3_client, part_size: int = DEFAULT_PART_SIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, retry_policy: RetryPolicy | None = None,
+                 governor: RequestGovernor | None = None, instrumentation: Instrumentation | None = None):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f'Part size must be at least {MIN_PART_SIZE} bytes')
 
+        if max_concurrency < 1:
+            raise ValueError('Max concurrency must be a positive number')
 
-class S3WritableFile(BytesIO):
-    def __init__(self, bucket_name: str, object_key: str, s3_client):
-        super().__init__()
         self.bucket_name = bucket_name
         self.object_key = object_key
         self.s3_client = s3_client
-        self.flushed_to_s3 = False
-
-    def write(self, data):
-        if isinstance(data, StreamingBody):
-            self.s3_client.upload_fileobj(data, self.bucket_name, self.object_key)
-        elif isinstance(data, S3ReadableFile):
-            self.s3_client.upload_fileobj(data.stream, self.bucket_name, self.object_key)
-        elif isinstance(data, bytes):
-            super().write(data)
+        self.part_size = part_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.governor = governor or RequestGovernor()
+        self.instrumentation = instrumentation
+        self.closed = False
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._part_number = 0
+        self._parts = []
+        self._tasks = set()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._position = 0
+
+    def tell(self) -> int:
+        return self._position
+
+    async def _call(self, operation_name: str, **kwargs) -> dict:
+        function = getattr(self.s3_client, operation_name)
+
+        if self.instrumentation is not None:
+            function = self.instrumentation.request(self.bucket_name, operation_name, function)
+
+        return await self.retry_policy.call(self.governor.call, operation_name, self.bucket_name, self.object_key,
+                                            function, **kwargs)
+
+    async def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            view = memoryview(data).cast('B')
+            size = len(view)
+            self._position += size
+
+            if self._buffer:
+                missing = self.part_size - len(self._buffer)
+                self._buffer += view[:missing]
+                view = view[missing:]
+
+                if len(self._buffer) < self.part_size:
+                    return size
+
+                chunk, self._buffer = self._buffer, bytearray()
+                await self._upload_part(chunk)
+
+            # Parts of large writes are taken straight from the data once a slot frees up, so nothing is buffered
+            # ahead of the uploads
+            while len(view) >= self.part_size:
+                await self._upload_part(view[:self.part_size])
+                view = view[self.part_size:]
+
+            self._buffer += view
+
+            return size
+        elif hasattr(data, '__aiter__'):
+            written = 0
+
+            async for chunk in data:
+                written += await self.write(chunk)
+
+            return written
         else:
             raise ValueError(f'Unsupported data type: {type(data)}')
 
-    def close(self):
-        if not self.flushed_to_s3 and self.tell() > 0:
-            self.flushed_to_s3 = True
-            self.seek(0)
-            self.s3_client.upload_fileobj(self, Bucket=self.bucket_name, Key=self.object_key)
+    async def _upload_part(self, chunk: bytearray | memoryview):
+        self._raise_failed_part()
+
+        if self._upload_id is None:
+            response = await self._call('create_multipart_upload', Bucket=self.bucket_name, Key=self.object_key)
+            self._upload_id = response['UploadId']
+
+        self._part_number += 1
+        await self._slots.acquire()
+
+        if isinstance(chunk, memoryview):
+            # The caller may reuse its data once write returns
+            chunk = bytes(chunk)
+
+        task = asyncio.create_task(self._send_part(self._part_number, chunk))
+        self._tasks.add(task)
+
+    async def _send_part(self, part_number: int, chunk: bytes | bytearray):
+        try:
+            response = await self._call(
+                'upload_part', Bucket=self.bucket_name, Key=self.object_key, UploadId=self._upload_id,
+                PartNumber=part_number, Body=chunk
+            )
+            self._parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        finally:
+            self._slots.release()
+
+    def _raise_failed_part(self):
+        for task in tuple(self._tasks):
+            if task.done():
+                self._tasks.discard(task)
+                task.result()
+
+    async def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+
+        try:
+            if self._upload_id is None:
+                await self._call('put_object', Bucket=self.bucket_name, Key=self.object_key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    chunk, self._buffer = self._buffer, bytearray()
+                    await self._upload_part(chunk)
+
+                await asyncio.gather(*self._tasks)
+                self._tasks.clear()
+                await self._call(
+                    'complete_multipart_upload', Bucket=self.bucket_name, Key=self.object_key, UploadId=self._upload_id,
+                    MultipartUpload={'Parts': sorted(self._parts, key=operator.itemgetter('PartNumber'))}
+                )
+        except BaseException:
+            await self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+
+    async def abort(self):
+        """
+        Cancels in-flight parts and discards the multipart upload
+        """
+
+        self.closed = True
+        self._buffer = bytearray()
+
+        for task in self._tasks:
+            task.cancel()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
 
-    def __enter__(self):
+            try:
+                await self._call(
+                    'abort_multipart_upload', Bucket=self.bucket_name, Key=self.object_key, UploadId=upload_id
+                )
+            except ClientError:
+                logger.exception(f'Unable to abort multipart upload of s3://{self.bucket_name}/{self.object_key}')
+
+    async def __aenter__(self):
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            await self.abort()
+
+        return False
 
 
 class S3Protocol(BaseProtocol):
-    def __init__(self, *args, **kwargs):
+    """
+    S3 backend sharing one long-lived aiobotocore client between all operations.
+
+    The client is created on first use or explicitly with ``async with S3Protocol(...)`` / ``await connect()`` and is
+    kept until ``await close()``, so its connection pool survives across calls and concurrent coroutines.
+    """
+
+    def __init__(self, endpoint_url: str | None = None, region_name: str | None = None,
+                 access_key_id: SecretStr | None = None, secret_access_key: SecretStr | None = None,
+                 max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS, connect_timeout: float = 60,
+                 read_timeout: float = 60, keepalive_timeout: float = 12, retry_policy: RetryPolicy | None = None,
+                 governor: RequestGovernor | None = None, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.client = get_session().create_client('s3')
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.governor = governor or RequestGovernor()
+        # Retries are made by the retry policy, so that they are not multiplied by botocore ones
+        self.config = AioConfig(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            tcp_keepalive=True,
+            connector_args={'keepalive_timeout': keepalive_timeout},
+            retries={'total_max_attempts': 1},
+        )
+        self.client = None
+        self._exit_stack = None
+        self._client_lock = asyncio.Lock()
+
+    async def connect(self):
+        async with self._client_lock:
+            if self.client is not None:
+                return
+
+            exit_stack = AsyncExitStack()
+            self.client = await exit_stack.enter_async_context(get_session().create_client(
+                's3',
+                endpoint_url=self.endpoint_url,
+                region_name=self.region_name,
+                aws_access_key_id=self.access_key_id and self.access_key_id.get_secret_value(),
+                aws_secret_access_key=self.secret_access_key and self.secret_access_key.get_secret_value(),
+                config=self.config,
+            ))
+            self._exit_stack = exit_stack
+
+    async def close(self):
+        async with self._client_lock:
+            exit_stack, self._exit_stack = self._exit_stack, None
+            self.client = None
+
+            if exit_stack is not None:
+                await exit_stack.aclose()
+
+    async def _get_client(self):
+        if self.client is None:
+            await self.connect()
+
+        return self.client
+
+    async def __aenter__(self):
+        await self.connect()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+        return False
+
+    async def _call(self, operation_name: str, **kwargs) -> dict:
+        client = await self._get_client()
+        bucket_name = kwargs.get('Bucket')
+        function = getattr(client, operation_name)
+
+        if self._instrumentation is not None:
+            function = self._instrumentation.request(bucket_name, operation_name, function)
+
+        return await self.retry_policy.call(self.governor.call, operation_name, bucket_name,
+                                            kwargs.get('Key', kwargs.get('Prefix')), function, **kwargs)
+
+    def _bucket_name(self, path: str | PurePath) -> str | None:
+        return self._split_path(path)[0]
+
+    async def _paginate(self, **kwargs) -> AsyncGenerator[dict, None]:
+        """
+        Yields ``ListObjectsV2`` pages, each of them requested according to the retry policy
+        """
+
+        while True:
+            page = await self._call('list_objects_v2', **kwargs)
+
+            yield page
+
+            if not page.get('IsTruncated'):
+                return
+
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    _split_path = staticmethod(split_path)
+    _dir_prefix = staticmethod(dir_prefix)
 
-    @staticmethod
-    def _split_path(path: str | PurePath) -> Sequence[str]:
+    async def _head_object(self, bucket_name: str, key: str) -> dict | None:
         try:
-            path_parts = path.parts
-        except AttributeError:
-            path_parts = PurePath(path).parts
+            return await self._call('head_object', Bucket=bucket_name, Key=key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_FOUND_ERROR_CODES:
+                return None
 
-        if path_parts[0] == '/':
-            bucket_name, prefix_parts = path_parts[1], path_parts[2:]
-        else:
-            bucket_name, prefix_parts = path_parts[0], path_parts[1:]
+            raise
 
-        if prefix_parts:
-            prefix = '/'.join(prefix_parts)
-        else:
-            prefix = ''
+    async def _bucket_exists(self, bucket_name: str) -> bool:
+        try:
+            await self._call('head_bucket', Bucket=bucket_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] in NOT_FOUND_ERROR_CODES | {'NoSuchBucket'}:
+                return False
+
+            raise
+
+        return True
 
-        return bucket_name, prefix
+    async def _has_children(self, bucket_name: str, prefix: str) -> bool:
+        response = await self._call('list_objects_v2', Bucket=bucket_name, Prefix=self._dir_prefix(prefix),
+                                    MaxKeys=1)
+
+        return response.get('KeyCount', 0) > 0
 
     async def ls(self, path: str | PurePath, pattern: str = None, *args,
                  **kwargs) -> AsyncGenerator[PurePath, None]:
-        bucket_name, prefix = self._split_path(path)
+        """
+        Lists keys under the path. With ``recursive=False`` only direct children are returned and subdirectories are
+        taken from ``CommonPrefixes`` instead of walking every key beneath them.
+
+        ``pattern`` is a glob matched against paths relative to the listed one, e.g. ``*.parquet`` or
+        ``**/*.parquet``. Its literal beginning narrows the listing ``Prefix``, the rest is filtered as pages arrive.
+
+        ``max_concurrency``, ``ordered`` and ``partitions`` list huge prefixes in parallel, see ``scan``.
+        """
+
+        async for entry in self.scan(path, pattern, kwargs.get('recursive', True),
+                                     max_concurrency=kwargs.get('max_concurrency', 1),
+                                     ordered=kwargs.get('ordered', True), partitions=kwargs.get('partitions')):
+            yield entry.path
+
+    async def _paginate_range(self, list_kwargs: Dict, start_after: str | None,
+                              end: str | None) -> AsyncGenerator[dict, None]:
+        """
+        Yields ``ListObjectsV2`` pages of keys after ``start_after`` up to and including ``end``
+        """
+
+        if start_after is not None:
+            list_kwargs = {**list_kwargs, 'StartAfter': start_after}
+
+        async for page in self._paginate(**list_kwargs):
+            if end is not None:
+                contents = page.get('Contents', ())
+                common_prefixes = page.get('CommonPrefixes', ())
+                page = {
+                    'Contents': [item for item in contents if item['Key'] <= end],
+                    'CommonPrefixes': [item for item in common_prefixes if item['Prefix'] <= end],
+                }
+
+                if len(page['Contents']) < len(contents) or len(page['CommonPrefixes']) < len(common_prefixes):
+                    yield page
+                    return
+
+            yield page
+
+    async def _discover_partitions(self, list_kwargs: Dict) -> List[AsyncIterable[dict]]:
+        """
+        Splits a recursive listing into one listing per common prefix of its first level. Keys found on the first
+        level are served as they are, so that partitions come in key order.
+        """
+
+        items = []
+
+        async for page in self._paginate(**list_kwargs, Delimiter='/'):
+            items.extend((item['Prefix'], None) for item in page.get('CommonPrefixes', ()))
+            items.extend((item['Key'], item) for item in page.get('Contents', ()))
+
+        partitions = []
+        contents = []
+
+        for key, item in sorted(items, key=operator.itemgetter(0)):
+            if item is not None:
+                contents.append(item)
+                continue
+
+            if contents:
+                partitions.append(_iterate(({'Contents': contents},)))
+                contents = []
+
+            partitions.append(self._paginate(**{**list_kwargs, 'Prefix': key}))
+
+        if contents:
+            partitions.append(_iterate(({'Contents': contents},)))
+
+        return partitions
+
+    async def _walk_pages(self, list_kwargs: Dict, prefix: str, glob: GlobPattern) -> AsyncGenerator[dict, None]:
+        """
+        Yields the ``Contents`` of a recursive listing in key order for a pattern without ``**``. Levels are listed
+        with ``Delimiter`` like in ``glob``, descending only into directories that can hold a match.
+        """
+
+        async for page in self._paginate(**list_kwargs, Delimiter='/'):
+            contents = []
+
+            for key, item in _page_items(page):
+                if item is not None:
+                    contents.append(item)
+                elif glob.may_contain(key[len(prefix):-1]):
+                    if contents:
+                        yield {'Contents': contents}
+                        contents = []
+
+                    async for sub_page in self._walk_pages({**list_kwargs, 'Prefix': key}, prefix, glob):
+                        yield sub_page
+                elif glob.match(key[len(prefix):-1]):
+                    # Only the directory marker can match, it comes first among the keys of the directory
+                    response = await self._call('list_objects_v2', **{**list_kwargs, 'Prefix': key, 'MaxKeys': 1})
+                    contents.extend(item for item in response.get('Contents', ()) if item['Key'] == key)
+
+            if contents:
+                yield {'Contents': contents}
+
+    async def _list_pages(self, bucket_name: str, prefix: str, glob: GlobPattern | None, recursive: bool,
+                          page_size: int | None, max_concurrency: int = 1, ordered: bool = True,
+                          partitions: Sequence[str] | None = None) -> AsyncGenerator[dict, None]:
+        """
+        Yields ``ListObjectsV2`` pages of the directory ``prefix`` narrowed down to the literal beginning of ``glob``,
+        raises ``FileNotFoundError`` when the directory does not exist. Recursive listings for patterns without ``**``
+        skip subtrees that cannot match. See ``scan`` for partitioned listings.
+        """
+
+        list_prefix = f'{prefix}{glob.prefix}' if glob else prefix
+        list_kwargs = {'Bucket': bucket_name, 'Prefix': list_prefix}
+        walk = recursive and glob is not None and not glob.recursive and partitions is None
         has_items = False
 
-        async with self.client as client:
-            paginator = client.get_paginator('list_objects_v2')
-            page_iterator = paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+        if not recursive:
+            list_kwargs['Delimiter'] = '/'
+
+        if page_size is not None:
+            list_kwargs['MaxKeys'] = page_size
+
+        if partitions is not None:
+            boundaries = [f'{prefix}{boundary}' for boundary in sorted(partitions)]
+            pages = merge_concurrently([
+                self._paginate_range(list_kwargs, start_after, end)
+                for start_after, end in zip([None, *boundaries], [*boundaries, None])
+            ], max_concurrency, ordered)
+        elif walk:
+            pages = self._walk_pages(list_kwargs, prefix, glob)
+        elif max_concurrency > 1 and recursive:
+            pages = merge_concurrently(await self._discover_partitions(list_kwargs), max_concurrency, ordered)
+        else:
+            pages = self._paginate(**list_kwargs)
 
-            async for page in page_iterator:
-                for item in page.get('Contents', []):
-                    has_items = True
-                    yield PurePath(f'/{bucket_name}/{item["Key"]}')
+        async for page in pages:
+            has_items = has_items or bool(page.get('CommonPrefixes') or page.get('Contents'))
+
+            yield page
 
-        if not has_items:
+        # A listing of the bucket root fails by itself when the bucket is missing, an empty one is just empty
+        if not has_items and prefix and ((list_prefix == prefix and not walk)
+                                         or not await self._has_children(bucket_name, prefix)):
             raise FileNotFoundError
 
-    def open(self, path: str | PurePath, *args, **kwargs):
-        mode = kwargs.pop('mode', args[0] if len(args) else 'r')
+    async def scan(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                   page_size: int | None = None, max_concurrency: int = 1, ordered: bool = True,
+                   partitions: Sequence[str] | None = None) -> AsyncGenerator[ObjectEntry, None]:
+        """
+        Yields entries under the path like ``ls`` does, see ``BaseProtocol.scan``. Size, modification time and ETag
+        come from the ``ListObjectsV2`` pages, which hold up to ``page_size`` keys each (``MaxKeys``).
+
+        With ``max_concurrency`` above one a recursive listing is split by the common prefixes of its first level,
+        which are listed in parallel. ``partitions`` splits the key space by keys relative to the path instead, each
+        partition listing from one boundary (``StartAfter``) up to and including the next, e.g. ``'4'``, ``'8'`` and
+        ``'c'`` for keys starting with hex digits. Entries come in key order unless ``ordered`` is false, in which
+        case pages are yielded as they arrive.
+        """
+
+        bucket_name, prefix = self._split_path(path)
+        prefix = self._dir_prefix(prefix)
+        glob = compile_glob(pattern) if pattern else None
+
+        async for page in self._list_pages(bucket_name, prefix, glob, recursive, page_size, max_concurrency, ordered,
+                                           partitions):
+            for key, item in _page_items(page):
+                if item is None:
+                    if glob is None or glob.match(key[len(prefix):-1]):
+                        yield ObjectEntry(bucket_name, key, True)
+                elif key != prefix and (glob is None or glob.match(key[len(prefix):].rstrip('/'))):
+                    if key.endswith('/'):
+                        yield ObjectEntry(bucket_name, key, True, None, item['LastModified'].timestamp())
+                    else:
+                        yield ObjectEntry(bucket_name, key, False, item['Size'], item['LastModified'].timestamp(),
+                                          item['ETag'])
+
+    async def scan_columns(self, path: str | PurePath, pattern: str = None, recursive: bool = False,
+                           page_size: int | None = None, max_concurrency: int = 1, ordered: bool = True,
+                           partitions: Sequence[str] | None = None) -> AsyncGenerator[EntryColumns, None]:
+        """
+        Yields every ``ListObjectsV2`` page as ``EntryColumns``, without creating an object per key. Parallel
+        listings are configured like in ``scan``.
+        """
+
+        bucket_name, prefix = self._split_path(path)
+        prefix = self._dir_prefix(prefix)
+        glob = compile_glob(pattern) if pattern else None
+        root = f'/{bucket_name}/'
+
+        async for page in self._list_pages(bucket_name, prefix, glob, recursive, page_size, max_concurrency, ordered,
+                                           partitions):
+            columns = EntryColumns()
+
+            for key, item in _page_items(page):
+                if item is None:
+                    if glob is None or glob.match(key[len(prefix):-1]):
+                        columns.append(root + key[:-1], True)
+                elif key != prefix and (glob is None or glob.match(key[len(prefix):].rstrip('/'))):
+                    if key.endswith('/'):
+                        columns.append(root + key[:-1], True, None, item['LastModified'].timestamp())
+                    else:
+                        columns.append(root + key, False, item['Size'], item['LastModified'].timestamp(),
+                                       item['ETag'])
+
+            if columns:
+                yield columns
+
+    @asynccontextmanager
+    async def open(self, path: str | PurePath, *args, **kwargs):
+        mode = parse_mode(kwargs.pop('mode', args[0] if len(args) else 'r'))
         bucket_name, path = self._split_path(path)
+        client = await self._get_client()
 
-        try:
-            if 'b' not in mode:
-                raise ValueError('S3 files must be opened in binary mode')
+        if mode == 'r':
+            response = await self._head_object(bucket_name, path)
 
-            if '+' in mode:
-                raise ValueError('S3 files do not support "+" mode')
+            if response is None:
+                raise FileNotFoundError(f'/{bucket_name}/{path}')
 
-            mode = mode.replace('b', '')
+            block_size = kwargs.get('block_size', DEFAULT_BLOCK_SIZE)
+            read_ahead = kwargs.get('read_ahead', DEFAULT_READ_AHEAD)
 
-            if mode not in {'r', 'w'}:
-                raise ValueError(f'Invalid mode: {mode}')
+            async with S3ReadableFile(bucket_name, path, client, response['ContentLength'], response['ETag'],
+                                      block_size, read_ahead, self.retry_policy, self.governor,
+                                      self._instrumentation) as f:
+                yield f
+        elif mode == 'w':
+            part_size = kwargs.get('part_size', DEFAULT_PART_SIZE)
+            max_concurrency = kwargs.get('max_concurrency', DEFAULT_MAX_CONCURRENCY)
 
-            if mode == 'r':
-                obj = self.client.get_object(Bucket=bucket_name, Key=path)
-                stream = StreamingBody(raw_stream=obj['Body'], content_length=obj['ContentLength'])
+            async with S3WritableFile(bucket_name, path, client, part_size, max_concurrency, self.retry_policy,
+                                      self.governor, self._instrumentation) as f:
+                yield f
 
-                return S3ReadableFile(stream)
-            elif mode == 'w':
-                return S3WritableFile(bucket_name, path, self.client)
-        except FileNotFoundError:
-            if 'w' in mode or 'a' in mode:
-                return S3WritableFile(bucket_name, path, self.client)
-            else:
-                raise
+    async def _stat(self, path: str | PurePath) -> Tuple[int, str | None]:
+        bucket_name, key = self._split_path(path)
+        response = await self._head_object(bucket_name, key) if key else None
+
+        if response is None:
+            raise FileNotFoundError(path)
+
+        return response['ContentLength'], response['ETag']
+
+    def _shares_storage_with(self, other: BaseProtocol) -> bool:
+        return other is self or (
+            isinstance(other, S3Protocol)
+            and (self.endpoint_url, self.region_name, self.access_key_id, self.secret_access_key)
+            == (other.endpoint_url, other.region_name, other.access_key_id, other.secret_access_key)
+        )
+
+    async def _copy_file(self, src_path: str | PurePath, dst_path: str | PurePath):
+        src_bucket_name, src_key = self._split_path(src_path)
+        dst_bucket_name, dst_key = self._split_path(dst_path)
+        src_item = await self._head_object(src_bucket_name, src_key)
+
+        if src_item is None:
+            raise FileNotFoundError(src_path)
+
+        await self._copy_object(src_bucket_name, src_key, dst_bucket_name, dst_key, src_item['ContentLength'],
+                                src_item['ETag'], DEFAULT_COPY_CONCURRENCY)
+
+    async def walk(self, path: str | PurePath) -> AsyncGenerator[PurePath, None]:
+        bucket_name, key = self._split_path(path)
+
+        if key and await self._head_object(bucket_name, key) is not None:
+            yield PurePath(f'/{bucket_name}/{key}')
+            return
+
+        async for item in self._iter_objects(bucket_name, self._dir_prefix(key)):
+            yield PurePath(f'/{bucket_name}/{item["Key"]}')
 
     async def exists(self, path: str | PurePath) -> bool:
-        try:
-            self._get_tree_item(self.tree, path)
-        except FileNotFoundError:
-            return False
+        bucket_name, key = self._split_path(path)
 
-        return True
+        if not key:
+            return await self._bucket_exists(bucket_name)
 
-    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath):
-        src_path = PurePath(src_path)
-        dst_path_is_dir = isinstance(dst_path, str) and (dst_path.endswith('/') or dst_path.endswith('\\'))
-        dst_path = PurePath(dst_path)
-        src_item = self._get_tree_item(self.tree, src_path)
-        src_is_dir = isinstance(src_item, collections.abc.Mapping)
+        if await self._head_object(bucket_name, key) is not None:
+            return True
+
+        return await self._has_children(bucket_name, key)
+
+    async def _copy_object(self, src_bucket_name: str, src_key: str, dst_bucket_name: str, dst_key: str,
+                           size: int, etag: str, max_concurrency: int, slots: asyncio.Semaphore | None = None):
+        """
+        Copies one object, in parallel ``UploadPartCopy`` parts above 5 GB. Every request waits for one of ``slots``
+        when given, so that copies running side by side share one bound on requests in flight.
+        """
+
+        copy_source = {'Bucket': src_bucket_name, 'Key': src_key}
+
+        async def call(operation_name: str, **kwargs):
+            if slots is None:
+                return await self._call(operation_name, **kwargs)
+
+            async with slots:
+                return await self._call(operation_name, **kwargs)
+
+        if size <= MAX_COPY_OBJECT_SIZE:
+            await call('copy_object', CopySource=copy_source, CopySourceIfMatch=etag, Bucket=dst_bucket_name,
+                       Key=dst_key)
+            return
+
+        part_size = max(COPY_PART_SIZE, -(-size // MAX_PARTS_COUNT))
+        response = await call('create_multipart_upload', Bucket=dst_bucket_name, Key=dst_key)
+        upload_id = response['UploadId']
+        parts = []
+
+        async def copy_part(part_number: int, start: int, end: int):
+            response = await call(
+                'upload_part_copy', CopySource=copy_source, CopySourceIfMatch=etag,
+                CopySourceRange=f'bytes={start}-{end}', Bucket=dst_bucket_name, Key=dst_key, UploadId=upload_id,
+                PartNumber=part_number
+            )
+            parts.append({'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']})
+
+        async def copy_parts():
+            for part_number, start in enumerate(range(0, size, part_size), 1):
+                yield copy_part(part_number, start, min(start + part_size, size) - 1)
 
         try:
-            dst_item = self._get_tree_item(self.tree, dst_path)
+            await run_concurrently(copy_parts(), max_concurrency)
+            await call(
+                'complete_multipart_upload', Bucket=dst_bucket_name, Key=dst_key, UploadId=upload_id,
+                MultipartUpload={'Parts': sorted(parts, key=operator.itemgetter('PartNumber'))}
+            )
+        except BaseException:
+            # A failed abort must not replace the copy error, e.g. a cancellation
+            try:
+                await call('abort_multipart_upload', Bucket=dst_bucket_name, Key=dst_key, UploadId=upload_id)
+            except Exception:
+                logger.exception(f'Unable to abort multipart copy to s3://{dst_bucket_name}/{dst_key}')
+
+            raise
+
+    async def _iter_objects(self, bucket_name: str, prefix: str) -> AsyncGenerator[dict, None]:
+        async for page in self._paginate(Bucket=bucket_name, Prefix=prefix):
+            for item in page.get('Contents', ()):
+                yield item
+
+    async def _delete_objects(self, bucket_name: str, keys: AsyncIterable[str],
+                              max_concurrency: int = DEFAULT_DELETE_CONCURRENCY) -> int:
+        errors = []
+        deleted_count = 0
+
+        async def delete_batch(batch: Sequence[str]):
+            nonlocal deleted_count
+            response = await self._call(
+                'delete_objects', Bucket=bucket_name, Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+            batch_errors = response.get('Errors', ())
+            errors.extend((error['Key'], error['Code'], error.get('Message', '')) for error in batch_errors)
+            deleted_count += len(batch) - len(batch_errors)
+
+        async def delete_batches():
+            async for batch in batched(keys, MAX_DELETE_OBJECTS_COUNT):
+                yield delete_batch(batch)
+
+        await run_concurrently(delete_batches(), max_concurrency)
+
+        if errors:
+            raise ObjectDeleteError(bucket_name, errors)
+
+        return deleted_count
+
+    async def _cp(self, src_path: str | PurePath, dst_path: str | PurePath, max_concurrency: int,
+                  copied_keys: List[str] | None = None) -> dict | None:
+        """
+        Copies the file or directory, appending keys of copied source objects to ``copied_keys``
+        """
 
-            if isinstance(dst_item, collections.abc.Mapping):
-                if src_is_dir:
-                    pass
-                else:
-                    self._set_tree_item(self.tree, dst_path.joinpath(src_path.name), src_item)
-            else:
-                if dst_path_is_dir:
-                    raise ValueError(f'Unable to copy {src_path} to directory path. it is a file')
-
-                if src_is_dir:
-                    raise ValueError(f'Unable to copy directory {src_path} to file {dst_path}')
-                else:
-                    self._set_tree_item(self.tree, dst_path, src_item)
-
-                self._set_tree_item(self.tree, dst_path, src_item)
-        except FileNotFoundError:
-            if src_is_dir:
-                pass
-            else:
-                if dst_path_is_dir:
-                    self._set_tree_item(self.tree, dst_path.joinpath(src_path.name), src_item)
-                else:
-                    self._set_tree_item(self.tree, dst_path, src_item)
+        dst_path_is_dir = isinstance(dst_path, str) and (dst_path.endswith('/') or dst_path.endswith('\\'))
+        src_bucket_name, src_key = self._split_path(src_path)
+        dst_bucket_name, dst_key = self._split_path(dst_path)
+        src_item = await self._head_object(src_bucket_name, src_key) if src_key else None
+
+        if src_item is None:
+            if src_key and not await self._has_children(src_bucket_name, src_key):
+                raise FileNotFoundError(src_path)
+
+            if dst_key and await self._head_object(dst_bucket_name, dst_key) is not None:
+                raise ValueError(f'Unable to copy directory {PurePath(src_path)} to file {PurePath(dst_path)}')
+
+            # The root of a bucket holds the copy itself unless the path asks for a directory in it
+            if dst_path_is_dir or (dst_key and await self._has_children(dst_bucket_name, dst_key)):
+                dst_key = str(PurePath(dst_key, PurePath(src_key or src_bucket_name).name))
+
+            src_prefix = self._dir_prefix(src_key)
+            dst_prefix = self._dir_prefix(dst_key)
+
+            # Later listing pages would return objects copied from earlier ones
+            if src_bucket_name == dst_bucket_name and dst_prefix.startswith(src_prefix):
+                raise ValueError(f'Unable to copy directory {PurePath(src_path)} into itself')
+
+            # Parts of large objects share the request budget of the fan-out instead of multiplying it
+            slots = asyncio.Semaphore(max_concurrency)
+
+            async def copy_object(item: dict):
+                await self._copy_object(src_bucket_name, item['Key'], dst_bucket_name,
+                                        f'{dst_prefix}{item["Key"][len(src_prefix):]}', item['Size'], item['ETag'],
+                                        max_concurrency, slots)
+
+                if copied_keys is not None:
+                    copied_keys.append(item['Key'])
+
+            async def copy_objects():
+                async for item in self._iter_objects(src_bucket_name, src_prefix):
+                    yield copy_object(item)
+
+            await run_concurrently(copy_objects(), max_concurrency)
+        else:
+            if not dst_key or dst_path_is_dir or await self._has_children(dst_bucket_name, dst_key):
+                dst_key = str(PurePath(dst_key, PurePath(src_key).name))
+
+            await self._copy_object(src_bucket_name, src_key, dst_bucket_name, dst_key, src_item['ContentLength'],
+                                    src_item['ETag'], max_concurrency)
+
+            if copied_keys is not None:
+                copied_keys.append(src_key)
+
+        return src_item
+
+    async def cp(self, src_path: str | PurePath, dst_path: str | PurePath,
+                 max_concurrency: int = DEFAULT_COPY_CONCURRENCY):
+        """
+        Copies objects server side, so data never passes through this process. Objects above 5 GB are copied as
+        parallel ``UploadPartCopy`` parts and directories fan out over at most ``max_concurrency`` copies.
+        """
+
+        await self._cp(src_path, dst_path, max_concurrency)
 
     async def mkdir(self, path: str | PurePath):
         return
@@ -190,114 +794,111 @@ class S3Protocol(BaseProtocol):
     async def mkdirs(self, path: str | PurePath):
         return
 
-    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath):
-        await self.cp(src_path, dst_path)
-        await self.rm(src_path)
+    async def mv(self, src_path: str | PurePath, dst_path: str | PurePath,
+                 max_concurrency: int = DEFAULT_COPY_CONCURRENCY):
+        """
+        Moves objects with a server side copy followed by batched ``DeleteObjects`` calls. Only the copied objects are
+        deleted, so objects written under the source while it is moved stay in place.
+        """
+
+        if self._split_path(src_path) == self._split_path(dst_path):
+            return
+
+        copied_keys = []
+        await self._cp(src_path, dst_path, max_concurrency, copied_keys)
+        await self._delete_objects(self._split_path(src_path)[0], _iterate(copied_keys), max_concurrency)
 
-    async def rm(self, path: str | PurePath):
+    async def rm(self, path: str | PurePath, dry_run: bool = False,
+                 max_concurrency: int = DEFAULT_DELETE_CONCURRENCY) -> int:
         """
-        Removes file
+        Removes a file or a directory recursively.
+
+        The listing is streamed into 1000-key ``DeleteObjects`` batches with at most ``max_concurrency`` batches in
+        flight. Returns the number of removed keys, or with ``dry_run`` the number of keys that would be removed.
+        Keys S3 refuses to delete are reported together in ``ObjectDeleteError``.
         """
 
-        if await self.is_dir(path):
-            bucket_name, path = self._split_path(path)
-            key_list = self.resource.Bucket(bucket_name).objects.filter(Prefix=f'{path}/')
+        bucket_name, key = self._split_path(path)
 
-            for key in key_list:
-                self.resource.Object(bucket_name, key.key).delete()
-        else:
-            bucket_name, path = self._split_path(path)
-            self.resource.Object(bucket_name, path).delete()
+        async def keys():
+            if key and await self._head_object(bucket_name, key) is not None:
+                yield key
 
-    async def is_dir(self, path: str | PurePath) -> bool:
-        return isinstance(self._get_tree_item(self.tree, path), collections.abc.Mapping)
-
-    async def glob(self, pattern: str) -> Tuple:
-        pass
-
-
-def _get_minio_client(endpoint_url: str, region_name: str, access_key_id: SecretStr, secret_access_key: SecretStr,
-                      secure: bool = True) -> Minio:
-    http_client = urllib3.PoolManager(
-        timeout=urllib3.util.Timeout(connect=300, read=300),
-        maxsize=10,
-        cert_reqs='CERT_REQUIRED' if secure else 'CERT_NONE',
-        retries=urllib3.Retry(
-            total=5,
-            backoff_factor=0.2,
-            status_forcelist=[500, 502, 503, 504]
-        )
-    )
+            async for item in self._iter_objects(bucket_name, self._dir_prefix(key)):
+                yield item['Key']
 
-    client = Minio(
-        endpoint_url,
-        region=region_name,
-        access_key=access_key_id.get_secret_value(),
-        secret_key=secret_access_key.get_secret_value(),
-        http_client=http_client,
-        secure=secure
-    )
+        if dry_run:
+            count = 0
 
-    return client
+            async for _ in keys():
+                count += 1
 
+            return count
 
-class MinioProtocol(BaseProtocol):
-    def __init__(self, endpoint_url: str, region_name: str, access_key_id: SecretStr, secret_access_key: SecretStr,
-                 secure: bool = True, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.client: Minio = _get_minio_client(endpoint_url, region_name, access_key_id, secret_access_key, secure)
+        return await self._delete_objects(bucket_name, keys(), max_concurrency)
+
+    async def is_dir(self, path: str | PurePath) -> bool:
+        bucket_name, key = self._split_path(path)
+
+        if not key:
+            if await self._bucket_exists(bucket_name):
+                return True
+        elif await self._has_children(bucket_name, key):
+            return True
+        elif await self._head_object(bucket_name, key) is not None:
+            return False
 
-    @staticmethod
-    def _split_path(path: str | PurePath):
-        bucket_name, *parts = super()._split_path(path)
-        bucket_path = str(PurePath('/', *parts))
+        raise FileNotFoundError(path)
 
-        return bucket_name, bucket_path
+    async def glob(self, pattern: str) -> AsyncGenerator[PurePath, None]:
+        """
+        Yields paths matching the pattern, see ``GlobPattern``. The literal prefix of the pattern becomes the listing
+        ``Prefix``. Patterns without ``**`` are listed level by level with ``Delimiter``, descending only into
+        directories that can hold a match, and yield matching directories as well. Patterns with ``**`` are matched
+        against one flat listing and yield objects only.
+        """
 
-    def ls(self, path: str, pattern: str = None, *args, **kwargs) -> Sequence:
-        recursive = bool(kwargs.get('recursive'))
-        bucket_name, prefix = self._split_path(path)
+        bucket_name, key_pattern = self._split_path(pattern)
 
-        objects = self.client.list_objects(bucket_name, prefix, recursive)
+        if literal_prefix(bucket_name) != bucket_name:
+            raise ValueError(f'Bucket name must not contain wildcards: {pattern}')
 
-        return tuple(objects)
+        glob = compile_glob(key_pattern)
 
-    @asynccontextmanager
-    def open(self, path: str, *args, **kwargs):
-        raise NotImplemented
+        if glob.prefix == key_pattern:
+            if await self.exists(pattern):
+                yield PurePath(f'/{bucket_name}/{key_pattern}')
 
-    def exists(self, path: str) -> bool:
-        raise NotImplemented
+            return
 
-    def cp(self, src_path: str, dst_path: str):
-        raise NotImplemented
+        if glob.recursive:
+            async for item in self._iter_objects(bucket_name, glob.prefix):
+                if glob.match(item['Key']):
+                    yield PurePath(f'/{bucket_name}/{item["Key"]}')
 
-    def mkdir(self, path: str):
-        raise NotImplemented
+            return
 
-    def mkdirs(self, path: str):
-        raise NotImplemented
+        prefixes = [glob.prefix]
 
-    def mv(self, src_path: str, dst_path: str):
-        raise NotImplemented
+        while prefixes:
+            async for page in self._paginate(Bucket=bucket_name, Prefix=prefixes.pop(), Delimiter='/'):
+                for item in page.get('CommonPrefixes', ()):
+                    dir_key = item['Prefix'].rstrip('/')
 
-    def rm(self, path: str | PurePath):
-        """
-        Removes file
-        """
+                    if glob.match(dir_key):
+                        yield PurePath(f'/{bucket_name}/{dir_key}')
 
-        if self.is_dir(path):
-            bucket_name, path = self._split_path(path)
-            key_list = self.resource.Bucket(bucket_name).objects.filter(Prefix=f'{path}/')
+                    if glob.may_contain(dir_key):
+                        prefixes.append(item['Prefix'])
+
+                for item in page.get('Contents', ()):
+                    if glob.match(item['Key']):
+                        yield PurePath(f'/{bucket_name}/{item["Key"]}')
 
-            for key in key_list:
-                self.resource.Object(bucket_name, key.key).delete()
-        else:
-            bucket_name, path = self._split_path(path)
-            self.resource.Object(bucket_name, path).delete()
 
-    def is_dir(self, path: str) -> bool:
-        raise NotImplemented
+def __getattr__(name: str):
+    # Minio classes moved to aiofm.protocols.minio, which is imported only when they are used
+    if name.startswith('Minio'):
+        return getattr(importlib.import_module('aiofm.protocols.minio'), name)
 
-    def glob(self, pattern: str) -> Tuple:
-        raise NotImplemented
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
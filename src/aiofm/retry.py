@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import random
+import sys
+import time
+from collections import deque
+from typing import Awaitable, Callable, Collection
+
+import urllib3
+from botocore.exceptions import ClientError, ConnectionError as BotocoreConnectionError, HTTPClientError
+
+from aiofm.helpers import cancel_detached
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset((500, 502, 503, 504))
+RETRYABLE_ERROR_CODES = frozenset((
+    'InternalError', 'RequestTimeout', 'RequestLimitExceeded', 'ServiceUnavailable', 'SlowDown', 'Throttling',
+    'ThrottlingException',
+))
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError, ConnectionError, BotocoreConnectionError, HTTPClientError, urllib3.exceptions.HTTPError,
+)
+
+
+def is_minio_error(error: BaseException) -> bool:
+    """
+    Tells whether the error is a ``minio`` ``S3Error`` without importing ``minio``, which raises none until imported
+    """
+
+    module = sys.modules.get('minio.error')
+
+    return module is not None and isinstance(error, module.S3Error)
+
+
+class LatencyWindow:
+    """
+    Latencies of the last ``size`` requests
+    """
+
+    def __init__(self, size: int = 1024):
+        self._latencies = deque(maxlen=size)
+        self._sorted_latencies = None
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def add(self, latency: float):
+        self._latencies.append(latency)
+        self._sorted_latencies = None
+
+    def percentile(self, q: float) -> float:
+        if not self._latencies:
+            raise ValueError('No latencies recorded')
+
+        if self._sorted_latencies is None:
+            self._sorted_latencies = sorted(self._latencies)
+
+        return self._sorted_latencies[min(int(q * len(self._sorted_latencies)), len(self._sorted_latencies) - 1)]
+
+
+class RetryPolicy:
+    """
+    Retry and hedging policy shared by the S3 compatible protocols.
+
+    Failed requests are retried up to ``max_attempts`` times in total when they fail with a 5xx status, a throttling
+    error like ``SlowDown``, a connection error or a timeout. Delays grow exponentially from ``base_delay`` up to
+    ``max_delay`` with full jitter. Every attempt is cancelled after ``attempt_timeout`` seconds and no retry starts
+    once ``deadline`` seconds have passed since the first attempt.
+
+    With ``hedge_percentile``, e.g. ``0.95``, idempotent reads made through ``hedge`` send up to ``max_hedges``
+    duplicate requests when the first one is slower than that percentile of recent latencies and use whichever answers
+    first.
+    Hedging starts after ``hedge_min_samples`` latencies have been recorded.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.1, max_delay: float = 20.0,
+                 attempt_timeout: float | None = None, deadline: float | None = None,
+                 hedge_percentile: float | None = None, max_hedges: int = 1, hedge_min_samples: int = 20,
+                 retryable_error_codes: Collection[str] = RETRYABLE_ERROR_CODES,
+                 retryable_status_codes: Collection[int] = RETRYABLE_STATUS_CODES):
+        if max_attempts < 1:
+            raise ValueError('Max attempts must be a positive number')
+
+        if hedge_percentile is not None and not 0 < hedge_percentile < 1:
+            raise ValueError('Hedge percentile must be between 0 and 1')
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable_error_codes = frozenset(retryable_error_codes)
+        self.retryable_status_codes = frozenset(retryable_status_codes)
+        self.retries = 0
+        self.hedges = 0
+        self.latencies = LatencyWindow()
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(max_attempts={self.max_attempts}, base_delay={self.base_delay}, '
+                f'max_delay={self.max_delay}, attempt_timeout={self.attempt_timeout}, deadline={self.deadline}, '
+                f'hedge_percentile={self.hedge_percentile})')
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Returns a random delay before the retry following the given attempt, counted from 1
+        """
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, ClientError):
+            return (
+                error.response.get('Error', {}).get('Code') in self.retryable_error_codes
+                or error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') in self.retryable_status_codes
+            )
+
+        if is_minio_error(error):
+            return error.code in self.retryable_error_codes or error.response.status in self.retryable_status_codes
+
+        return isinstance(error, RETRYABLE_ERRORS)
+
+    def hedge_delay(self) -> float | None:
+        if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+            return None
+
+        return self.latencies.percentile(self.hedge_percentile)
+
+    async def _attempt(self, function: Callable[..., Awaitable], *args, **kwargs):
+        if self.attempt_timeout is None:
+            return await function(*args, **kwargs)
+
+        return await asyncio.wait_for(function(*args, **kwargs), self.attempt_timeout)
+
+    async def call(self, function: Callable[..., Awaitable], *args, **kwargs):
+        """
+        Awaits ``function(*args, **kwargs)``, retrying it according to the policy
+        """
+
+        started_at = time.monotonic()
+        attempt = 1
+
+        while True:
+            try:
+                return await self._attempt(function, *args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.is_retryable(e):
+                    raise
+
+                delay = self.backoff(attempt)
+
+                if self.deadline is not None and time.monotonic() + delay - started_at >= self.deadline:
+                    raise
+
+                logger.debug('Retrying %s in %.3fs after attempt %d failed: %r', function, delay, attempt, e)
+                self.retries += 1
+                attempt += 1
+
+                await asyncio.sleep(delay)
+
+    async def hedge(self, function: Callable[..., Awaitable], *args, **kwargs):
+        """
+        Awaits ``function(*args, **kwargs)`` once, sending duplicate requests when it is slow. Only use it for
+        idempotent requests and combine it with ``call`` for retries, e.g. ``policy.call(policy.hedge, read, ...)``.
+        """
+
+        hedge_delay = self.hedge_delay()
+        started_at = time.monotonic()
+        pending = {asyncio.ensure_future(function(*args, **kwargs))}
+        hedges = 0
+
+        try:
+            while True:
+                can_hedge = hedge_delay is not None and hedges < self.max_hedges
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay if can_hedge else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    if task.exception() is None:
+                        self.latencies.add(time.monotonic() - started_at)
+
+                        return task.result()
+
+                if not done:
+                    hedges += 1
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(function(*args, **kwargs)))
+                elif not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in pending:
+                cancel_detached(task)
+
+    def urllib3_retry(self) -> urllib3.Retry:
+        """
+        Returns the closest ``urllib3`` equivalent of the policy for clients making their own HTTP requests
+        """
+
+        return urllib3.Retry(
+            total=self.max_attempts - 1,
+            backoff_factor=self.base_delay,
+            backoff_max=self.max_delay,
+            backoff_jitter=self.base_delay,
+            status_forcelist=self.retryable_status_codes,
+        )
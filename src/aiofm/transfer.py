@@ -0,0 +1,91 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import PurePath
+from typing import Callable
+
+from aiofm.helpers import aread, awrite, run_concurrently
+from aiofm.protocols import BaseProtocol
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class TransferStats:
+    files: int = 0
+    bytes: int = 0
+    server_side_copies: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        Streamed bytes per second
+        """
+
+        elapsed = self.elapsed
+
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+
+async def _stream_file(src_protocol: BaseProtocol, src_path: PurePath, dst_protocol: BaseProtocol,
+                       dst_path: PurePath, chunk_size: int, stats: TransferStats):
+    async with src_protocol.open(src_path, 'rb') as fi, dst_protocol.open(dst_path, 'wb') as fo:
+        while chunk := await aread(fi, chunk_size):
+            await awrite(fo, chunk)
+            stats.bytes += len(chunk)
+
+
+async def transfer(src_protocol: BaseProtocol, src_path: str | PurePath, dst_protocol: BaseProtocol,
+                   dst_path: str | PurePath, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   progress: Callable[[TransferStats, PurePath], None] | None = None) -> TransferStats:
+    """
+    Copies a file or a whole directory between two protocols with at most ``max_concurrency`` files in flight.
+
+    Files are streamed in ``chunk_size`` chunks, so nothing is buffered whole. When both ends share the same storage,
+    e.g. two S3 protocols pointing to one endpoint, files are copied server side instead. ``progress`` is called with
+    the running stats and the source path after every copied file.
+    """
+
+    src_path = PurePath(src_path)
+    dst_path = PurePath(dst_path)
+    server_side = src_protocol._shares_storage_with(dst_protocol)
+    stats = TransferStats()
+
+    async def copy_file(src_file_path: PurePath):
+        if src_file_path == src_path:
+            dst_file_path = dst_path
+        else:
+            dst_file_path = dst_path.joinpath(src_file_path.relative_to(src_path))
+
+        if server_side:
+            await src_protocol._copy_file(src_file_path, dst_file_path)
+            stats.server_side_copies += 1
+        else:
+            await _stream_file(src_protocol, src_file_path, dst_protocol, dst_file_path, chunk_size, stats)
+
+        stats.files += 1
+        logger.debug(f'Copied {src_file_path} to {dst_file_path}')
+
+        if progress is not None:
+            progress(stats, src_file_path)
+
+    async def copy_files():
+        async for src_file_path in src_protocol.walk(src_path):
+            yield copy_file(src_file_path)
+
+    try:
+        await run_concurrently(copy_files(), max_concurrency)
+    finally:
+        stats.finished_at = time.monotonic()
+
+    return stats
@@ -1,22 +1,16 @@
-from aiofm.protocols.s3 import S3Protocol
-
+import asyncio
 
-def main():
-    protocol = S3Protocol()
-
-    for path in protocol.ls('/rtu-datasets/own_transport/'):
-        if str(path) == '/rtu-datasets/own_transport':
-            continue
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.transfer import transfer
 
-        print(path)
 
-        with protocol.open(path, 'rb') as fi, protocol.open(f'{path}.copy', 'wb') as fo:
-            for chunk in fi:
-                fo.write(chunk)
+async def main():
+    async with S3Protocol() as protocol:
+        stats = await transfer(protocol, '/rtu-datasets/own_transport', protocol, '/rtu-datasets/own_transport.copy',
+                               progress=lambda stats, path: print(path))
 
-        with protocol.open(path, 'rb') as fi, protocol.open(f'{path}.copy', 'wb') as fo:
-            fo.write(fi)
+    print(f'{stats.files} files in {stats.elapsed:.1f}s')
 
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
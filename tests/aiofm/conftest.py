@@ -1,8 +1,19 @@
 from typing import Dict, Generator
 from unittest.mock import patch
+from urllib.request import Request, urlopen
 
 import pytest
 from aiobotocore.session import AioSession
+from moto.server import ThreadedMotoServer
+from pydantic import SecretStr
+
+from aiofm.protocols.minio import MinioProtocol
+
+S3_CREDENTIALS = {
+    'region_name': 'us-east-1',
+    'aws_access_key_id': 'testing',
+    'aws_secret_access_key': 'testing',
+}
 
 
 @pytest.fixture(scope='session')
@@ -32,14 +43,37 @@ def fs_list(fs_tree) -> Dict:
 
 
 @pytest.fixture
-async def aioboto3_session():
-    async with AioSession() as session:
-        yield session
+def aioboto3_session() -> AioSession:
+    return AioSession()
+
+
+@pytest.fixture(scope='session')
+def s3_endpoint_url() -> Generator[str, None, None]:
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+
+    yield f'http://{host}:{port}'
+
+    server.stop()
+
+
+@pytest.fixture
+async def s3_client(aioboto3_session, s3_endpoint_url):
+    urlopen(Request(f'{s3_endpoint_url}/moto-api/reset', method='POST')).close()
+
+    async with aioboto3_session.create_client('s3', endpoint_url=s3_endpoint_url, **S3_CREDENTIALS) as client:
+        await client.create_bucket(Bucket='bucket')
+
+        yield client
 
 
 @pytest.fixture
-async def s3_client(aioboto3_session):
-    yield aioboto3_session.create_client('s3')
+async def s3_bucket(s3_client, fs_list) -> str:
+    for key, data in fs_list.items():
+        await s3_client.put_object(Bucket='bucket', Key=key, Body=data)
+
+    return 'bucket'
 
 
 @pytest.fixture
@@ -55,3 +89,15 @@ def s3_protocol_mock(aioboto3_session, s3_client):
         ]
 
         yield s3_client
+
+
+@pytest.fixture
+async def minio_protocol(s3_client, s3_endpoint_url) -> MinioProtocol:
+    async with MinioProtocol(
+        s3_endpoint_url.removeprefix('http://'),
+        S3_CREDENTIALS['region_name'],
+        SecretStr(S3_CREDENTIALS['aws_access_key_id']),
+        SecretStr(S3_CREDENTIALS['aws_secret_access_key']),
+        secure=False,
+    ) as protocol:
+        yield protocol
@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+
+from aiofm.protocols.caching import CachingProtocol
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.s3 import S3Protocol
+
+
+def count_backend_reads(monkeypatch, backend) -> list:
+    reads = []
+    backend_open = backend.open
+
+    def open_(path, *args, **kwargs):
+        mode = kwargs.get('mode', args[0] if len(args) else 'r')
+
+        if 'r' in mode:
+            reads.append(str(path))
+
+        return backend_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(backend, 'open', open_)
+
+    return reads
+
+
+@pytest.fixture
+def backend() -> MemoryProtocol:
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'a.txt': b'data data data', 'dir': {'b.txt': b'another data'}}}}
+
+    return fs
+
+
+@pytest.mark.asyncio
+async def test_read_through(monkeypatch, backend):
+    reads = count_backend_reads(monkeypatch, backend)
+    fs = CachingProtocol(backend)
+
+    for _ in range(3):
+        async with fs.open('/tmp/a.txt', 'rb') as f:
+            assert f.read() == b'data data data'
+
+    async with fs.open('/tmp/a.txt') as f:
+        assert f.read() == 'data data data'
+
+    assert reads == ['/tmp/a.txt']
+    assert fs.cache.tree == {'/': {'tmp': {'a.txt': b'data data data'}}}
+
+    with pytest.raises(FileNotFoundError):
+        async with fs.open('/tmp/missing.txt', 'rb'):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_download(monkeypatch, backend):
+    reads = count_backend_reads(monkeypatch, backend)
+    fs = CachingProtocol(backend)
+
+    async def read():
+        async with fs.open('/tmp/a.txt', 'rb') as f:
+            return f.read()
+
+    assert await asyncio.gather(*(read() for _ in range(10))) == [b'data data data'] * 10
+    assert reads == ['/tmp/a.txt']
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_reloaded(monkeypatch, backend):
+    reads = count_backend_reads(monkeypatch, backend)
+    fs = CachingProtocol(backend, validation='size')
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        f.read()
+
+    async with backend.open('/tmp/a.txt', 'wb') as f:
+        f.write(b'TEST')
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        assert f.read() == b'TEST'
+
+    assert reads == ['/tmp/a.txt', '/tmp/a.txt']
+
+
+@pytest.mark.asyncio
+async def test_revalidate_after_and_no_validation(monkeypatch, backend):
+    for fs in (CachingProtocol(backend, validation=None), CachingProtocol(backend, revalidate_after=60)):
+        async with fs.open('/tmp/a.txt', 'rb') as f:
+            f.read()
+
+        monkeypatch.setattr(backend, '_stat', None)
+
+        async with fs.open('/tmp/a.txt', 'rb') as f:
+            assert f.read() == b'data data data'
+
+        monkeypatch.undo()
+
+
+@pytest.mark.asyncio
+async def test_file_larger_than_cache_is_served_from_backend(backend):
+    fs = CachingProtocol(backend, MemoryProtocol(max_bytes=4))
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        assert f.read() == b'data data data'
+
+    assert not await fs.cache.exists('/tmp/a.txt')
+
+
+@pytest.mark.asyncio
+async def test_write_through(backend):
+    fs = CachingProtocol(backend)
+
+    async with fs.open('/tmp/new.txt', 'w') as f:
+        f.write('TEST')
+
+    assert backend.tree['/']['tmp']['new.txt'] == b'TEST'
+    assert fs.cache.tree['/']['tmp']['new.txt'] == b'TEST'
+
+
+@pytest.mark.asyncio
+async def test_write_back(backend):
+    fs = CachingProtocol(backend, write_policy='back')
+
+    async with fs.open('/tmp/new.txt', 'wb') as f:
+        f.write(b'TEST')
+
+    assert not await backend.exists('/tmp/new.txt')
+    assert await fs.exists('/tmp/new.txt')
+
+    async with fs.open('/tmp/new.txt', 'rb') as f:
+        assert f.read() == b'TEST'
+
+    await fs.close()
+
+    assert backend.tree['/']['tmp']['new.txt'] == b'TEST'
+
+
+@pytest.mark.asyncio
+async def test_written_back_files_are_listed(backend):
+    fs = CachingProtocol(backend, write_policy='back')
+
+    for path in ('/tmp/new.txt', '/tmp/new_dir/c.txt', '/other/d.txt'):
+        async with fs.open(path, 'wb') as f:
+            f.write(b'TEST')
+
+    assert [name async for name in fs.ls('/tmp')] == ['a.txt', 'dir', 'new.txt', 'new_dir']
+    assert [str(path) async for path in fs.walk('/tmp/new_dir')] == ['/tmp/new_dir/c.txt']
+    assert list(fs._dirty) == ['/other/d.txt']
+    assert [str(path) async for path in fs.glob('/other/*.txt')] == ['/other/d.txt']
+    assert not fs._dirty
+
+
+@pytest.mark.asyncio
+async def test_write_back_is_flushed_on_overflow(backend):
+    fs = CachingProtocol(backend, write_policy='back', max_dirty_bytes=6)
+
+    async with fs.open('/tmp/new.txt', 'wb') as f:
+        f.write(b'TEST')
+
+    assert fs._dirty_bytes == 4
+    assert not await backend.exists('/tmp/new.txt')
+
+    async with fs.open('/tmp/new.txt', 'wb') as f:
+        f.write(b'DATA')
+
+    assert fs._dirty_bytes == 4
+
+    async with fs.open('/tmp/c.txt', 'wb') as f:
+        f.write(b'DATA')
+
+    assert fs._dirty_bytes == 0
+    assert backend.tree['/']['tmp']['new.txt'] == b'DATA'
+    assert backend.tree['/']['tmp']['c.txt'] == b'DATA'
+
+
+@pytest.mark.asyncio
+async def test_write_around(backend):
+    fs = CachingProtocol(backend, write_policy='around')
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        f.read()
+
+    async with fs.open('/tmp/a.txt', 'wb') as f:
+        f.write(b'TEST')
+
+    assert not await fs.cache.exists('/tmp/a.txt')
+    assert backend.tree['/']['tmp']['a.txt'] == b'TEST'
+
+    with pytest.raises(ValueError):
+        CachingProtocol(backend, write_policy='sideways')
+
+
+@pytest.mark.asyncio
+async def test_rm_and_mv_invalidate(backend):
+    fs = CachingProtocol(backend)
+
+    for path in ('/tmp/a.txt', '/tmp/dir/b.txt'):
+        async with fs.open(path, 'rb') as f:
+            f.read()
+
+    await fs.mv('/tmp/a.txt', '/tmp/c.txt')
+    await fs.rm('/tmp/dir')
+
+    assert fs.cache.tree == {'/': {'tmp': {}}}
+    assert backend.tree == {'/': {'tmp': {'c.txt': b'data data data'}}}
+
+
+@pytest.mark.asyncio
+async def test_s3_etag_validation(s3_client, s3_bucket):
+    backend = S3Protocol()
+    backend.client = s3_client
+    fs = CachingProtocol(backend)
+
+    async with fs.open('/bucket/tmp/existing.txt', 'rb') as f:
+        assert f.read() == b'data data data'
+
+    await s3_client.put_object(Bucket='bucket', Key='tmp/existing.txt', Body=b'DATA DATA DATA')
+
+    async with fs.open('/bucket/tmp/existing.txt', 'rb') as f:
+        assert f.read() == b'DATA DATA DATA'
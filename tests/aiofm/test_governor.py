@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aiofm.governor import RequestGovernor, TokenBucket, is_throttling
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.retry import RetryPolicy
+
+
+def slow_down() -> ClientError:
+    return ClientError({'Error': {'Code': 'SlowDown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, 'PutObject')
+
+
+async def ok(value=None):
+    return value
+
+
+def test_is_throttling():
+    assert is_throttling(slow_down())
+    assert not is_throttling(ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject'))
+    assert not is_throttling(ValueError())
+
+
+def test_invalid_governor():
+    with pytest.raises(ValueError):
+        RequestGovernor(decrease=1.5)
+
+    with pytest.raises(ValueError):
+        RequestGovernor(prefix_depth=0)
+
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(100, burst=1)
+    started_at = time.monotonic()
+
+    await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+
+    assert time.monotonic() - started_at >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_bursts():
+    bucket = TokenBucket(1, burst=10)
+    started_at = time.monotonic()
+
+    await asyncio.gather(*(bucket.acquire() for _ in range(10)))
+
+    assert time.monotonic() - started_at < 0.5
+
+
+def test_token_bucket_adapts_rate():
+    bucket = TokenBucket(100, min_rate=10, increase=5)
+
+    bucket.throttle(0.5)
+    assert bucket.rate == 50
+
+    for _ in range(3):
+        bucket.throttle(0.5)
+
+    assert bucket.rate == 10
+
+    bucket.succeed()
+    assert bucket.rate == 15
+
+    for _ in range(100):
+        bucket.succeed()
+
+    assert bucket.rate == 100
+
+
+def test_buckets_per_class_and_prefix():
+    governor = RequestGovernor(rates={'DELETE': None}, prefix_depth=1)
+
+    assert governor.get_bucket('GET', 'bucket', 'a/b.txt') is governor.get_bucket('GET', 'bucket', 'a/c/d.txt')
+    assert governor.get_bucket('GET', 'bucket', 'a/b.txt') is not governor.get_bucket('GET', 'bucket', 'b/c.txt')
+    assert governor.get_bucket('GET', 'bucket', 'a/b.txt') is not governor.get_bucket('PUT', 'bucket', 'a/b.txt')
+    assert governor.get_bucket('GET', 'bucket', 'a') is not governor.get_bucket('GET', 'other', 'a')
+    assert governor.get_bucket('DELETE', 'bucket', 'a') is None
+    assert governor.get_bucket('GET', 'bucket', 'a').rate == 5500
+
+
+@pytest.mark.asyncio
+async def test_call_lowers_rate_on_throttling():
+    governor = RequestGovernor(rates={'PUT': 100})
+
+    async def put_object():
+        raise slow_down()
+
+    with pytest.raises(ClientError):
+        await governor.call('put_object', 'bucket', 'a.txt', put_object)
+
+    assert governor.throttled == 1
+    assert governor.get_bucket('PUT', 'bucket').rate == 50
+    assert await governor.call('get_object', 'bucket', 'a.txt', ok, 'data') == 'data'
+    assert governor.get_bucket('GET', 'bucket').rate == 5500
+
+
+@pytest.mark.asyncio
+async def test_call_limits_concurrency():
+    governor = RequestGovernor(max_concurrency={'GET': 2})
+    in_flight = 0
+    max_in_flight = 0
+
+    async def get_object():
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    await asyncio.gather(*(governor.call('get_object', 'bucket', 'a.txt', get_object) for _ in range(10)))
+
+    assert max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_s3_protocol_is_governed(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol(retry_policy=RetryPolicy(base_delay=0.001), governor=RequestGovernor(prefix_depth=1))
+    fs.client = s3_client
+    head_object = s3_client.head_object
+    errors = [slow_down()]
+
+    async def head_object_(**kwargs):
+        if errors:
+            raise errors.pop()
+
+        return await head_object(**kwargs)
+
+    monkeypatch.setattr(s3_client, 'head_object', head_object_)
+
+    assert await fs.exists('/bucket/tmp/existing.txt')
+    assert fs.governor.throttled == 1
+    assert fs.governor.get_bucket('GET', 'bucket', 'tmp').rate < 5500
+    assert fs.governor.get_bucket('GET', 'bucket', 'other').rate == 5500
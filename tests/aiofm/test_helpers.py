@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from aiofm.helpers import merge_concurrently, run_concurrently
+
+
+@pytest.mark.asyncio
+async def test_run_concurrently_limits_coroutines_in_flight():
+    running = 0
+    max_running = 0
+
+    async def job():
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def jobs():
+        for _ in range(10):
+            yield job()
+
+    assert await run_concurrently(jobs(), 3) == 10
+    assert max_running == 3
+
+
+@pytest.mark.asyncio
+async def test_run_concurrently_cancels_pending_coroutines_on_failure():
+    cancelled = []
+
+    async def slow_job():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def failing_job():
+        raise RuntimeError
+
+    async def jobs():
+        yield slow_job()
+        yield failing_job()
+
+    with pytest.raises(RuntimeError):
+        await run_concurrently(jobs(), 2)
+
+    assert cancelled == [True]
+
+
+async def delayed(items, delay: float):
+    for item in items:
+        await asyncio.sleep(delay)
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_merge_concurrently_keeps_order():
+    iterables = [delayed((1, 2), 0.03), delayed((3, 4), 0.01), delayed((5,), 0)]
+
+    assert [item async for item in merge_concurrently(iterables, 2)] == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_merge_concurrently_unordered():
+    iterables = [delayed((1, 2), 0.05), delayed((3, 4), 0.01)]
+
+    assert [item async for item in merge_concurrently(iterables, 2, ordered=False)] == [3, 4, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_merge_concurrently_cancels_iterables_on_failure():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+            yield 1
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def failing():
+        raise RuntimeError
+        yield
+
+    with pytest.raises(RuntimeError):
+        [item async for item in merge_concurrently([failing(), slow()], 2)]
+
+    assert cancelled == [True]
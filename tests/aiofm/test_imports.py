@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SDK_PACKAGES = ('aiobotocore', 'aiohttp', 'botocore', 'minio', 'pkg_resources', 'pydantic', 'urllib3')
+
+
+def imported_packages(code: str) -> set:
+    """
+    Runs the code in a fresh interpreter and returns the SDK packages it imported
+    """
+
+    script = f'{code}\nimport json, sys\nprint(json.dumps(sorted({{name.split(".")[0] for name in sys.modules}})))'
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True).stdout
+
+    return set(json.loads(output.splitlines()[-1])) & set(SDK_PACKAGES)
+
+
+@pytest.mark.parametrize('code', [
+    'import aiofm',
+    'import aiofm.manager',
+    'import aiofm.protocols.caching, aiofm.protocols.indexed, aiofm.protocols.local, aiofm.protocols.memory',
+    'from aiofm.protocols import get_protocol; get_protocol("mem"); get_protocol("file")',
+])
+def test_lightweight_imports_do_not_load_sdks(code):
+    assert imported_packages(code) == set()
+
+
+def test_s3_protocol_does_not_load_minio():
+    packages = imported_packages('from aiofm.protocols import get_protocol; get_protocol("s3")')
+
+    assert 'aiobotocore' in packages
+    assert 'minio' not in packages
+
+
+def test_minio_protocol_is_loaded_on_demand():
+    packages = imported_packages('from aiofm.protocols.s3 import MinioProtocol')
+
+    assert 'minio' in packages
+
+
+def test_minio_protocol_does_not_load_aiobotocore():
+    packages = imported_packages('from aiofm.protocols.minio import MinioProtocol')
+
+    assert 'minio' in packages
+    assert not packages & {'aiobotocore', 'aiohttp'}
+
+
+def test_version_is_looked_up_lazily():
+    import aiofm
+
+    assert isinstance(aiofm.__version__, str)
+
+    with pytest.raises(AttributeError):
+        aiofm.missing
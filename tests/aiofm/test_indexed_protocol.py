@@ -0,0 +1,183 @@
+import asyncio
+from pathlib import PurePath
+
+import pytest
+
+from aiofm.helpers import awrite
+from aiofm.protocols.indexed import IndexedProtocol
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.s3 import S3Protocol
+
+
+def count_backend_listings(monkeypatch, backend) -> list:
+    listings = []
+    backend_scan = backend.scan
+
+    def scan(path, *args, **kwargs):
+        listings.append(str(path))
+
+        return backend_scan(path, *args, **kwargs)
+
+    monkeypatch.setattr(backend, 'scan', scan)
+
+    return listings
+
+
+@pytest.fixture
+def backend() -> MemoryProtocol:
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'a.txt': b'data data data', 'dir': {'b.txt': b'another data'}, 'empty': {}}}}
+
+    return fs
+
+
+@pytest.mark.asyncio
+async def test_listings_are_served_from_index(monkeypatch, backend):
+    listings = count_backend_listings(monkeypatch, backend)
+
+    async with IndexedProtocol(backend) as fs:
+        assert [str(path) async for path in fs.ls('/tmp')] == ['/tmp/a.txt', '/tmp/dir/b.txt']
+        assert [path.name async for path in fs.ls('/tmp', recursive=False)] == ['a.txt', 'dir', 'empty']
+        assert [(entry.name, entry.size) async for entry in fs.scan('/tmp/dir')] == [('b.txt', 12)]
+        assert [str(path) async for path in fs.glob('/tmp/**/*.txt')] == ['/tmp/a.txt', '/tmp/dir/b.txt']
+        assert [str(path) async for path in fs.walk('/tmp')] == ['/tmp/a.txt', '/tmp/dir/b.txt']
+        assert await fs.exists('/tmp/dir/b.txt') is True
+        assert await fs.exists('/tmp/missing.txt') is False
+        assert await fs.is_dir('/tmp/empty') is True
+        assert await fs.is_dir('/tmp/a.txt') is False
+        assert await fs._stat('/tmp/a.txt') == (14, None)
+
+        with pytest.raises(FileNotFoundError):
+            await fs.is_dir('/tmp/missing')
+
+        with pytest.raises(NotADirectoryError):
+            [entry async for entry in fs.scan('/tmp/a.txt')]
+
+    assert listings == ['/tmp']
+
+
+@pytest.mark.asyncio
+async def test_concurrent_listings_share_resync(monkeypatch, backend):
+    listings = count_backend_listings(monkeypatch, backend)
+
+    async with IndexedProtocol(backend) as fs:
+        async def ls():
+            return [path async for path in fs.ls('/tmp')]
+
+        results = await asyncio.gather(ls(), ls(), ls())
+
+    assert results[0] == results[1] == results[2]
+    assert listings == ['/tmp']
+
+
+@pytest.mark.asyncio
+async def test_outdated_listings_are_refreshed(monkeypatch, backend):
+    listings = count_backend_listings(monkeypatch, backend)
+
+    async with IndexedProtocol(backend, max_age=0) as fs:
+        first = await fs.resync('/tmp')
+
+        assert first.changed == 4
+        assert first.removed == 0
+
+        async with backend.open('/tmp/a.txt', 'wb') as f:
+            await awrite(f, b'new data')
+
+        await backend.rm('/tmp/dir')
+        await asyncio.sleep(0.01)
+
+        assert [str(path) async for path in fs.ls('/tmp')] == ['/tmp/a.txt']
+        assert [(entry.name, entry.size) async for entry in fs.changes('/tmp', first.listed_at)] == [('a.txt', 8)]
+
+    assert listings == ['/tmp', '/tmp']
+
+
+@pytest.mark.asyncio
+async def test_writes_update_index(monkeypatch, backend):
+    listings = count_backend_listings(monkeypatch, backend)
+
+    async with IndexedProtocol(backend, max_age=None) as fs:
+        assert [path.name async for path in fs.ls('/tmp', recursive=False)] == ['a.txt', 'dir', 'empty']
+        assert await fs.exists('/tmp/new/c.txt') is False
+
+        async with fs.open('/tmp/new/c.txt', 'wb') as f:
+            await awrite(f, b'new')
+
+        await fs.mv('/tmp/a.txt', '/tmp/moved.txt')
+        await fs.rm('/tmp/dir')
+        await fs.mkdirs('/tmp/created')
+
+        assert [str(path) async for path in fs.ls('/tmp', recursive=False)] == [
+            '/tmp/created', '/tmp/empty', '/tmp/moved.txt', '/tmp/new',
+        ]
+        assert await fs._stat('/tmp/new/c.txt') == (3, None)
+
+    assert listings == ['/tmp']
+
+
+@pytest.mark.asyncio
+async def test_index_is_kept_in_database(tmp_path, monkeypatch, backend):
+    database = tmp_path / 'index.sqlite'
+
+    async with IndexedProtocol(backend, database, max_age=None) as fs:
+        await fs.resync('/tmp')
+
+    listings = count_backend_listings(monkeypatch, backend)
+
+    async with IndexedProtocol(backend, database, max_age=None) as fs:
+        assert [str(path) async for path in fs.ls('/tmp')] == ['/tmp/a.txt', '/tmp/dir/b.txt']
+        assert await fs.exists(PurePath('/tmp/dir')) is True
+
+    assert listings == []
+
+
+@pytest.mark.asyncio
+async def test_closed_protocol_fails(backend):
+    async with IndexedProtocol(backend) as fs:
+        await fs.resync('/tmp')
+
+    await fs.close()
+
+    with pytest.raises(RuntimeError, match='IndexedProtocol is closed'):
+        await fs.exists('/tmp/a.txt')
+
+
+@pytest.mark.asyncio
+async def test_s3_listings_are_made_once(s3_client, s3_bucket, monkeypatch):
+    backend = S3Protocol()
+    backend.client = s3_client
+    requests = []
+    call = backend._call
+
+    async def call_(operation_name, **kwargs):
+        requests.append(operation_name)
+
+        return await call(operation_name, **kwargs)
+
+    monkeypatch.setattr(backend, '_call', call_)
+
+    async with IndexedProtocol(backend) as fs:
+        for _ in range(3):
+            assert [str(path) async for path in fs.ls('/bucket/tmp')] == [
+                '/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/another_existing.txt',
+            ]
+            assert await fs.exists('/bucket/tmp/existing_dir') is True
+            assert await fs.is_dir('/bucket/tmp/existing.txt') is False
+
+    assert requests == ['list_objects_v2']
+
+
+@pytest.mark.asyncio
+async def test_s3_dirs_are_indexed_like_listings(s3_client, s3_bucket):
+    backend = S3Protocol()
+    backend.client = s3_client
+
+    async with IndexedProtocol(backend, max_age=None) as fs:
+        await fs.resync('/bucket/tmp')
+        await fs.mkdirs('/bucket/tmp/created')
+
+        assert await fs.exists('/bucket/tmp/created') is False
+
+        await fs.resync('/bucket/tmp')
+
+        assert await fs.exists('/bucket/tmp/created') is False
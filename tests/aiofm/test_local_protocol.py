@@ -0,0 +1,192 @@
+import errno
+import os
+from pathlib import PurePath
+
+import pytest
+
+from aiofm.protocols import get_protocol, local
+from aiofm.protocols.local import LocalProtocol
+
+
+@pytest.fixture
+async def fs():
+    fs = LocalProtocol(max_workers=2)
+
+    yield fs
+
+    await fs.close()
+
+
+@pytest.fixture
+def tmp_tree(tmp_path):
+    (tmp_path / 'existing_empty_dir').mkdir()
+    (tmp_path / 'existing_dir').mkdir()
+    (tmp_path / 'existing_dir' / 'another_existing.txt').write_bytes(b'another data')
+    (tmp_path / 'existing.txt').write_bytes(b'data data data')
+
+    return tmp_path
+
+
+def test_file_scheme_is_registered():
+    assert isinstance(get_protocol('file'), LocalProtocol)
+
+
+@pytest.mark.asyncio
+async def test_ls(fs, tmp_tree):
+    assert sorted([name async for name in fs.ls(tmp_tree)]) == ['existing.txt', 'existing_dir', 'existing_empty_dir']
+    assert [name async for name in fs.ls(tmp_tree, '*.txt')] == ['existing.txt']
+
+    with pytest.raises(FileNotFoundError):
+        [name async for name in fs.ls(tmp_tree / 'missing')]
+
+
+@pytest.mark.asyncio
+async def test_walk_and_glob(fs, tmp_tree):
+    assert sorted([path async for path in fs.walk(tmp_tree)]) == [
+        PurePath(tmp_tree, 'existing.txt'),
+        PurePath(tmp_tree, 'existing_dir', 'another_existing.txt'),
+    ]
+    assert sorted([path async for path in fs.glob(f'{tmp_tree}/**/*.txt')]) == [
+        PurePath(tmp_tree, 'existing.txt'),
+        PurePath(tmp_tree, 'existing_dir', 'another_existing.txt'),
+    ]
+    assert sorted([path async for path in fs.glob(f'{tmp_tree}/existing_*')]) == [
+        PurePath(tmp_tree, 'existing_dir'),
+        PurePath(tmp_tree, 'existing_empty_dir'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_exists_and_is_dir(fs, tmp_tree):
+    assert await fs.exists(tmp_tree / 'existing.txt')
+    assert not await fs.exists(tmp_tree / 'missing.txt')
+    assert await fs.is_dir(tmp_tree / 'existing_dir')
+    assert not await fs.is_dir(tmp_tree / 'existing.txt')
+
+    with pytest.raises(FileNotFoundError):
+        await fs.is_dir(tmp_tree / 'missing')
+
+
+@pytest.mark.asyncio
+async def test_read_and_write(fs, tmp_tree):
+    async with fs.open(tmp_tree / 'new.txt', 'w') as f:
+        await f.write('TEST ąčę')
+
+    async with fs.open(tmp_tree / 'new.txt') as f:
+        assert await f.read() == 'TEST ąčę'
+
+    async with fs.open(tmp_tree / 'existing.txt', 'rb') as f:
+        f.seek(5)
+        assert await f.read(4) == b'data'
+        assert f.tell() == 9
+
+
+@pytest.mark.asyncio
+async def test_writes_create_parent_dirs(fs, tmp_tree):
+    async with fs.open(tmp_tree / 'a' / 'b' / 'new.txt', 'wb') as f:
+        await f.write(b'new data')
+
+    await fs.cp(tmp_tree / 'existing.txt', tmp_tree / 'c' / 'copy.txt')
+    await fs.mv(tmp_tree / 'existing_dir' / 'another_existing.txt', tmp_tree / 'd' / 'moved.txt')
+
+    assert (tmp_tree / 'a' / 'b' / 'new.txt').read_bytes() == b'new data'
+    assert (tmp_tree / 'c' / 'copy.txt').read_bytes() == b'data data data'
+    assert (tmp_tree / 'd' / 'moved.txt').read_bytes() == b'another data'
+
+    with pytest.raises(FileNotFoundError):
+        async with fs.open(tmp_tree / 'e' / 'missing.txt', 'r+b'):
+            pass
+
+    with pytest.raises(FileNotFoundError):
+        await fs.mv(tmp_tree / 'missing.txt', tmp_tree / 'f' / 'moved.txt')
+
+    assert not (tmp_tree / 'e').exists()
+    assert not (tmp_tree / 'f').exists()
+
+
+@pytest.mark.asyncio
+async def test_mmap_read(fs, tmp_tree):
+    async with fs.open(tmp_tree / 'existing.txt', 'rb', mmap=True) as f:
+        assert f.read(4) == b'data'
+        assert bytes(f.readview()) == b' data data'
+
+    (tmp_tree / 'empty.txt').write_bytes(b'')
+
+    async with fs.open(tmp_tree / 'empty.txt', 'rb', mmap=True) as f:
+        assert f.read() == b''
+
+    with pytest.raises(ValueError):
+        async with fs.open(tmp_tree / 'existing.txt', 'r', mmap=True):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_cp(fs, tmp_tree):
+    await fs.cp(tmp_tree / 'existing.txt', tmp_tree / 'copy.txt')
+    await fs.cp(tmp_tree / 'existing.txt', tmp_tree / 'existing_empty_dir')
+    await fs.cp(tmp_tree / 'existing_dir', tmp_tree / 'copied_dir')
+
+    assert (tmp_tree / 'copy.txt').read_bytes() == b'data data data'
+    assert (tmp_tree / 'existing_empty_dir' / 'existing.txt').read_bytes() == b'data data data'
+    assert (tmp_tree / 'copied_dir' / 'another_existing.txt').read_bytes() == b'another data'
+
+
+@pytest.mark.asyncio
+async def test_cp_falls_back_to_buffered_copy(fs, tmp_tree, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.ENOSYS, 'Not supported')
+
+    monkeypatch.setattr(local, 'COPY_RANGE_FUNCTIONS', (unsupported,))
+    await fs.cp(tmp_tree / 'existing.txt', tmp_tree / 'copy.txt')
+
+    assert (tmp_tree / 'copy.txt').read_bytes() == b'data data data'
+
+
+@pytest.mark.asyncio
+async def test_mv(fs, tmp_tree, monkeypatch):
+    await fs.mv(tmp_tree / 'existing.txt', tmp_tree / 'existing_dir')
+
+    assert not (tmp_tree / 'existing.txt').exists()
+    assert (tmp_tree / 'existing_dir' / 'existing.txt').read_bytes() == b'data data data'
+
+    def rename(*args):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+    monkeypatch.setattr(os, 'rename', rename)
+    await fs.mv(tmp_tree / 'existing_dir', tmp_tree / 'moved_dir')
+
+    assert sorted(os.listdir(tmp_tree / 'moved_dir')) == ['another_existing.txt', 'existing.txt']
+    assert not (tmp_tree / 'existing_dir').exists()
+
+
+@pytest.mark.asyncio
+async def test_mkdirs_and_rm(fs, tmp_tree):
+    await fs.mkdirs(tmp_tree / 'a' / 'b')
+    await fs.mkdir(tmp_tree / 'a' / 'c')
+
+    assert sorted(os.listdir(tmp_tree / 'a')) == ['b', 'c']
+
+    await fs.rm(tmp_tree / 'a')
+    await fs.rm(tmp_tree / 'existing.txt')
+
+    assert sorted(os.listdir(tmp_tree)) == ['existing_dir', 'existing_empty_dir']
+
+
+@pytest.mark.asyncio
+async def test_scan(fs, tmp_tree):
+    entries = {entry.name: entry async for entry in fs.scan(tmp_tree)}
+    stat = os.stat(tmp_tree / 'existing.txt')
+
+    assert sorted(entries) == ['existing.txt', 'existing_dir', 'existing_empty_dir']
+    assert entries['existing_dir'].is_dir is True
+    assert entries['existing_dir'].size is None
+    assert entries['existing.txt'].size == 14
+    assert entries['existing.txt'].mtime == stat.st_mtime
+    assert entries['existing.txt'].etag == (await fs._stat(tmp_tree / 'existing.txt'))[1]
+    assert sorted([entry.path async for entry in fs.scan(tmp_tree, '**/*.txt', recursive=True)]) == [
+        PurePath(tmp_tree, 'existing.txt'),
+        PurePath(tmp_tree, 'existing_dir', 'another_existing.txt'),
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        await fs.scan(tmp_tree / 'missing').__anext__()
@@ -0,0 +1,87 @@
+import pytest
+from pydantic import SecretStr
+
+from aiofm.manager import FileManager
+from aiofm.protocols import close_protocols, get_protocol, get_protocol_for_path, split_url
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.s3 import S3Protocol
+
+
+@pytest.fixture(autouse=True)
+async def cached_protocols():
+    yield
+    await close_protocols()
+
+
+def test_split_url():
+    assert split_url('s3://bucket/tmp/a.txt') == ('s3', '/bucket/tmp/a.txt')
+    assert split_url('mem:///tmp/a.txt') == ('mem', '/tmp/a.txt')
+    assert split_url('/tmp/a.txt') == ('file', '/tmp/a.txt')
+    assert split_url('s3://bucket/a?b#c') == ('s3', '/bucket/a?b#c')
+
+
+def test_protocol_instances_are_cached_per_options():
+    s3 = get_protocol_for_path('s3://bucket/a.txt', endpoint_url='http://localhost:9000')
+
+    assert isinstance(s3, S3Protocol)
+    assert get_protocol('s3', endpoint_url='http://localhost:9000') is s3
+    assert get_protocol('s3', endpoint_url='http://localhost:9001') is not s3
+    assert get_protocol('s3', endpoint_url='http://localhost:9000', access_key_id=SecretStr('key')) is not s3
+    assert isinstance(get_protocol_for_path('mem:///tmp'), MemoryProtocol)
+
+
+@pytest.mark.asyncio
+async def test_protocols_with_unhashable_options():
+    config = {'retries': {'max_attempts': 3}, 'addressing_style': ['path']}
+    s3 = get_protocol('s3', endpoint_url='http://localhost:9000', config=config)
+
+    assert isinstance(s3, S3Protocol)
+    assert get_protocol('s3', endpoint_url='http://localhost:9000', config=dict(config)) is s3
+    assert get_protocol('s3', endpoint_url='http://localhost:9000', config={**config, 'retries': {}}) is not s3
+
+    class Options:
+        __hash__ = None
+
+    options = Options()
+    memory = get_protocol('mem', options=options)
+
+    assert isinstance(memory, MemoryProtocol)
+    assert get_protocol('mem', options=options) is not memory
+
+    closed = []
+
+    async def close():
+        closed.append(memory)
+
+    memory.close = close
+    await close_protocols()
+
+    assert closed == [memory]
+
+
+def test_unknown_protocol_fails():
+    with pytest.raises(ValueError, match='Unsupported protocol: ftp'):
+        get_protocol_for_path('ftp://host/a.txt')
+
+
+@pytest.mark.asyncio
+async def test_file_manager_dispatches_to_protocols(s3_client):
+    manager = FileManager()
+    memory = manager.resolve('mem:///')[0]
+    memory.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    s3 = manager.resolve('s3://bucket')[0]
+    s3.client = s3_client
+
+    await manager.mkdir('mem:///tmp/yyy')
+    await manager.cp('mem:///tmp/a.txt', 'mem:///tmp/xxx/b.txt')
+    await manager.cp('mem:///tmp/xxx', 's3://bucket/copy')
+
+    assert [name async for name in manager.ls('mem:///tmp')] == ['xxx', 'a.txt', 'yyy']
+    assert [str(path) async for path in manager.ls('s3://bucket/copy')] == ['/bucket/copy/b.txt']
+
+    async with manager.open('s3://bucket/copy/b.txt', 'rb') as f:
+        assert await f.read() == b'data data data'
+
+    await manager.rm('mem:///tmp/xxx')
+
+    assert memory.tree == {'/': {'tmp': {'a.txt': b'data data data', 'yyy': {}}}}
@@ -1,6 +1,11 @@
+from pathlib import PurePath
+
 import pytest
 
-from aiofm.protocols.memory import MemoryProtocol
+from aiofm.entries import Entry
+from aiofm.eviction import SizePolicy
+from aiofm.protocols import BaseProtocol, memory
+from aiofm.protocols.memory import FileTooLargeError, MemoryProtocol
 
 
 @pytest.mark.asyncio
@@ -8,7 +13,7 @@ async def test_ls_tmp_dir():
     fs = MemoryProtocol()
     fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
 
-    assert await fs.ls('/tmp') == ('xxx', 'a.txt')
+    assert [name async for name in fs.ls('/tmp')] == ['xxx', 'a.txt']
 
 
 @pytest.mark.asyncio
@@ -17,7 +22,7 @@ async def test_ls_inextisting_dir_fails():
     fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
 
     with pytest.raises(FileNotFoundError):
-        assert await fs.ls('/pmt')
+        [name async for name in fs.ls('/pmt')]
 
 
 @pytest.mark.asyncio
@@ -395,3 +400,360 @@ async def test_closed_file_changes_fs():
         f.write('TEST TEST TEST')
 
     assert fs.tree['/']['tmp']['a.txt'] == b'TEST TEST TEST'
+
+
+@pytest.mark.asyncio
+async def test_closed_new_binary_file_changes_fs():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {}}}
+
+    async with fs.open('/tmp/b.txt', 'wb') as f:
+        f.write(b'TEST TEST TEST')
+
+    assert fs.tree['/']['tmp']['b.txt'] == b'TEST TEST TEST'
+
+
+@pytest.mark.asyncio
+async def test_paths_are_normalised():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+
+    assert await fs.exists(PurePath('/tmp/a.txt')) is True
+    assert await fs.exists('/tmp/./xxx/') is True
+    assert [name async for name in fs.ls('/tmp/')] == ['xxx', 'a.txt']
+
+
+@pytest.mark.asyncio
+async def test_ls_file_fails():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+
+    with pytest.raises(NotADirectoryError):
+        [name async for name in fs.ls('/tmp/a.txt')]
+
+
+@pytest.mark.asyncio
+async def test_open_dir_fails():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+
+    with pytest.raises(IsADirectoryError):
+        async with fs.open('/tmp/xxx'):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_rm_dir_removes_nested_entries():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {'yyy': {'b.txt': b'b'}}, 'a.txt': b'data data data'}}}
+
+    await fs.rm('/tmp/xxx')
+
+    assert await fs.exists('/tmp/xxx/yyy/b.txt') is False
+    assert await fs.exists('/tmp/xxx/yyy') is False
+    assert fs.tree == {'/': {'tmp': {'a.txt': b'data data data'}}}
+
+
+@pytest.mark.asyncio
+async def test_mkdirs_keeps_existing_children():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'home': {'user': {'a.txt': b'data'}}}}
+
+    await fs.mkdirs('/home/user')
+
+    assert fs.tree == {'/': {'home': {'user': {'a.txt': b'data'}}}}
+
+
+@pytest.mark.asyncio
+async def test_walk_dir():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {'b.txt': b'b'}, 'a.txt': b'data data data'}}}
+
+    assert sorted([str(path) async for path in fs.walk('/tmp')]) == ['/tmp/a.txt', '/tmp/xxx/b.txt']
+    assert [str(path) async for path in fs.walk('/tmp/a.txt')] == ['/tmp/a.txt']
+
+
+@pytest.mark.asyncio
+async def test_walk_dir_changed_between_paths():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'a.txt': b'a', 'b.txt': b'b', 'c.txt': b'c'}}}
+    paths = []
+
+    async for path in fs.walk('/tmp'):
+        paths.append(str(path))
+
+        if len(paths) == 1:
+            async with fs.open('/tmp/new.txt', 'wb') as f:
+                f.write(b'new')
+
+            await fs.rm('/tmp/c.txt')
+
+    assert paths == ['/tmp/a.txt', '/tmp/b.txt']
+
+
+@pytest.mark.asyncio
+async def test_binary_read_does_not_copy_data():
+    fs = MemoryProtocol()
+    data = b'data data data'
+    fs.tree = {'/': {'tmp': {'a.txt': data}}}
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        view = f.getbuffer()
+        assert view.readonly
+        assert view.obj is data
+
+        buffer = bytearray(4)
+        assert f.readinto(buffer) == 4
+        assert buffer == b'data'
+        assert f.readview(5) == b' data'
+        assert f.read() == b' data'
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        assert f.read() is data
+
+
+@pytest.mark.asyncio
+async def test_written_buffer_is_stored_without_copying():
+    fs = MemoryProtocol()
+
+    async with fs.open('/tmp/a.txt', 'wb') as f:
+        f.write(b'data ')
+        f.write(memoryview(b'data'))
+        buffer = f.getvalue()
+
+    assert fs._files['/tmp/a.txt'] is buffer
+    assert fs.tree == {'/': {'tmp': {'a.txt': b'data data'}}}
+
+
+@pytest.mark.asyncio
+async def test_write_truncates_and_append_extends_file():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'a.txt': b'data data data'}}}
+
+    async with fs.open('/tmp/a.txt', 'w') as f:
+        f.write('TEST')
+
+    assert fs.tree['/']['tmp']['a.txt'] == b'TEST'
+
+    async with fs.open('/tmp/a.txt', 'a') as f:
+        f.write(' ąčę')
+
+    assert fs.tree['/']['tmp']['a.txt'] == 'TEST ąčę'.encode()
+
+    with pytest.raises(FileExistsError):
+        async with fs.open('/tmp/a.txt', 'xb'):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_failed_write_does_not_change_fs():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'a.txt': b'data data data'}}}
+
+    with pytest.raises(RuntimeError):
+        async with fs.open('/tmp/a.txt', 'wb') as f:
+            f.write(b'TEST')
+            raise RuntimeError
+
+    assert fs.tree['/']['tmp']['a.txt'] == b'data data data'
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    fs = MemoryProtocol(max_bytes=10)
+
+    for name in ('a', 'b'):
+        async with fs.open(f'/tmp/{name}.txt', 'wb') as f:
+            f.write(b'data')
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        f.read()
+
+    async with fs.open('/tmp/c.txt', 'wb') as f:
+        f.write(b'data')
+
+    assert [name async for name in fs.ls('/tmp')] == ['a.txt', 'c.txt']
+    assert fs.stats.evictions == 1
+    assert fs.stats.resident_bytes == 8
+
+    with pytest.raises(FileTooLargeError):
+        async with fs.open('/tmp/d.txt', 'wb') as f:
+            f.write(b'data data data')
+
+
+@pytest.mark.asyncio
+async def test_lfu_eviction():
+    fs = MemoryProtocol(max_bytes=10, eviction_policy='lfu')
+    fs.tree = {'/': {'tmp': {'a.txt': b'data', 'b.txt': b'data'}}}
+
+    for _ in range(2):
+        async with fs.open('/tmp/b.txt', 'rb') as f:
+            f.read()
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        f.read()
+
+    async with fs.open('/tmp/c.txt', 'wb') as f:
+        f.write(b'data')
+
+    assert [name async for name in fs.ls('/tmp')] == ['b.txt', 'c.txt']
+
+
+@pytest.mark.asyncio
+async def test_size_eviction():
+    fs = MemoryProtocol(max_bytes=16, eviction_policy='size')
+    fs.tree = {'/': {'tmp': {'a.txt': b'a', 'big.txt': b'data data', 'b.txt': b'b'}}}
+
+    async with fs.open('/tmp/c.txt', 'wb') as f:
+        f.write(b'data data')
+
+    assert sorted([name async for name in fs.ls('/tmp')]) == ['a.txt', 'b.txt', 'c.txt']
+    assert fs.stats.resident_bytes == 11
+
+    with pytest.raises(ValueError):
+        MemoryProtocol(max_bytes=1, eviction_policy='random')
+
+
+def test_size_policy_heap_stays_bounded():
+    policy = SizePolicy()
+    policy.add('/tmp/b.txt', 1)
+
+    for size in range(1000):
+        policy.add('/tmp/a.txt', size)
+
+    assert len(policy._heap) <= 5
+    assert policy.victim() == '/tmp/a.txt'
+
+    policy.remove('/tmp/a.txt')
+
+    assert len(policy._heap) <= 3
+    assert policy.victim() == '/tmp/b.txt'
+
+
+@pytest.mark.asyncio
+async def test_expirations_stay_bounded():
+    fs = MemoryProtocol(ttl=3600)
+
+    for _ in range(1000):
+        async with fs.open('/tmp/a.txt', 'wb') as f:
+            f.write(b'data')
+
+    assert len(fs._expirations) <= 3
+
+    await fs.rm('/tmp/a.txt')
+
+    assert len(fs._expirations) <= 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiration(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(memory.time, 'monotonic', lambda: now)
+    fs = MemoryProtocol(ttl=10)
+
+    async with fs.open('/tmp/a.txt', 'wb') as f:
+        f.write(b'data')
+
+    async with fs.open('/tmp/b.txt', 'wb', ttl=60) as f:
+        f.write(b'data')
+
+    now += 30
+
+    assert not await fs.exists('/tmp/a.txt')
+    assert await fs.exists('/tmp/b.txt')
+
+    async with fs.open('/tmp/b.txt', 'rb') as f:
+        assert f.read() == b'data'
+
+    with pytest.raises(FileNotFoundError):
+        async with fs.open('/tmp/a.txt', 'rb'):
+            pass
+
+    assert fs.stats.expirations == 1
+    assert fs.stats.hits == 1
+    assert fs.stats.misses == 1
+    assert fs.stats.resident_bytes == 4
+
+
+@pytest.mark.asyncio
+async def test_glob():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {
+        'a.txt': b'', 'b.csv': b'', 'xxx': {'c.txt': b'', 'yyy': {'d.txt': b''}},
+    }}}
+
+    assert sorted([str(path) async for path in fs.glob('/tmp/*')]) == ['/tmp/a.txt', '/tmp/b.csv', '/tmp/xxx']
+    assert sorted([str(path) async for path in fs.glob('/tmp/*.txt')]) == ['/tmp/a.txt']
+    assert sorted([str(path) async for path in fs.glob('/tmp/*/*.txt')]) == ['/tmp/xxx/c.txt']
+    assert sorted([str(path) async for path in fs.glob('/tmp/**/*.txt')]) == [
+        '/tmp/a.txt', '/tmp/xxx/c.txt', '/tmp/xxx/yyy/d.txt',
+    ]
+    assert sorted([str(path) async for path in fs.glob('/*/[ab].*')]) == ['/tmp/a.txt', '/tmp/b.csv']
+    assert [path async for path in fs.glob('/tmp/a.txt')] == [PurePath('/tmp/a.txt')]
+    assert [path async for path in fs.glob('/var/*')] == []
+
+
+@pytest.mark.asyncio
+async def test_ls_with_pattern():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'', 'b.csv': b'', 'c.txt': b''}}}
+
+    assert [name async for name in fs.ls('/tmp', '*.txt')] == ['a.txt', 'c.txt']
+    assert [name async for name in fs.ls('/tmp', '[!a]*')] == ['xxx', 'b.csv', 'c.txt']
+    assert [name async for name in fs.ls('/tmp', '*.parquet')] == []
+
+
+@pytest.mark.asyncio
+async def test_scan():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {'b.txt': b'bb'}, 'a.txt': b'data'}}}
+
+    assert [entry async for entry in fs.scan('/tmp')] == [
+        Entry(PurePath('/tmp/xxx'), True), Entry(PurePath('/tmp/a.txt'), False, 4),
+    ]
+    assert sorted([(str(entry.path), entry.size) async for entry in fs.scan('/tmp', '**/*.txt', True)]) == [
+        ('/tmp/a.txt', 4), ('/tmp/xxx/b.txt', 2),
+    ]
+
+    with pytest.raises(NotADirectoryError):
+        await fs.scan('/tmp/a.txt').__anext__()
+
+    with pytest.raises(FileNotFoundError):
+        await fs.scan('/missing').__anext__()
+
+
+class FallbackProtocol(MemoryProtocol):
+    scan = BaseProtocol.scan
+    walk = BaseProtocol.walk
+
+
+class PathListingProtocol(FallbackProtocol):
+    async def ls(self, path, pattern=None, *args, **kwargs):
+        async for name in super().ls(path, pattern):
+            yield PurePath(path, name)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('protocol_class', (FallbackProtocol, PathListingProtocol))
+async def test_scan_and_walk_fallbacks(protocol_class):
+    fs = protocol_class()
+    fs.tree = {'/': {'tmp': {'xxx': {'b.txt': b'bb'}, 'a.txt': b'data'}}}
+
+    assert [entry async for entry in fs.scan('/tmp')] == [
+        Entry(PurePath('/tmp/xxx'), True), Entry(PurePath('/tmp/a.txt'), False, 4),
+    ]
+    assert sorted([(str(entry.path), entry.size) async for entry in fs.scan('/tmp', '**/*.txt', True)]) == [
+        ('/tmp/a.txt', 4), ('/tmp/xxx/b.txt', 2),
+    ]
+    assert sorted([str(path) async for path in fs.walk('/tmp')]) == ['/tmp/a.txt', '/tmp/xxx/b.txt']
+
+
+@pytest.mark.asyncio
+async def test_scan_columns():
+    fs = MemoryProtocol()
+    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data', 'b.txt': b''}}}
+    pages = [columns async for columns in fs.scan_columns('/tmp', page_size=2)]
+
+    assert [columns.paths for columns in pages] == [['/tmp/xxx', '/tmp/a.txt'], ['/tmp/b.txt']]
+    assert list(pages[0].is_dir) == [1, 0]
+    assert list(pages[0].sizes) == [-1, 4]
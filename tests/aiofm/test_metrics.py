@@ -0,0 +1,209 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from aiofm.helpers import aread, awrite
+from aiofm.metrics import LatencyHistogram, StatsSink, TracingSink
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.retry import RetryPolicy
+
+
+class FakeSpan:
+    def __init__(self, name, start_time, attributes):
+        self.name = name
+        self.start_time = start_time
+        self.attributes = attributes
+        self.end_time = None
+        self.exceptions = []
+        self.status = None
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+    def set_status(self, status):
+        self.status = status
+
+    def end(self, end_time=None):
+        self.end_time = end_time
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time=None, attributes=None):
+        span = FakeSpan(name, start_time, attributes)
+        self.spans.append(span)
+
+        return span
+
+
+@pytest.fixture
+def memory_tree():
+    return {'/': {'tmp': {'a.txt': b'data', 'dir': {'b.txt': b'more data'}}}}
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(bounds=(0.1, 1.0))
+
+    with pytest.raises(ValueError):
+        histogram.percentile(0.5)
+
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.mean == pytest.approx(1.4)
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.75) == 1.0
+    assert histogram.percentile(1.0) == float('inf')
+
+
+@pytest.mark.asyncio
+async def test_disabled_metrics_leave_operations_untouched():
+    fs = MemoryProtocol()
+
+    assert fs.metrics is None
+    assert fs.ls.__func__ is MemoryProtocol.ls
+    assert 'open' not in vars(fs)
+
+
+@pytest.mark.asyncio
+async def test_operations_are_measured(memory_tree):
+    sink = StatsSink()
+    fs = MemoryProtocol(metrics=sink)
+    fs.tree = memory_tree
+
+    assert [name async for name in fs.ls('/tmp')] == ['a.txt', 'dir']
+    assert [str(path) async for path in fs.walk('/tmp')] == ['/tmp/a.txt', '/tmp/dir/b.txt']
+
+    with pytest.raises(FileNotFoundError):
+        [name async for name in fs.ls('/missing')]
+
+    ls_stats = sink.operations['MemoryProtocol', None, 'ls']
+    assert ls_stats.count == 2
+    assert ls_stats.errors == 1
+    assert ls_stats.latency.count == 2
+    assert sink.operations['MemoryProtocol', None, 'walk'].count == 1
+
+
+@pytest.mark.asyncio
+async def test_stopped_walk_is_not_an_error(memory_tree):
+    sink = StatsSink()
+    fs = MemoryProtocol(metrics=sink)
+    fs.tree = memory_tree
+    walk = fs.walk('/tmp')
+
+    async for _ in walk:
+        break
+
+    await walk.aclose()
+
+    assert sink.operations['MemoryProtocol', None, 'walk'].errors == 0
+
+
+@pytest.mark.asyncio
+async def test_bytes_are_counted(memory_tree):
+    sink = StatsSink()
+    fs = MemoryProtocol(metrics=sink)
+    fs.tree = memory_tree
+
+    async with fs.open('/tmp/a.txt', 'rb') as f:
+        assert bytes(await aread(f)) == b'data'
+
+    async with fs.open('/tmp/c.txt', 'w') as f:
+        await awrite(f, 'text')
+
+    async with fs.open('/tmp/c.txt', 'r') as f:
+        assert [line for line in f] == ['text']
+
+    assert sink.bytes_read['MemoryProtocol', None] == 8
+    assert sink.bytes_written['MemoryProtocol', None] == 4
+    assert sink.operations['MemoryProtocol', None, 'open'].count == 3
+
+
+@pytest.mark.asyncio
+async def test_s3_requests_are_measured(s3_client, s3_bucket, monkeypatch):
+    sink = StatsSink()
+    fs = S3Protocol(retry_policy=RetryPolicy(base_delay=0.001), metrics=sink)
+    fs.client = s3_client
+    head_object = s3_client.head_object
+    errors = [ClientError({'Error': {'Code': 'SlowDown'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, 'HeadObject')]
+
+    async def head_object_(**kwargs):
+        if errors:
+            raise errors.pop()
+
+        return await head_object(**kwargs)
+
+    monkeypatch.setattr(s3_client, 'head_object', head_object_)
+
+    assert await fs.exists('/bucket/tmp/existing.txt')
+
+    async with fs.open('/bucket/tmp/existing.txt', 'rb') as f:
+        data = await f.read()
+
+    head_stats = sink.requests['S3Protocol', 'bucket', 'head_object']
+    assert head_stats.count == 3
+    assert head_stats.errors == 1
+    assert head_stats.retries == 1
+    assert sink.requests['S3Protocol', 'bucket', 'get_object'].count == 1
+    assert sink.operations['S3Protocol', 'bucket', 'exists'].count == 1
+    assert sink.bytes_read['S3Protocol', 'bucket'] == len(data)
+
+
+@pytest.mark.asyncio
+async def test_path_passed_by_keyword(s3_client, s3_bucket):
+    sink = StatsSink()
+    fs = S3Protocol(metrics=sink)
+    fs.client = s3_client
+
+    assert await fs.exists(path='/bucket/tmp/existing.txt')
+    assert [path async for path in fs.ls(pattern='*.txt', path='/bucket/tmp')]
+    await fs.cp(src_path='/bucket/tmp/existing.txt', dst_path='/bucket/tmp/copy.txt')
+
+    assert sink.operations['S3Protocol', 'bucket', 'exists'].count == 1
+    assert sink.operations['S3Protocol', 'bucket', 'ls'].count == 1
+    assert sink.operations['S3Protocol', 'bucket', 'cp'].count == 1
+
+
+@pytest.mark.asyncio
+async def test_open_is_measured_until_closed(s3_client, s3_bucket, monkeypatch):
+    sink = StatsSink()
+    fs = S3Protocol(metrics=sink)
+    fs.client = s3_client
+
+    async def put_object(**kwargs):
+        raise ClientError({'Error': {'Code': 'AccessDenied'}, 'ResponseMetadata': {'HTTPStatusCode': 403}},
+                          'PutObject')
+
+    monkeypatch.setattr(s3_client, 'put_object', put_object)
+
+    with pytest.raises(ClientError):
+        async with fs.open('/bucket/tmp/new.txt', 'wb') as f:
+            await f.write(b'data')
+
+    open_stats = sink.operations['S3Protocol', 'bucket', 'open']
+    assert open_stats.count == 1
+    assert open_stats.errors == 1
+    assert sink.requests['S3Protocol', 'bucket', 'put_object'].count == 1
+
+
+@pytest.mark.asyncio
+async def test_tracing_sink(memory_tree):
+    tracer = FakeTracer()
+    fs = MemoryProtocol(metrics=TracingSink(tracer))
+    fs.tree = memory_tree
+
+    await fs.exists('/tmp/a.txt')
+
+    with pytest.raises(FileNotFoundError):
+        await fs.is_dir('/missing')
+
+    exists_span, is_dir_span = tracer.spans
+    assert exists_span.name == 'aiofm.exists'
+    assert exists_span.attributes == {'aiofm.backend': 'MemoryProtocol'}
+    assert exists_span.start_time <= exists_span.end_time
+    assert not exists_span.exceptions
+    assert isinstance(is_dir_span.exceptions[0], FileNotFoundError)
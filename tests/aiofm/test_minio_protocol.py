@@ -0,0 +1,212 @@
+import os
+
+import pytest
+from pydantic import SecretStr
+
+from aiofm.protocols.minio import MinioProtocol
+from aiofm.protocols.s3 import MIN_PART_SIZE
+
+
+@pytest.mark.asyncio
+async def test_rm_non_empty_dir(minio_protocol, s3_client, s3_bucket):
+    assert await minio_protocol.rm('/bucket/tmp/existing_dir') == 1
+
+    response = await s3_client.list_objects_v2(Bucket='bucket')
+    assert [item['Key'] for item in response['Contents']] == ['tmp/existing.txt']
+
+
+@pytest.mark.asyncio
+async def test_rm_file(minio_protocol, s3_client, s3_bucket):
+    assert await minio_protocol.rm('/bucket/tmp/existing.txt') == 1
+
+    response = await s3_client.list_objects_v2(Bucket='bucket')
+    assert [item['Key'] for item in response['Contents']] == ['tmp/existing_dir/another_existing.txt']
+
+
+@pytest.mark.asyncio
+async def test_rm_dry_run_keeps_objects(minio_protocol, s3_client, s3_bucket):
+    assert await minio_protocol.rm('/bucket/tmp', dry_run=True) == 2
+
+    response = await s3_client.list_objects_v2(Bucket='bucket')
+    assert response['KeyCount'] == 2
+
+
+@pytest.mark.asyncio
+async def test_rm_inexisting_dir(minio_protocol, s3_bucket):
+    assert await minio_protocol.rm('/bucket/home/user/documents') == 0
+
+
+@pytest.mark.asyncio
+async def test_ls(minio_protocol, s3_bucket):
+    assert [str(path) async for path in minio_protocol.ls('/bucket/tmp', recursive=True)] == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+    assert [path.name async for path in minio_protocol.ls('/bucket/tmp')] == [
+        'existing.txt', 'existing_dir',
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        assert [path async for path in minio_protocol.ls('/bucket/missing')] == []
+
+
+@pytest.mark.asyncio
+async def test_ls_empty_bucket(minio_protocol, s3_client):
+    assert [path async for path in minio_protocol.ls('/bucket')] == []
+    assert [path async for path in minio_protocol.ls('/bucket', '*.txt')] == []
+
+
+@pytest.mark.asyncio
+async def test_ls_with_pattern(minio_protocol, s3_bucket):
+    assert [str(path) async for path in minio_protocol.ls('/bucket/tmp', '**/*.txt', recursive=True)] == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+    assert [path.name async for path in minio_protocol.ls('/bucket/tmp', 'existing_*')] == [
+        'existing_dir',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_glob(minio_protocol, s3_bucket):
+    assert sorted([str(path) async for path in minio_protocol.glob('/bucket/tmp/*')]) == [
+        '/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir',
+    ]
+    assert [str(path) async for path in minio_protocol.glob('/bucket/**/another_*')] == [
+        '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_exists_and_is_dir(minio_protocol, s3_bucket):
+    assert await minio_protocol.exists('/bucket')
+    assert await minio_protocol.exists('/bucket/tmp/existing.txt')
+    assert await minio_protocol.exists('/bucket/tmp/existing_dir')
+    assert not await minio_protocol.exists('/bucket/tmp/missing.txt')
+    assert await minio_protocol.is_dir('/bucket/tmp')
+    assert not await minio_protocol.is_dir('/bucket/tmp/existing.txt')
+
+    with pytest.raises(FileNotFoundError):
+        await minio_protocol.is_dir('/bucket/tmp/missing.txt')
+
+
+@pytest.mark.asyncio
+async def test_read(minio_protocol, s3_bucket):
+    async with minio_protocol.open('/bucket/tmp/existing.txt', 'rb', block_size=4) as f:
+        assert await f.read(6) == b'data d'
+        f.seek(10)
+        assert await f.read() == b'data'
+
+    with pytest.raises(FileNotFoundError):
+        async with minio_protocol.open('/bucket/tmp/missing.txt', 'rb'):
+            pass
+
+    with pytest.raises(ValueError):
+        async with minio_protocol.open('/bucket/tmp/existing.txt', 'r'):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_write(minio_protocol, s3_client, s3_bucket):
+    data = os.urandom(MIN_PART_SIZE * 2 + 1)
+
+    async with minio_protocol.open('/bucket/tmp/big.bin', 'wb', part_size=MIN_PART_SIZE) as f:
+        for start in range(0, len(data), 1024 * 1024):
+            await f.write(data[start:start + 1024 * 1024])
+
+    async with minio_protocol.open('/bucket/tmp/empty.bin', 'wb'):
+        pass
+
+    response = await s3_client.get_object(Bucket='bucket', Key='tmp/big.bin')
+    assert await response['Body'].read() == data
+    assert 'ETag' in response and '-' in response['ETag']
+
+    response = await s3_client.get_object(Bucket='bucket', Key='tmp/empty.bin')
+    assert await response['Body'].read() == b''
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_aborted(minio_protocol, s3_client, s3_bucket):
+    with pytest.raises(RuntimeError):
+        async with minio_protocol.open('/bucket/tmp/big.bin', 'wb', part_size=MIN_PART_SIZE) as f:
+            await f.write(os.urandom(MIN_PART_SIZE + 1))
+            raise RuntimeError
+
+    response = await s3_client.list_multipart_uploads(Bucket='bucket')
+    assert not response.get('Uploads')
+    assert not await minio_protocol.exists('/bucket/tmp/big.bin')
+
+
+@pytest.mark.asyncio
+async def test_cp_and_mv(minio_protocol, s3_client, s3_bucket):
+    await minio_protocol.cp('/bucket/tmp/existing.txt', '/bucket/tmp/copy.txt')
+    await minio_protocol.cp('/bucket/tmp/existing_dir', '/bucket/backup')
+    await minio_protocol.mv('/bucket/tmp/existing.txt', '/bucket/tmp/moved.txt')
+
+    response = await s3_client.list_objects_v2(Bucket='bucket')
+    assert [item['Key'] for item in response['Contents']] == [
+        'backup/another_existing.txt',
+        'tmp/copy.txt',
+        'tmp/existing_dir/another_existing.txt',
+        'tmp/moved.txt',
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        await minio_protocol.cp('/bucket/tmp/missing.txt', '/bucket/tmp/copy.txt')
+
+
+@pytest.mark.asyncio
+async def test_mv_dir_deletes_copied_keys_only(minio_protocol, s3_client, s3_bucket):
+    with pytest.raises(ValueError, match='Unable to copy directory /bucket/tmp into itself'):
+        await minio_protocol.mv('/bucket/tmp', '/bucket/tmp/sub')
+
+    copy_object = minio_protocol._copy_object
+
+    async def _copy_object(*args, **kwargs):
+        await copy_object(*args, **kwargs)
+        await s3_client.put_object(Bucket='bucket', Key='tmp/existing_dir/late.txt', Body=b'late data')
+
+    minio_protocol._copy_object = _copy_object
+    await minio_protocol.mv('/bucket/tmp/existing_dir', '/bucket/moved')
+
+    response = await s3_client.list_objects_v2(Bucket='bucket')
+    assert [item['Key'] for item in response['Contents']] == [
+        'moved/another_existing.txt',
+        'tmp/existing.txt',
+        'tmp/existing_dir/late.txt',
+    ]
+
+
+def test_pool_size_is_configurable(s3_endpoint_url):
+    fs = MinioProtocol(s3_endpoint_url.removeprefix('http://'), 'us-east-1', SecretStr('testing'),
+                       SecretStr('testing'), secure=False, max_pool_connections=32)
+
+    assert fs.client._http.connection_pool_kw['maxsize'] == 32
+    assert fs.max_workers == 32
+
+
+@pytest.mark.asyncio
+async def test_close_releases_connections(minio_protocol, s3_bucket):
+    assert await minio_protocol.exists('/bucket/tmp/existing.txt')
+    assert len(minio_protocol.client._http.pools)
+
+    await minio_protocol.close()
+
+    assert minio_protocol._executor is None
+    assert not len(minio_protocol.client._http.pools)
+
+
+@pytest.mark.asyncio
+async def test_scan(minio_protocol, s3_bucket):
+    item = minio_protocol.client.stat_object('bucket', 'tmp/existing.txt')
+    entries = [entry async for entry in minio_protocol.scan('/bucket/tmp', page_size=1)]
+
+    assert [(str(entry.path), entry.is_dir, entry.size) for entry in entries] == [
+        ('/bucket/tmp/existing.txt', False, 14),
+        ('/bucket/tmp/existing_dir', True, None),
+    ]
+    assert entries[0].etag == item.etag
+    assert entries[0].mtime == item.last_modified.timestamp()
+    assert [entry.name async for entry in minio_protocol.scan('/bucket/tmp', '**/*.txt', recursive=True)] == [
+        'existing.txt', 'another_existing.txt',
+    ]
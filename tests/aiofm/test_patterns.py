@@ -0,0 +1,40 @@
+import pytest
+
+from aiofm.patterns import compile_glob, literal_prefix
+
+
+@pytest.mark.parametrize('pattern, path, matches', (
+    ('/tmp/*.txt', '/tmp/a.txt', True),
+    ('/tmp/*.txt', '/tmp/dir/a.txt', False),
+    ('/tmp/?.txt', '/tmp/ab.txt', False),
+    ('/tmp/[ab].txt', '/tmp/b.txt', True),
+    ('/tmp/[!ab].txt', '/tmp/b.txt', False),
+    ('/tmp/[a-c]*', '/tmp/cat', True),
+    ('/tmp/**/*.txt', '/tmp/a.txt', True),
+    ('/tmp/**/*.txt', '/tmp/x/y/a.txt', True),
+    ('/tmp/**', '/tmp/x/y', True),
+    ('/tmp/**', '/tmpx/y', False),
+    ('/tmp/a+b(c).txt', '/tmp/a+b(c).txt', True),
+    ('/tmp/[.txt', '/tmp/[.txt', True),
+))
+def test_match(pattern, path, matches):
+    assert compile_glob(pattern).match(path) is matches
+
+
+def test_may_contain():
+    glob = compile_glob('/tmp/*/data/*.txt')
+
+    assert glob.may_contain('/')
+    assert glob.may_contain('/tmp/a')
+    assert glob.may_contain('/tmp/a/data')
+    assert not glob.may_contain('/var')
+    assert not glob.may_contain('/tmp/a/other')
+    assert not glob.may_contain('/tmp/a/data/more')
+    assert compile_glob('/tmp/**/a.txt').may_contain('/tmp/a/b/c')
+
+
+def test_literal_prefix():
+    assert literal_prefix('/tmp/dir/a*.txt') == '/tmp/dir/a'
+    assert literal_prefix('/tmp/[ab].txt') == '/tmp/'
+    assert literal_prefix('/tmp/a.txt') == '/tmp/a.txt'
+    assert compile_glob('/tmp/*') is compile_glob('/tmp/*')
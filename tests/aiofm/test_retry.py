@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.retry import LatencyWindow, RetryPolicy
+
+
+def client_error(code: str, status_code: int = 400) -> ClientError:
+    return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'GetObject')
+
+
+def failing(*errors):
+    calls = []
+
+    async def function():
+        calls.append(None)
+
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+
+        return len(calls)
+
+    return function, calls
+
+
+def test_latency_window():
+    latencies = LatencyWindow(size=4)
+
+    with pytest.raises(ValueError):
+        latencies.percentile(0.5)
+
+    for latency in (5, 1, 2, 3, 4):
+        latencies.add(latency)
+
+    assert len(latencies) == 4
+    assert latencies.percentile(0.0) == 1
+    assert latencies.percentile(0.5) == 3
+    assert latencies.percentile(0.99) == 4
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+
+    with pytest.raises(ValueError):
+        RetryPolicy(hedge_percentile=1.5)
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+
+    assert policy.is_retryable(client_error('SlowDown', 503))
+    assert policy.is_retryable(client_error('Whatever', 500))
+    assert policy.is_retryable(asyncio.TimeoutError())
+    assert policy.is_retryable(ConnectionResetError())
+    assert not policy.is_retryable(client_error('NoSuchKey', 404))
+    assert not policy.is_retryable(ValueError())
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=1.0, max_delay=3.0)
+
+    assert all(0 <= policy.backoff(1) <= 1.0 for _ in range(100))
+    assert all(0 <= policy.backoff(10) <= 3.0 for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_call_retries_throttling():
+    policy = RetryPolicy(base_delay=0.001)
+    function, calls = failing(client_error('SlowDown', 503), client_error('InternalError', 500))
+
+    assert await policy.call(function) == 3
+    assert policy.retries == 2
+
+
+@pytest.mark.asyncio
+async def test_call_does_not_retry_client_errors():
+    policy = RetryPolicy(base_delay=0.001)
+    function, calls = failing(client_error('NoSuchKey', 404))
+
+    with pytest.raises(ClientError):
+        await policy.call(function)
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_call_gives_up_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    function, calls = failing(*(client_error('SlowDown', 503) for _ in range(5)))
+
+    with pytest.raises(ClientError):
+        await policy.call(function)
+
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_call_respects_deadline():
+    policy = RetryPolicy(max_attempts=100, base_delay=10.0, deadline=0.01)
+    function, calls = failing(*(client_error('SlowDown', 503) for _ in range(100)))
+
+    with pytest.raises(ClientError):
+        await policy.call(function)
+
+    assert len(calls) < 100
+
+
+@pytest.mark.asyncio
+async def test_call_retries_slow_attempts():
+    policy = RetryPolicy(base_delay=0.001, attempt_timeout=0.05)
+    calls = []
+
+    async def function():
+        calls.append(None)
+
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+
+        return len(calls)
+
+    assert await policy.call(function) == 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_beats_slow_request():
+    policy = RetryPolicy(hedge_percentile=0.5, hedge_min_samples=1)
+    policy.latencies.add(0.01)
+    calls = []
+    cancelled = []
+
+    async def function():
+        calls.append(None)
+
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(None)
+                raise
+
+        return len(calls)
+
+    assert await asyncio.wait_for(policy.hedge(function), 1) == 2
+    await asyncio.sleep(0)
+    assert policy.hedges == 1
+    assert cancelled
+
+
+@pytest.mark.asyncio
+async def test_hedge_needs_samples():
+    policy = RetryPolicy(hedge_percentile=0.5, hedge_min_samples=2)
+    policy.latencies.add(0.01)
+
+    async def function():
+        await asyncio.sleep(0.05)
+
+        return 'data'
+
+    assert await policy.hedge(function) == 'data'
+    assert policy.hedges == 0
+    assert len(policy.latencies) == 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_raises_when_all_requests_fail():
+    policy = RetryPolicy()
+    function, calls = failing(client_error('NoSuchKey', 404))
+
+    with pytest.raises(ClientError):
+        await policy.hedge(function)
+
+
+def test_urllib3_retry():
+    retry = RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=8.0).urllib3_retry()
+
+    assert retry.total == 3
+    assert retry.backoff_factor == 0.5
+    assert retry.backoff_max == 8.0
+    assert 503 in retry.status_forcelist
+
+
+@pytest.mark.asyncio
+async def test_s3_protocol_retries_throttled_requests(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol(retry_policy=RetryPolicy(base_delay=0.001))
+    fs.client = s3_client
+    head_object = s3_client.head_object
+    errors = [client_error('SlowDown', 503)]
+
+    async def head_object_(**kwargs):
+        if errors:
+            raise errors.pop()
+
+        return await head_object(**kwargs)
+
+    monkeypatch.setattr(s3_client, 'head_object', head_object_)
+
+    assert await fs.exists('/bucket/tmp/existing.txt')
+    assert fs.retry_policy.retries == 1
@@ -1,14 +1,49 @@
+import asyncio
+import gc
+import math
+import os
+import tracemalloc
+
 import pytest
+from botocore.exceptions import ClientError
+from pydantic import SecretStr
 
-from aiofm.protocols.s3 import S3Protocol
+from aiofm.entries import MISSING_SIZE, ObjectEntry
+from aiofm.protocols import s3
+from aiofm.protocols.s3 import MIN_PART_SIZE, ObjectDeleteError, S3Protocol, S3ReadableFile, S3WritableFile
 
 
 @pytest.mark.asyncio
-async def test_ls_tmp_dir(s3_client):
+async def test_ls_tmp_dir(s3_client, s3_bucket):
     fs = S3Protocol()
     fs.client = s3_client
 
-    assert sorted(await fs.ls('/bucket/tmp')) == sorted(('existing.txt', 'existing_dir'))
+    assert sorted([path.name async for path in fs.ls('/bucket/tmp', recursive=False)]) == sorted(
+        ('existing.txt', 'existing_dir')
+    )
+
+
+@pytest.mark.asyncio
+async def test_ls_tmp_dir_recursively(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    assert sorted([str(path) async for path in fs.ls('/bucket/tmp')]) == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_ls_does_not_match_sibling_prefixes(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp_other/a.txt', Body=b'')
+
+    assert [str(path) async for path in fs.ls('/bucket/tmp', recursive=False)] == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir',
+    ]
 
 
 @pytest.mark.asyncio
@@ -22,76 +57,94 @@ async def test_ls_inextisting_dir_fails(s3_client):
 
 
 @pytest.mark.asyncio
-async def test_existing_file_exists():
+async def test_ls_empty_bucket(s3_client):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    assert [path async for path in fs.ls('/bucket')] == []
+    assert [path async for path in fs.ls('/bucket', '*.txt', recursive=False)] == []
+    assert [entry async for entry in fs.scan('/bucket/')] == []
 
-    assert await fs.exists('/tmp/a.txt') is True
+    with pytest.raises(ClientError):
+        async for _ in fs.ls('/missing'):
+            pass
 
 
 @pytest.mark.asyncio
-async def test_inexisting_file_does_not_exist():
+async def test_existing_file_exists(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.exists('/tmp/b.txt') is False
+    assert await fs.exists('/bucket/tmp/existing.txt') is True
 
 
 @pytest.mark.asyncio
-async def test_existing_dir_exists():
+async def test_inexisting_file_does_not_exist(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.exists('/tmp/xxx') is True
+    assert await fs.exists('/bucket/tmp/b.txt') is False
 
 
 @pytest.mark.asyncio
-async def test_inexisting_dir_does_not_exist():
+async def test_existing_dir_exists(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.exists('/tmp/yyy') is False
+    assert await fs.exists('/bucket/tmp/existing_dir') is True
+    assert await fs.exists('/bucket/tmp') is True
 
 
 @pytest.mark.asyncio
-async def test_existing_path_exists():
+async def test_inexisting_dir_does_not_exist(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.exists('/tmp/a.txt') is True
+    assert await fs.exists('/bucket/tmp/yyy') is False
+    assert await fs.exists('/bucket/tmp/existing') is False
 
 
 @pytest.mark.asyncio
-async def test_inexisting_path_does_not_exist():
+async def test_existing_bucket_exists(s3_client):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.exists('/pmt/a.txt') is False
+    assert await fs.exists('/bucket') is True
+    assert await fs.exists('/missing-bucket') is False
 
 
 @pytest.mark.asyncio
-async def test_file_is_not_a_directory():
+async def test_inexisting_path_does_not_exist(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.is_dir('/tmp/a.txt') is False
+    assert await fs.exists('/bucket/pmt/existing.txt') is False
 
 
 @pytest.mark.asyncio
-async def test_directory_is_a_direcotry():
+async def test_file_is_not_a_directory(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    assert await fs.is_dir('/tmp/xxx') is True
+    assert await fs.is_dir('/bucket/tmp/existing.txt') is False
 
 
 @pytest.mark.asyncio
-async def test_inexisting_path_is_dir_check_fails():
+async def test_directory_is_a_direcotry(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    assert await fs.is_dir('/bucket/tmp/existing_dir') is True
+    assert await fs.is_dir('/bucket') is True
+
+
+@pytest.mark.asyncio
+async def test_inexisting_path_is_dir_check_fails(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
 
     with pytest.raises(FileNotFoundError):
-        assert await fs.is_dir('/tmp/yyy.txt')
+        assert await fs.is_dir('/bucket/tmp/yyy.txt')
 
 
 @pytest.mark.asyncio
@@ -215,185 +268,850 @@ async def test_mkdirs_fails_when_path_is_a_file():
 
 
 @pytest.mark.asyncio
-async def test_rm_empty_dir():
+async def test_rm_non_empty_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'home': {'user': {'documents': {}}}}}
+    fs.client = s3_client
 
-    await fs.rm('/home/user/documents')
+    assert await fs.rm('/bucket/tmp/existing_dir') == 1
 
-    assert fs.tree == {'/': {'home': {'user': {}}}}
+    assert await _read_objects(s3_client) == {'tmp/existing.txt': b'data data data'}
 
 
 @pytest.mark.asyncio
-async def test_rm_non_empty_dir():
+async def test_rm_file(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    await fs.rm('/tmp')
+    assert await fs.rm('/bucket/tmp/existing.txt') == 1
 
-    assert fs.tree == {'/': {}}
+    assert await _read_objects(s3_client) == {'tmp/existing_dir/another_existing.txt': b'another data'}
 
 
 @pytest.mark.asyncio
-async def test_rm_file(mocker):
-    mocker.patch('aiofm.protocols.S3Protocol.is_dir')
-    S3Protocol.is_dir.return_value = False
+async def test_rm_inexisting_dir(s3_client, s3_bucket):
     fs = S3Protocol()
+    fs.client = s3_client
 
-    await fs.rm('/tmp/a.txt')
+    assert await fs.rm('/bucket/home/user/documents') == 0
 
-    S3Protocol.is_dir.assert_called_once_with('/tmp/a.txt')
+    assert len(await _read_objects(s3_client)) == 2
 
 
 @pytest.mark.asyncio
-async def test_rm_inexisting_dir():
+async def test_rm_deletes_in_batches(s3_client, monkeypatch):
+    monkeypatch.setattr(s3, 'MAX_DELETE_OBJECTS_COUNT', 3)
     fs = S3Protocol()
+    fs.client = s3_client
+    delete_objects = s3_client.delete_objects
+    batch_sizes = []
 
-    await fs.rm('/home/user/documents')
+    async def counting_delete_objects(**kwargs):
+        batch_sizes.append(len(kwargs['Delete']['Objects']))
+        return await delete_objects(**kwargs)
 
-    assert fs.tree == {}
+    for index in range(7):
+        await s3_client.put_object(Bucket='bucket', Key=f'tmp/{index}.txt', Body=b'')
 
-    fs.tree = {'/': {'home': {'user': {'documents': {}}}}}
+    monkeypatch.setattr(s3_client, 'delete_objects', counting_delete_objects)
 
-    await fs.rm('/tmp')
+    assert await fs.rm('/bucket/tmp', dry_run=True) == 7
+    assert batch_sizes == []
 
-    assert fs.tree == {'/': {'home': {'user': {'documents': {}}}}}
+    assert await fs.rm('/bucket/tmp', max_concurrency=2) == 7
+    assert sorted(batch_sizes) == [1, 3, 3]
+    assert await _read_objects(s3_client) == {}
 
 
 @pytest.mark.asyncio
-async def test_mv_file_to_existing_dir():
+async def test_rm_reports_failed_keys(s3_client, s3_bucket, monkeypatch):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    async def failing_delete_objects(**kwargs):
+        return {'Errors': [{'Key': 'tmp/existing.txt', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]}
+
+    monkeypatch.setattr(s3_client, 'delete_objects', failing_delete_objects)
+
+    with pytest.raises(ObjectDeleteError) as e:
+        await fs.rm('/bucket/tmp')
 
-    await fs.mv('/tmp/a.txt', '/tmp/xxx')
+    assert e.value.errors == [('tmp/existing.txt', 'AccessDenied', 'Access Denied')]
 
-    assert fs.tree == {'/': {'tmp': {'xxx': {'a.txt': b'data data data'}}}}
+
+async def _read_objects(s3_client, bucket_name: str = 'bucket') -> dict:
+    response = await s3_client.list_objects_v2(Bucket=bucket_name)
+    objects = {}
+
+    for item in response.get('Contents', ()):
+        response = await s3_client.get_object(Bucket=bucket_name, Key=item['Key'])
+        objects[item['Key']] = await response['Body'].read()
+
+    return objects
 
 
 @pytest.mark.asyncio
-async def test_mv_file_to_inexisting_dir():
+async def test_mv_file_to_existing_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    await fs.mv('/tmp/a.txt', '/tmp/yyy/')
+    await fs.mv('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir')
 
-    assert fs.tree == {'/': {'tmp': {'xxx': {}, 'yyy': {'a.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == {
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/existing_dir/existing.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_mv_file_to_existing_file():
+async def test_mv_file_to_inexisting_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {'b.txt': b''}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    await fs.mv('/tmp/a.txt', '/tmp/xxx/b.txt')
+    await fs.mv('/bucket/tmp/existing.txt', '/bucket/tmp/yyy/')
 
-    assert fs.tree == {'/': {'tmp': {'xxx': {'b.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == {
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/yyy/existing.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_mv_file_to_inexisting_file():
+async def test_mv_file_to_existing_file(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    await fs.mv('/tmp/a.txt', '/tmp/xxx/c.txt')
+    await fs.mv('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/another_existing.txt')
 
-    assert fs.tree == {'/': {'tmp': {'xxx': {'c.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == {'tmp/existing_dir/another_existing.txt': b'data data data'}
 
 
 @pytest.mark.asyncio
-async def test_mv_dir_to_existing_file_should_fail():
+async def test_mv_file_to_inexisting_file(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    with pytest.raises(ValueError, match='Unable to copy directory /tmp/xxx to file /tmp/a.txt'):
-        await fs.mv('/tmp/xxx', '/tmp/a.txt')
+    await fs.mv('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/c.txt')
+
+    assert await _read_objects(s3_client) == {
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/existing_dir/c.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_cp_file_to_existing_dir():
+async def test_mv_dir_to_inexisting_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/existing_dir/nested/c.txt', Body=b'nested data')
 
-    await fs.cp('/tmp/a.txt', '/tmp/xxx')
+    await fs.mv('/bucket/tmp/existing_dir', '/bucket/moved')
 
-    assert fs.tree == {'/': {'tmp': {'a.txt': b'data data data', 'xxx': {'a.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == {
+        'moved/another_existing.txt': b'another data',
+        'moved/nested/c.txt': b'nested data',
+        'tmp/existing.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_cp_file_to_inexisting_dir():
+async def test_mv_dir_to_existing_file_should_fail(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    with pytest.raises(ValueError,
+                       match='Unable to copy directory /bucket/tmp/existing_dir to file /bucket/tmp/existing.txt'):
+        await fs.mv('/bucket/tmp/existing_dir', '/bucket/tmp/existing.txt')
+
+
+@pytest.mark.asyncio
+async def test_mv_dir_into_itself_should_fail(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+    objects = await _read_objects(s3_client)
+
+    with pytest.raises(ValueError, match='Unable to copy directory /bucket/tmp into itself'):
+        await fs.mv('/bucket/tmp', '/bucket/tmp/sub')
 
-    await fs.cp('/tmp/a.txt', '/tmp/yyy/')
+    with pytest.raises(ValueError, match='Unable to copy directory /bucket/tmp into itself'):
+        await fs.cp('/bucket/tmp', '/bucket/tmp/')
 
-    assert fs.tree == {'/': {'tmp': {'a.txt': b'data data data', 'xxx': {}, 'yyy': {'a.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == objects
 
 
 @pytest.mark.asyncio
-async def test_cp_file_to_existing_file():
+async def test_mv_dir_keeps_objects_written_during_copy(s3_client, s3_bucket, monkeypatch):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {'b.txt': b''}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+    copy_object = fs._copy_object
+
+    async def _copy_object(*args, **kwargs):
+        await copy_object(*args, **kwargs)
+        await s3_client.put_object(Bucket='bucket', Key='tmp/existing_dir/late.txt', Body=b'late data')
+
+    monkeypatch.setattr(fs, '_copy_object', _copy_object)
 
-    await fs.cp('/tmp/a.txt', '/tmp/xxx/b.txt')
+    await fs.mv('/bucket/tmp/existing_dir', '/bucket/moved')
 
-    assert fs.tree == {'/': {'tmp': {'a.txt': b'data data data', 'xxx': {'b.txt': b'data data data'}}}}
+    assert await _read_objects(s3_client) == {
+        'moved/another_existing.txt': b'another data',
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/late.txt': b'late data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_cp_file_to_inexisting_file():
+async def test_cp_file_to_existing_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
 
-    await fs.cp('/tmp/a.txt', '/tmp/xxx/c.txt')
+    await fs.cp('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir')
 
-    assert fs.tree == {'/': {'tmp': {'xxx': {'c.txt': b'data data data'}, 'a.txt': b'data data data'}}}
+    assert await _read_objects(s3_client) == {
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/existing_dir/existing.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_cp_dir_to_existing_file_should_fail():
+async def test_cp_file_to_inexisting_dir(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    await fs.cp('/bucket/tmp/existing.txt', '/bucket/tmp/yyy/')
 
-    with pytest.raises(ValueError, match='Unable to copy directory /tmp/xxx to file /tmp/a.txt'):
-        await fs.cp('/tmp/xxx', '/tmp/a.txt')
+    assert await _read_objects(s3_client) == {
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/yyy/existing.txt': b'data data data',
+    }
 
 
 @pytest.mark.asyncio
-async def test_open_inexisting_file_for_read_should_fail():
+async def test_cp_file_to_existing_file(s3_client, s3_bucket):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    await fs.cp('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/another_existing.txt')
+
+    assert await _read_objects(s3_client) == {
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/another_existing.txt': b'data data data',
+    }
+
+
+@pytest.mark.asyncio
+async def test_cp_file_to_inexisting_file(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    await fs.cp('/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/c.txt')
+
+    assert await _read_objects(s3_client) == {
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/another_existing.txt': b'another data',
+        'tmp/existing_dir/c.txt': b'data data data',
+    }
+
+
+@pytest.mark.asyncio
+async def test_cp_dir_to_existing_dir(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='other/b.txt', Body=b'b')
+
+    await fs.cp('/bucket/tmp/existing_dir', '/bucket/other', max_concurrency=2)
+
+    assert await _read_objects(s3_client) == {
+        'other/b.txt': b'b',
+        'other/existing_dir/another_existing.txt': b'another data',
+        'tmp/existing.txt': b'data data data',
+        'tmp/existing_dir/another_existing.txt': b'another data',
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('has_objects', (False, True))
+async def test_cp_dir_to_bucket_root(s3_client, s3_bucket, has_objects):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.create_bucket(Bucket='other')
+    objects = {'existing.txt': b'other data'} if has_objects else {}
+
+    for key, data in objects.items():
+        await s3_client.put_object(Bucket='other', Key=key, Body=data)
+
+    await fs.cp('/bucket/tmp/existing_dir', '/other/')
+
+    assert await _read_objects(s3_client, 'other') == {
+        **objects, 'existing_dir/another_existing.txt': b'another data',
+    }
+
+    await fs.cp('/bucket/tmp/existing_dir', '/other')
+
+    assert await _read_objects(s3_client, 'other') == {
+        **objects, 'another_existing.txt': b'another data', 'existing_dir/another_existing.txt': b'another data',
+    }
+
+
+@pytest.mark.asyncio
+async def test_cp_dir_to_existing_file_should_fail(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    with pytest.raises(ValueError,
+                       match='Unable to copy directory /bucket/tmp/existing_dir to file /bucket/tmp/existing.txt'):
+        await fs.cp('/bucket/tmp/existing_dir', '/bucket/tmp/existing.txt')
+
+
+@pytest.mark.asyncio
+async def test_cp_inexisting_file_should_fail(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    with pytest.raises(FileNotFoundError):
+        await fs.cp('/bucket/tmp/missing.txt', '/bucket/tmp/copy.txt')
+
+
+@pytest.mark.asyncio
+async def test_cp_large_file_with_multipart_copy(s3_client, monkeypatch):
+    monkeypatch.setattr(s3, 'MAX_COPY_OBJECT_SIZE', MIN_PART_SIZE)
+    monkeypatch.setattr(s3, 'COPY_PART_SIZE', MIN_PART_SIZE)
+    fs = S3Protocol()
+    fs.client = s3_client
+    data = os.urandom(MIN_PART_SIZE * 2 + 100)
+    await s3_client.put_object(Bucket='bucket', Key='big.bin', Body=data)
+
+    await fs.cp('/bucket/big.bin', '/bucket/copy.bin')
+
+    response = await s3_client.get_object(Bucket='bucket', Key='copy.bin')
+    assert await response['Body'].read() == data
+
+    response = await s3_client.head_object(Bucket='bucket', Key='copy.bin', PartNumber=1)
+    assert response['PartsCount'] == 3
+
+
+@pytest.mark.asyncio
+async def test_cp_dir_of_large_files_bounds_requests(s3_client, monkeypatch):
+    monkeypatch.setattr(s3, 'MAX_COPY_OBJECT_SIZE', MIN_PART_SIZE)
+    monkeypatch.setattr(s3, 'COPY_PART_SIZE', MIN_PART_SIZE)
+    fs = S3Protocol()
+    fs.client = s3_client
+    data = os.urandom(MIN_PART_SIZE * 2 + 1)
+
+    for name in ('a', 'b', 'c'):
+        await s3_client.put_object(Bucket='bucket', Key=f'big/{name}.bin', Body=data)
+
+    call = fs._call
+    in_flight = 0
+    max_in_flight = 0
+
+    async def _call(operation_name, **kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+
+        try:
+            await asyncio.sleep(0.01)
+
+            return await call(operation_name, **kwargs)
+        finally:
+            in_flight -= 1
+
+    monkeypatch.setattr(fs, '_call', _call)
+    await fs.cp('/bucket/big', '/bucket/copy', max_concurrency=2)
+
+    assert max_in_flight <= 2
+
+    for name in ('a', 'b', 'c'):
+        response = await s3_client.get_object(Bucket='bucket', Key=f'copy/{name}.bin')
+        assert await response['Body'].read() == data
+
+
+@pytest.mark.asyncio
+async def test_failed_multipart_copy_abort_keeps_copy_error(s3_client, monkeypatch):
+    monkeypatch.setattr(s3, 'MAX_COPY_OBJECT_SIZE', MIN_PART_SIZE)
+    monkeypatch.setattr(s3, 'COPY_PART_SIZE', MIN_PART_SIZE)
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='big.bin', Body=os.urandom(MIN_PART_SIZE * 2))
+    call = fs._call
+
+    async def _call(operation_name, **kwargs):
+        if operation_name == 'upload_part_copy':
+            raise asyncio.CancelledError
+
+        if operation_name == 'abort_multipart_upload':
+            raise ConnectionError
+
+        return await call(operation_name, **kwargs)
+
+    monkeypatch.setattr(fs, '_call', _call)
+
+    with pytest.raises(asyncio.CancelledError):
+        await fs.cp('/bucket/big.bin', '/bucket/copy.bin')
+
+
+@pytest.mark.asyncio
+async def test_open_inexisting_file_for_read_should_fail(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
 
     with pytest.raises(FileNotFoundError):
-        async with fs.open('/tmp/b.txt'):
+        async with fs.open('/bucket/tmp/b.txt', 'rb'):
             pass
 
 
 @pytest.mark.asyncio
-async def test_open_existing_file_for_read():
+async def test_open_existing_file_for_read(s3_client):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.txt', Body=b'data data data')
 
-    async with fs.open('/tmp/a.txt') as f:
-        assert f.read() == 'data data data'
+    async with fs.open('/bucket/tmp/a.txt', 'rb') as f:
+        assert await f.read() == b'data data data'
+        assert await f.read() == b''
 
 
 @pytest.mark.asyncio
-async def test_unclosed_file_does_not_change_fs():
+async def test_open_file_in_text_mode_should_fail(s3_client):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+
+    with pytest.raises(ValueError, match='binary mode'):
+        async with fs.open('/bucket/tmp/a.txt', 'r'):
+            pass
 
-    async with fs.open('/tmp/a.txt', mode='w') as f:
-        f.write('TEST TEST TEST')
 
-        assert fs.tree['/']['tmp']['a.txt'] == b'data data data'
+@pytest.mark.asyncio
+async def test_read_file_in_ranges(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
+    data = bytes(range(256)) * 40
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.bin', Body=data)
+
+    async with fs.open('/bucket/tmp/a.bin', 'rb', block_size=1000, read_ahead=2) as f:
+        assert await f.read(10) == data[:10]
+        assert await f.read(2500) == data[10:2510]
+        assert len(f._blocks) <= 3
+
+        assert f.seek(-8, os.SEEK_END) == len(data) - 8
+        assert await f.read(100) == data[-8:]
+
+        f.seek(1500)
+        assert f.tell() == 1500
+        buffer = bytearray(10)
+        assert await f.readinto(buffer) == 10
+        assert buffer == data[1500:1510]
 
 
 @pytest.mark.asyncio
-async def test_closed_file_changes_fs():
+async def test_dropped_read_ahead_failures_are_retrieved():
+    errors = []
+    asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+
+    async def get_range(start, end):
+        if start in (100, 200):
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise ValueError('Read ahead failed while cancelled')
+
+        return bytes(end - start + 1)
+
+    async with S3ReadableFile('bucket', 'tmp/a.bin', None, 1000, block_size=100, read_ahead=2) as f:
+        f._get_range = get_range
+        assert await f.read(10) == bytes(10)
+
+        f.seek(900)
+        assert await f.read(10) == bytes(10)
+
+    del f
+    gc.collect()
+    await asyncio.sleep(0)
+
+    assert errors == []
+
+
+@pytest.mark.asyncio
+async def test_iterate_file_by_blocks(s3_client):
     fs = S3Protocol()
-    fs.tree = {'/': {'tmp': {'xxx': {}, 'a.txt': b'data data data'}}}
+    fs.client = s3_client
+    data = b'0123456789' * 25
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.bin', Body=data)
+
+    async with fs.open('/bucket/tmp/a.bin', 'rb', block_size=100) as f:
+        chunks = [chunk async for chunk in f]
+
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert b''.join(chunks) == data
+
+
+@pytest.mark.asyncio
+async def test_read_fails_when_object_changes(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.bin', Body=b'a' * 200)
+
+    async with fs.open('/bucket/tmp/a.bin', 'rb', block_size=100, read_ahead=0) as f:
+        assert await f.read(100) == b'a' * 100
+        await s3_client.put_object(Bucket='bucket', Key='tmp/a.bin', Body=b'b' * 200)
+
+        with pytest.raises(ClientError):
+            await f.read(100)
+
+
+@pytest.mark.asyncio
+async def test_unclosed_file_does_not_change_fs(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.txt', Body=b'data data data')
+
+    async with fs.open('/bucket/tmp/a.txt', mode='wb') as f:
+        await f.write(b'TEST TEST TEST')
+
+        response = await s3_client.get_object(Bucket='bucket', Key='tmp/a.txt')
+        assert await response['Body'].read() == b'data data data'
+
+
+@pytest.mark.asyncio
+async def test_closed_file_changes_fs(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.txt', Body=b'data data data')
+
+    async with fs.open('/bucket/tmp/a.txt', mode='wb') as f:
+        await f.write(b'TEST TEST TEST')
+
+    response = await s3_client.get_object(Bucket='bucket', Key='tmp/a.txt')
+    assert await response['Body'].read() == b'TEST TEST TEST'
+
+
+@pytest.mark.asyncio
+async def test_closed_empty_file_creates_object(s3_client):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    async with fs.open('/bucket/tmp/empty.txt', mode='wb'):
+        pass
+
+    response = await s3_client.get_object(Bucket='bucket', Key='tmp/empty.txt')
+    assert await response['Body'].read() == b''
+
+
+@pytest.mark.asyncio
+async def test_large_file_is_uploaded_in_parts(s3_client):
+    data = bytes(range(256)) * (MIN_PART_SIZE * 2 // 256) + b'tail'
+
+    async with S3WritableFile('bucket', 'big.bin', s3_client, part_size=MIN_PART_SIZE, max_concurrency=2) as f:
+        for offset in range(0, len(data), 1024 * 1024):
+            await f.write(data[offset:offset + 1024 * 1024])
+
+        assert f._upload_id is not None
+        assert len(f._buffer) < MIN_PART_SIZE
+
+    response = await s3_client.get_object(Bucket='bucket', Key='big.bin')
+    assert await response['Body'].read() == data
+
+    response = await s3_client.head_object(Bucket='bucket', Key='big.bin', PartNumber=1)
+    assert response['PartsCount'] == 3
+
+
+@pytest.mark.asyncio
+async def test_large_write_is_not_buffered_ahead_of_uploads():
+    class Client:
+        def __init__(self):
+            self.parts = {}
+
+        async def create_multipart_upload(self, **kwargs):
+            return {'UploadId': 'upload'}
+
+        async def upload_part(self, PartNumber, Body, **kwargs):
+            await asyncio.sleep(0.01)
+            self.parts[PartNumber] = len(Body)
+
+            return {'ETag': f'"{PartNumber}"'}
+
+        async def complete_multipart_upload(self, **kwargs):
+            return {}
+
+    client = Client()
+    data = b'x' * (MIN_PART_SIZE * 4 + 10)
+
+    async with S3WritableFile('bucket', 'big.bin', client, part_size=MIN_PART_SIZE, max_concurrency=1) as f:
+        tracemalloc.start()
+
+        try:
+            await f.write(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert peak < MIN_PART_SIZE * 2
+    assert client.parts == {1: MIN_PART_SIZE, 2: MIN_PART_SIZE, 3: MIN_PART_SIZE, 4: MIN_PART_SIZE, 5: 10}
+
+
+@pytest.mark.asyncio
+async def test_failed_write_aborts_multipart_upload(s3_client):
+    with pytest.raises(RuntimeError):
+        async with S3WritableFile('bucket', 'big.bin', s3_client, part_size=MIN_PART_SIZE) as f:
+            await f.write(b'x' * MIN_PART_SIZE)
+            raise RuntimeError
+
+    response = await s3_client.list_multipart_uploads(Bucket='bucket')
+    assert not response.get('Uploads')
+
+    with pytest.raises(ClientError):
+        await s3_client.head_object(Bucket='bucket', Key='big.bin')
+
+
+def test_part_size_below_s3_minimum_is_rejected():
+    with pytest.raises(ValueError):
+        S3WritableFile('bucket', 'big.bin', None, part_size=MIN_PART_SIZE - 1)
+
+
+@pytest.mark.asyncio
+async def test_client_is_shared_until_closed(s3_client, s3_endpoint_url):
+    fs = S3Protocol(s3_endpoint_url, 'us-east-1', SecretStr('testing'), SecretStr('testing'), max_pool_connections=4)
+
+    async with fs:
+        client = fs.client
+        assert client.meta.config.max_pool_connections == 4
+
+        async def write(index: int):
+            async with fs.open(f'/bucket/tmp/{index}.txt', 'wb') as f:
+                await f.write(b'data')
+
+        await asyncio.gather(*(write(index) for index in range(10)))
+
+        async with fs.open('/bucket/tmp/9.txt', 'rb') as f:
+            assert await f.read() == b'data'
+
+        assert fs.client is client
+
+    assert fs.client is None
+
+
+@pytest.mark.asyncio
+async def test_client_is_created_on_first_use(s3_client, s3_endpoint_url):
+    fs = S3Protocol(s3_endpoint_url, 'us-east-1', SecretStr('testing'), SecretStr('testing'))
+    await s3_client.put_object(Bucket='bucket', Key='tmp/a.txt', Body=b'data data data')
+
+    try:
+        async with fs.open('/bucket/tmp/a.txt', 'rb') as f:
+            assert await f.read() == b'data data data'
+
+        assert fs.client is not None
+    finally:
+        await fs.close()
+
+
+@pytest.mark.asyncio
+async def test_glob(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/existing_dir/nested/deep.txt', Body=b'')
+    await s3_client.put_object(Bucket='bucket', Key='tmp_other/a.txt', Body=b'')
+
+    async def glob(pattern: str) -> list:
+        return sorted([str(path) async for path in fs.glob(pattern)])
+
+    assert await glob('/bucket/tmp/*') == ['/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir']
+    assert await glob('/bucket/tmp/*/*.txt') == ['/bucket/tmp/existing_dir/another_existing.txt']
+    assert await glob('/bucket/tmp*/[a-z].txt') == ['/bucket/tmp_other/a.txt']
+    assert await glob('/bucket/tmp/**/*.txt') == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir/another_existing.txt',
+        '/bucket/tmp/existing_dir/nested/deep.txt',
+    ]
+    assert await glob('/bucket/tmp/existing.txt') == ['/bucket/tmp/existing.txt']
+    assert await glob('/bucket/var/*') == []
+
+    with pytest.raises(ValueError):
+        await glob('/buck*/tmp/*')
+
+
+@pytest.mark.asyncio
+async def test_ls_with_pattern(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol()
+    fs.client = s3_client
+    await s3_client.put_object(Bucket='bucket', Key='tmp/existing_dir/other.csv', Body=b'')
+    prefixes = []
+    paginate = fs._paginate
+
+    def paginate_(**kwargs):
+        prefixes.append(kwargs['Prefix'])
+
+        return paginate(**kwargs)
+
+    monkeypatch.setattr(fs, '_paginate', paginate_)
+
+    assert [str(path) async for path in fs.ls('/bucket/tmp', '**/*.txt')] == [
+        '/bucket/tmp/existing.txt',
+        '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+    assert [str(path) async for path in fs.ls('/bucket/tmp', 'existing_dir/*.csv')] == [
+        '/bucket/tmp/existing_dir/other.csv',
+    ]
+    assert [path.name async for path in fs.ls('/bucket/tmp', 'exi*', recursive=False)] == [
+        'existing.txt', 'existing_dir',
+    ]
+    assert [path async for path in fs.ls('/bucket/tmp', 'missing*')] == []
+    assert prefixes == ['tmp/', 'tmp/existing_dir/', 'tmp/exi', 'tmp/missing']
+
+    with pytest.raises(FileNotFoundError):
+        assert [path async for path in fs.ls('/bucket/missing', '*.txt')] == []
+
+
+@pytest.mark.asyncio
+async def test_scan_takes_metadata_from_listing(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol()
+    fs.client = s3_client
+    pages = []
+    paginate = fs._paginate
+
+    async def paginate_(**kwargs):
+        async for page in paginate(**kwargs):
+            pages.append(kwargs.get('MaxKeys'))
+            yield page
+
+    async def head_object(*args):
+        raise AssertionError('Listing must not stat entries')
+
+    monkeypatch.setattr(fs, '_paginate', paginate_)
+    monkeypatch.setattr(fs, '_head_object', head_object)
+    response = await s3_client.head_object(Bucket='bucket', Key='tmp/existing.txt')
+    entries = [entry async for entry in fs.scan('/bucket/tmp')]
+
+    assert entries == [
+        ObjectEntry('bucket', 'tmp/existing.txt', False, 14, response['LastModified'].timestamp(), response['ETag']),
+        ObjectEntry('bucket', 'tmp/existing_dir/', True),
+    ]
+    assert [entry.name for entry in entries] == ['existing.txt', 'existing_dir']
+    assert entries[0]._path is None
+    assert str(entries[0].path) == '/bucket/tmp/existing.txt'
+    assert entries[0].etag == response['ETag']
+    assert entries[0].mtime == response['LastModified'].timestamp()
+
+    pages.clear()
+
+    assert [str(entry.path) async for entry in fs.scan('/bucket/tmp', '**/*.txt', True, page_size=1)] == [
+        '/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir/another_existing.txt',
+    ]
+    assert pages == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_scan_columns(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+    pages = [columns async for columns in fs.scan_columns('/bucket/tmp', recursive=True, page_size=1)]
+
+    assert [columns.paths for columns in pages] == [
+        ['/bucket/tmp/existing.txt'], ['/bucket/tmp/existing_dir/another_existing.txt'],
+    ]
+    assert [list(columns.sizes) for columns in pages] == [[14], [12]]
+
+    columns = [columns async for columns in fs.scan_columns('/bucket/tmp')][0]
+
+    assert columns.paths == ['/bucket/tmp/existing.txt', '/bucket/tmp/existing_dir']
+    assert list(columns.is_dir) == [0, 1]
+    assert list(columns.sizes) == [14, MISSING_SIZE]
+    assert math.isnan(columns.mtimes[1])
+    assert columns.etags[1] is None
+
+
+@pytest.mark.asyncio
+async def test_scan_in_parallel(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    for key in ('tmp/a/1.txt', 'tmp/a/2.txt', 'tmp/b/1.txt', 'tmp/c.txt', 'tmp/d/1.txt'):
+        await s3_client.put_object(Bucket='bucket', Key=key, Body=b'')
+
+    keys = [entry.key async for entry in fs.scan('/bucket/tmp', recursive=True)]
+    prefixes = []
+    paginate = fs._paginate
+
+    def paginate_(**kwargs):
+        prefixes.append((kwargs['Prefix'], kwargs.get('StartAfter')))
+
+        return paginate(**kwargs)
+
+    monkeypatch.setattr(fs, '_paginate', paginate_)
+
+    assert [entry.key async for entry in fs.scan('/bucket/tmp', recursive=True, max_concurrency=3)] == keys
+    assert sorted(prefixes) == [
+        ('tmp/', None), ('tmp/a/', None), ('tmp/b/', None), ('tmp/d/', None), ('tmp/existing_dir/', None),
+    ]
+    assert sorted([entry.key async for entry in fs.scan('/bucket/tmp', recursive=True, max_concurrency=3,
+                                                         ordered=False)]) == keys
+
+    prefixes.clear()
+
+    assert [str(path) async for path in fs.ls('/bucket/tmp', partitions=['b', 'd'], max_concurrency=2)] == [
+        f'/bucket/{key}' for key in keys
+    ]
+    assert prefixes == [('tmp/', None), ('tmp/', 'tmp/b'), ('tmp/', 'tmp/d')]
+
+    with pytest.raises(FileNotFoundError):
+        [entry async for entry in fs.scan('/bucket/missing', recursive=True, max_concurrency=2)]
+
+
+@pytest.mark.asyncio
+async def test_ls_with_pattern_skips_subtrees(s3_client, s3_bucket, monkeypatch):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    for key in ('tmp/a.txt', 'tmp/a/1.txt', 'tmp/data/', 'tmp/data/1.txt', 'tmp/data/x/2.txt', 'tmp/deep/1/2.txt'):
+        await s3_client.put_object(Bucket='bucket', Key=key, Body=b'')
+
+    paginate = fs._paginate
+    prefixes = []
+
+    def paginate_(**kwargs):
+        prefixes.append(kwargs['Prefix'])
+
+        return paginate(**kwargs)
+
+    monkeypatch.setattr(fs, '_paginate', paginate_)
+
+    assert [str(path) async for path in fs.ls('/bucket/tmp', '*.txt')] == [
+        '/bucket/tmp/a.txt', '/bucket/tmp/existing.txt',
+    ]
+    assert prefixes == ['tmp/']
+
+    prefixes.clear()
+
+    assert [str(path) async for path in fs.ls('/bucket/tmp', 'd*/*.txt')] == ['/bucket/tmp/data/1.txt']
+    assert prefixes == ['tmp/d', 'tmp/data/', 'tmp/deep/']
+    assert [str(path) async for path in fs.ls('/bucket/tmp', 'd*')] == ['/bucket/tmp/data']
+    assert [str(path) async for path in fs.ls('/bucket/tmp', 'd*/*.txt', page_size=1)] == ['/bucket/tmp/data/1.txt']
+    assert [path async for path in fs.ls('/bucket/tmp', '*.csv')] == []
+
+    with pytest.raises(FileNotFoundError):
+        [path async for path in fs.ls('/bucket/missing', '*.txt')]
+
+
+@pytest.mark.asyncio
+async def test_scan_dir_in_key_order(s3_client, s3_bucket):
+    fs = S3Protocol()
+    fs.client = s3_client
+
+    for key in ('tmp/a.txt', 'tmp/a/1.txt', 'tmp/b/1.txt', 'tmp/b0.txt', 'tmp/c.txt', 'tmp/d/1.txt'):
+        await s3_client.put_object(Bucket='bucket', Key=key, Body=b'')
+
+    expected = [
+        ('tmp/a.txt', False), ('tmp/a/', True), ('tmp/b/', True), ('tmp/b0.txt', False), ('tmp/c.txt', False),
+        ('tmp/d/', True), ('tmp/existing.txt', False), ('tmp/existing_dir/', True),
+    ]
+
+    assert [(entry.key, entry.is_dir) async for entry in fs.scan('/bucket/tmp', page_size=3)] == expected
+    assert [(entry.key, entry.is_dir) async for entry in fs.scan('/bucket/tmp', partitions=['b', 'd'],
+                                                                  max_concurrency=3, page_size=2)] == expected
 
-    async with fs.open('/tmp/a.txt', mode='w') as f:
-        f.write('TEST TEST TEST')
+    pages = [columns async for columns in fs.scan_columns('/bucket/tmp', partitions=['b'], max_concurrency=2)]
 
-    assert fs.tree['/']['tmp']['a.txt'] == b'TEST TEST TEST'
+    assert [path for columns in pages for path in columns.paths] == [
+        f'/bucket/{key.rstrip("/")}' for key, _ in expected
+    ]
@@ -0,0 +1,89 @@
+import pytest
+
+from aiofm.protocols.local import LocalProtocol
+from aiofm.protocols.memory import MemoryProtocol
+from aiofm.protocols.s3 import S3Protocol
+from aiofm.transfer import transfer
+
+
+@pytest.mark.asyncio
+async def test_transfer_dir_from_memory_to_s3(s3_client):
+    src = MemoryProtocol()
+    src.tree = {'/': {'tmp': {'xxx': {'b.txt': b'b data'}, 'a.txt': b'data data data'}}}
+    dst = S3Protocol()
+    dst.client = s3_client
+    progress = []
+
+    stats = await transfer(src, '/tmp', dst, '/bucket/copy', max_concurrency=2, chunk_size=4,
+                           progress=lambda stats, path: progress.append(str(path)))
+
+    assert stats.files == 2
+    assert stats.bytes == 20
+    assert stats.server_side_copies == 0
+    assert sorted(progress) == ['/tmp/a.txt', '/tmp/xxx/b.txt']
+
+    response = await s3_client.get_object(Bucket='bucket', Key='copy/xxx/b.txt')
+    assert await response['Body'].read() == b'b data'
+
+
+@pytest.mark.asyncio
+async def test_transfer_dir_from_s3_to_memory(s3_client, s3_bucket):
+    src = S3Protocol()
+    src.client = s3_client
+    dst = MemoryProtocol()
+
+    stats = await transfer(src, '/bucket/tmp', dst, '/copy', chunk_size=5)
+
+    assert stats.files == 2
+    assert dst.tree == {'/': {'copy': {
+        'existing.txt': b'data data data',
+        'existing_dir': {'another_existing.txt': b'another data'},
+    }}}
+
+
+@pytest.mark.asyncio
+async def test_transfer_single_file(s3_client):
+    src = MemoryProtocol()
+    src.tree = {'/': {'tmp': {'a.txt': b'data data data'}}}
+    dst = MemoryProtocol()
+
+    await transfer(src, '/tmp/a.txt', dst, '/other/b.txt')
+
+    assert dst.tree == {'/': {'other': {'b.txt': b'data data data'}}}
+
+
+@pytest.mark.asyncio
+async def test_transfer_into_new_local_dir(tmp_path):
+    src = MemoryProtocol()
+    src.tree = {'/': {'tmp': {'xxx': {'b.txt': b'b data'}, 'a.txt': b'data data data'}}}
+    dst = LocalProtocol()
+
+    try:
+        stats = await transfer(src, '/tmp', dst, tmp_path / 'copy')
+        assert stats.files == 2
+
+        stats = await transfer(dst, tmp_path / 'copy', dst, tmp_path / 'nested' / 'copy')
+        assert stats.server_side_copies == 2
+    finally:
+        await dst.close()
+
+    assert (tmp_path / 'copy' / 'xxx' / 'b.txt').read_bytes() == b'b data'
+    assert (tmp_path / 'nested' / 'copy' / 'a.txt').read_bytes() == b'data data data'
+    assert (tmp_path / 'nested' / 'copy' / 'xxx' / 'b.txt').read_bytes() == b'b data'
+
+
+@pytest.mark.asyncio
+async def test_transfer_within_s3_endpoint_copies_server_side(s3_client, s3_bucket):
+    src = S3Protocol()
+    src.client = s3_client
+    dst = S3Protocol()
+    dst.client = s3_client
+
+    stats = await transfer(src, '/bucket/tmp', dst, '/bucket/copy')
+
+    assert stats.files == 2
+    assert stats.server_side_copies == 2
+    assert stats.bytes == 0
+
+    response = await s3_client.get_object(Bucket='bucket', Key='copy/existing_dir/another_existing.txt')
+    assert await response['Body'].read() == b'another data'